@@ -69,6 +69,7 @@ exports.createBooking = async (req, res) => {
 
         // --- 3. AI PREDICTION CHECK (Optional) ---
         const aiServiceUrl = process.env.AI_SERVICE_URL || 'http://ai-service:8000';
+        const aiTimeoutMs = parseInt(process.env.AI_PREDICT_TIMEOUT_MS || '800', 10);
         let crowdStatus = 'Normal';
         let predictedFootfall = 0;
 
@@ -81,10 +82,15 @@ exports.createBooking = async (req, res) => {
             const aiResponse = await axios.post(`${aiServiceUrl}/predict`, {
                 temple_name: templeName,
                 date_str: date,
-                temperature: temperature || 30,
-                rain_flag: rain_flag || 0,
+                // Omitted weather is filled from the ML service's climatology table
+                temperature: temperature ?? null,
+                rain_flag: rain_flag ?? null,
                 moon_phase: 'Normal',
                 is_weekend: isWeekend
+            }, {
+                // The ML service drops the request once this budget is spent; a late verdict is no verdict.
+                timeout: aiTimeoutMs,
+                headers: { 'X-Request-Timeout-Ms': String(aiTimeoutMs) }
             });
 
             crowdStatus = aiResponse.data.crowd_status;
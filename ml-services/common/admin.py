@@ -0,0 +1,21 @@
+"""Guard for operator-only endpoints (/debug/*, POST /drift/reset).
+
+The endpoints are off unless ADMIN_TOKEN is set. When it is set, callers
+must send the same value in `X-Admin-Token`. The services are internal to
+the compose network, so this is a guard against accidental use from the
+backend or a browser, not an authentication system.
+"""
+import hmac
+
+from fastapi import Header, HTTPException
+
+
+def admin_guard(token):
+    """FastAPI dependency that requires `X-Admin-Token: <token>`."""
+    def require_admin(x_admin_token: str = Header(None)):
+        if not token:
+            raise HTTPException(status_code=404, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+        if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), token.encode()):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    return require_admin
@@ -0,0 +1,130 @@
+"""Admission control: shed dashboard and bot load before it delays bookings.
+
+Every request path maps to a priority class. The booking guard's /predict
+call is never shed. Each sheddable class, such as dashboard /forecast or
+bot /chat, has its own in-flight cap. Sheddable classes together may only
+use `capacity - reserved` of the worker's in-flight budget, so at least
+`reserved` slots are always left for bookings. A request over budget is
+answered at once with 429 and a Retry-After. It does not queue behind
+work the worker cannot finish in time. Paths outside the table (health,
+metrics, alert ingestion, SSE streams) pass through uncounted.
+
+The middleware runs on the event-loop thread, so the counters need no
+lock. Collectors read them for /metrics.
+"""
+import json
+import math
+import random
+import time
+
+DEFAULT_CAPACITY = 32
+DEFAULT_RESERVED = 8
+MAX_RETRY_AFTER = 30
+# Weight of the newest sample in the per-class service-time average.
+EWMA_ALPHA = 0.2
+
+
+class AdmissionController:
+    """Per-class in-flight accounting and the admit / shed decision."""
+
+    def __init__(self, routes, limits, capacity=DEFAULT_CAPACITY, reserved=DEFAULT_RESERVED):
+        self.exact = {path: cls for path, cls in routes.items() if not path.endswith("/")}
+        self.prefixes = [(path, cls) for path, cls in routes.items() if path.endswith("/")]
+        self.limits = dict(limits)
+        self.capacity = capacity
+        self.reserved = reserved
+        classes = set(routes.values())
+        self.in_flight = {cls: 0 for cls in classes}
+        self.counters = {cls: {"admitted": 0, "rejected": 0} for cls in classes}
+        self.service_seconds = {cls: 0.0 for cls in classes}
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def classify(self, path):
+        cls = self.exact.get(path)
+        if cls is None:
+            for prefix, prefix_cls in self.prefixes:
+                if path.startswith(prefix):
+                    return prefix_cls
+        return cls
+
+    def admit(self, cls):
+        """True if a request of class `cls` may start now; counts it as in flight."""
+        limit = self.limits.get(cls)
+        if limit is not None:
+            shared = sum(n for c, n in self.in_flight.items() if c in self.limits)
+            if self.in_flight[cls] >= limit or shared >= self.capacity - self.reserved \
+                    or sum(self.in_flight.values()) >= self.capacity:
+                self.counters[cls]["rejected"] += 1
+                return False
+        self.in_flight[cls] += 1
+        self.counters[cls]["admitted"] += 1
+        return True
+
+    def release(self, cls, seconds):
+        self.in_flight[cls] -= 1
+        self.service_seconds[cls] += EWMA_ALPHA * (seconds - self.service_seconds[cls])
+
+    def retry_after(self, cls):
+        """Whole seconds until the backlog ahead of `cls` has likely drained, with jitter."""
+        backlog = self.service_seconds[cls] * sum(self.in_flight.values())
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(backlog))) + random.randint(0, 1)
+
+    def register(self, registry):
+        registry.describe("admission_in_flight", "gauge", "Admitted requests in flight per priority class.",
+                          ("priority",))
+        registry.describe("admission_limit", "gauge", "In-flight cap per sheddable priority class.", ("priority",))
+        registry.describe("admission_requests", "counter", "Admission decisions per priority class.",
+                          ("priority", "result"))
+
+        def collect():
+            samples = []
+            for cls, counts in self.counters.items():
+                samples.append(("admission_in_flight", (cls,), self.in_flight[cls]))
+                samples += [("admission_requests", (cls, result), n) for result, n in counts.items()]
+            samples += [("admission_limit", (cls,), limit) for cls, limit in self.limits.items()]
+            return samples
+
+        registry.collector(collect)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "reserved": self.reserved,
+            "limits": dict(self.limits),
+            "in_flight": dict(self.in_flight),
+            "counters": {cls: dict(c) for cls, c in self.counters.items()},
+            "service_seconds": {cls: round(s, 4) for cls, s in self.service_seconds.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to HTTP requests."""
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        cls = controller.classify(scope["path"]) if scope["type"] == "http" and controller.enabled else None
+        if cls is None:
+            return await self.app(scope, receive, send)
+        if not controller.admit(cls):
+            retry_after = controller.retry_after(cls)
+            body = json.dumps({"detail": f"Over capacity for {cls} requests; retry later",
+                               "priority": cls, "retry_after": retry_after}).encode()
+            await send({"type": "http.response.start", "status": 429, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(cls, time.perf_counter() - started)
@@ -0,0 +1,169 @@
+"""Request deadlines and cooperative cancellation.
+
+A caller bounds a request with either header:
+
+    X-Request-Timeout-Ms: 800              budget relative to arrival (preferred, no clock skew)
+    X-Request-Deadline: 1760000000123      absolute Unix time in milliseconds
+
+DeadlineMiddleware turns it into a monotonic deadline for the request's
+context. Sync endpoints inherit that context in the threadpool. A request
+that is already late when it arrives gets a 504 without running. Once the
+body has been read, the middleware also watches the connection: a client
+that hangs up cancels the request the same way an expired deadline does.
+
+Work checks the deadline at stage boundaries with `check("stage")`, which
+raises DeadlineExceeded. The middleware turns that into a 504 naming the
+stage. Loops that can return a useful partial answer, such as simulation
+replications, poll `expired()` instead, stop early and call
+`mark_partial()`. Requests without either header behave exactly as before.
+"""
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+
+_current = ContextVar("deadline", default=None)
+# Updated on the event-loop thread, except "partial" (threadpool; a lost increment only skews a counter).
+counters = {"with_deadline": 0, "expired_on_arrival": 0, "aborted": 0, "disconnected": 0, "partial": 0}
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage, reason="deadline exceeded"):
+        super().__init__(f"{reason} before {stage}" if stage else reason)
+        self.stage = stage
+        self.reason = reason
+
+
+class Deadline:
+    __slots__ = ("expires", "cancelled")
+
+    def __init__(self, expires):
+        self.expires = expires
+        self.cancelled = None
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def expired(self):
+        return self.cancelled is not None or time.monotonic() >= self.expires
+
+    def reason(self):
+        return self.cancelled or "deadline exceeded"
+
+
+def parse(headers):
+    """Deadline from request headers ({lowercase name: value}), or None."""
+    try:
+        if "x-request-timeout-ms" in headers:
+            return Deadline(time.monotonic() + float(headers["x-request-timeout-ms"]) / 1000)
+        if "x-request-deadline" in headers:
+            budget = float(headers["x-request-deadline"]) / 1000 - time.time()
+            return Deadline(time.monotonic() + budget)
+    except ValueError:
+        return None
+    return None
+
+
+def expired():
+    """True if the current request's deadline has passed or its client went away."""
+    deadline = _current.get()
+    return deadline is not None and deadline.expired()
+
+
+def remaining():
+    """Seconds left for the current request, or None without a deadline."""
+    deadline = _current.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def mark_partial():
+    """Count a request that returned a partial result because it ran out of time."""
+    counters["partial"] += 1
+
+
+def register_deadline_metrics(registry):
+    registry.describe("deadline_requests", "counter", "Requests carrying a deadline, by outcome.", ("outcome",))
+    registry.collector(lambda: [("deadline_requests", (outcome,), n) for outcome, n in counters.items()])
+
+
+def deadline_stats():
+    return dict(counters)
+
+
+def check(stage=""):
+    """Raise DeadlineExceeded if the current request should stop before `stage`."""
+    deadline = _current.get()
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded(stage, deadline.reason())
+
+
+class DeadlineMiddleware:
+    """ASGI middleware: parses deadline headers and cancels on client disconnect."""
+
+    HEADERS = (b"x-request-timeout-ms", b"x-request-deadline")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def _reject(self, send, detail, stage=None):
+        body = json.dumps({"detail": detail, "stage": stage}).encode()
+        await send({"type": "http.response.start", "status": 504, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"] if k in self.HEADERS}
+        deadline = parse(headers) if headers else None
+        if deadline is None:
+            return await self.app(scope, receive, send)
+        counters["with_deadline"] += 1
+        if deadline.expired():
+            counters["expired_on_arrival"] += 1
+            return await self._reject(send, "deadline exceeded on arrival")
+
+        watcher = None
+        started = finished = False
+        gone = asyncio.Event()
+
+        async def watch():
+            # After the body, the next message is the disconnect (uvicorn also sends it once the response completes).
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            if not finished:
+                deadline.cancelled = "client disconnected"
+                counters["disconnected"] += 1
+            gone.set()
+
+        async def receive_watched():
+            nonlocal watcher
+            if watcher is not None:
+                await gone.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.ensure_future(watch())
+            return message
+
+        async def send_tracked(message):
+            nonlocal started, finished
+            if message["type"] == "http.response.start":
+                started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+            await send(message)
+
+        token = _current.set(deadline)
+        try:
+            await self.app(scope, receive_watched, send_tracked)
+        except DeadlineExceeded as e:
+            counters["aborted"] += 1
+            if started:
+                raise
+            await self._reject(send, str(e), e.stage)
+        finally:
+            finished = True
+            _current.reset(token)
+            if watcher is not None:
+                watcher.cancel()
@@ -0,0 +1,199 @@
+"""Memory diagnostics: RSS trend plus on-demand tracemalloc snapshot diffs.
+
+RSS and Python's allocated block count are cheap to read, so a background
+thread samples them every MEMORY_SAMPLE_SECONDS into a ring buffer. /metrics
+exports the latest values, and /debug/memory reports the growth rate over
+the ring. A worker that keeps growing while traffic is flat is leaking.
+
+tracemalloc is off by default because it slows every allocation. To find
+where the growth comes from:
+
+    POST /debug/memory/start?frames=10      start tracing in this worker
+    POST /debug/memory/snapshot             -> {"id": "<pid>-1", ...}
+    ... let traffic run ...
+    GET  /debug/memory/diff?base=<pid>-1    diff against a fresh snapshot
+    POST /debug/memory/stop
+
+Snapshots live in the worker that took them, and ids carry its pid. Under
+common.serve, send the calls over one keep-alive connection (one curl with
+several URLs), or use GET /debug/memory/diff?seconds=60. That form starts
+tracing if needed, snapshots, waits and diffs in a single request, and
+stops tracing again if it was the one that started it.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+DEFAULT_SAMPLE_SECONDS = 15.0
+HISTORY = 240  # one hour at the default interval
+MAX_SNAPSHOTS = 8
+MAX_WINDOW_SECONDS = 600.0
+# Allocations made by the diagnostics themselves are noise.
+IGNORED = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>")
+
+
+def rss_bytes():
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryMonitor:
+    """RSS ring buffer and tracemalloc snapshots for one process."""
+
+    def __init__(self, sample_seconds=DEFAULT_SAMPLE_SECONDS, history=HISTORY):
+        self.sample_seconds = sample_seconds
+        self.history = deque(maxlen=history)  # (epoch seconds, rss bytes, allocated blocks)
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._next_id = 1
+
+    def sample(self):
+        point = (time.time(), rss_bytes(), sys.getallocatedblocks())
+        with self._lock:
+            self.history.append(point)
+        return point
+
+    def start_sampler(self):
+        def run():
+            while True:
+                self.sample()
+                time.sleep(self.sample_seconds)
+
+        threading.Thread(target=run, name="memory-sampler", daemon=True).start()
+
+    def register(self, registry):
+        """Export RSS, allocated blocks and traced bytes as per-worker gauges."""
+        registry.describe("process_resident_memory_bytes", "gauge", "Resident set size of this worker.")
+        registry.describe("python_allocated_blocks", "gauge", "Memory blocks currently allocated by the interpreter.")
+        registry.describe("tracemalloc_traced_bytes", "gauge", "Bytes traced by tracemalloc (absent while it is off).")
+
+        def collect():
+            samples = [("process_resident_memory_bytes", (), rss_bytes()),
+                       ("python_allocated_blocks", (), sys.getallocatedblocks())]
+            if tracemalloc.is_tracing():
+                samples.append(("tracemalloc_traced_bytes", (), tracemalloc.get_traced_memory()[0]))
+            return samples
+
+        registry.collector(collect)
+
+    def trend(self):
+        """RSS growth in bytes/hour across the ring (least squares), or None with < 2 points."""
+        with self._lock:
+            points = [(t, rss) for t, rss, _ in self.history if rss is not None]
+        if len(points) < 2 or points[-1][0] == points[0][0]:
+            return None
+        n = len(points)
+        mean_t = sum(t for t, _ in points) / n
+        mean_r = sum(r for _, r in points) / n
+        var = sum((t - mean_t) ** 2 for t, _ in points)
+        cov = sum((t - mean_t) * (r - mean_r) for t, r in points)
+        return cov / var * 3600 if var else None
+
+    def status(self):
+        with self._lock:
+            history = list(self.history)
+            snapshots = [{"id": k, **{m: v for m, v in s.items() if m != "snapshot"}}
+                         for k, s in self._snapshots.items()]
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        return {
+            "worker": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "allocated_blocks": sys.getallocatedblocks(),
+            "rss_growth_bytes_per_hour": self.trend(),
+            "history": [{"time": round(t, 1), "rss_bytes": rss, "allocated_blocks": blocks}
+                        for t, rss, blocks in history],
+            "tracing": tracemalloc.is_tracing(),
+            "traced_bytes": traced,
+            "traced_peak_bytes": peak,
+            "snapshots": snapshots,
+        }
+
+    def start(self, frames=10):
+        """Start tracemalloc (no-op if already tracing); returns the traceback depth in use."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, min(int(frames), 64)))
+        return tracemalloc.get_traceback_limit()
+
+    def stop(self):
+        with self._lock:
+            self._snapshots.clear()
+        tracemalloc.stop()
+
+    def snapshot(self):
+        """Take and keep a filtered snapshot; the oldest is dropped past MAX_SNAPSHOTS."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; POST /debug/memory/start first")
+        snap = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in IGNORED])
+        with self._lock:
+            snapshot_id = f"{os.getpid()}-{self._next_id}"
+            self._next_id += 1
+            self._snapshots[snapshot_id] = {
+                "snapshot": snap,
+                "time": round(time.time(), 1),
+                "traced_bytes": sum(s.size for s in snap.statistics("filename")),
+                "rss_bytes": rss_bytes(),
+            }
+            while len(self._snapshots) > MAX_SNAPSHOTS:
+                del self._snapshots[next(iter(self._snapshots))]
+        return snapshot_id
+
+    def _get(self, snapshot_id):
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            owner = snapshot_id.split("-", 1)[0]
+            if owner != str(os.getpid()):
+                raise LookupError(f"Snapshot {snapshot_id} was taken by worker {owner}, not {os.getpid()}; "
+                                  "reuse the same connection or use ?seconds=")
+            raise LookupError(f"Unknown snapshot {snapshot_id}")
+        return entry
+
+    def diff(self, base_id, current_id=None, limit=20, group_by="lineno"):
+        """Top allocation sites by growth from `base_id` to `current_id` (a fresh snapshot if None)."""
+        base = self._get(base_id)
+        current_id = current_id or self.snapshot()
+        current = self._get(current_id)
+        stats = current["snapshot"].compare_to(base["snapshot"], group_by)
+        return {
+            "worker": os.getpid(),
+            "base": base_id,
+            "current": current_id,
+            "seconds": round(current["time"] - base["time"], 1),
+            "traced_bytes_diff": current["traced_bytes"] - base["traced_bytes"],
+            "rss_bytes_diff": (None if current["rss_bytes"] is None or base["rss_bytes"] is None
+                               else current["rss_bytes"] - base["rss_bytes"]),
+            "top": [
+                {
+                    "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_diff": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size": stat.size,
+                    "count": stat.count,
+                }
+                for stat in stats[:max(1, min(int(limit), 200))]
+            ],
+        }
+
+    def window(self, seconds, frames=10, limit=20, group_by="lineno"):
+        """Start tracing if needed, snapshot, sleep `seconds`, and diff; blocks the calling thread.
+
+        Tracing started here is stopped again before returning, so a one-off
+        diff does not leave the worker paying tracemalloc's overhead.
+        """
+        started = not tracemalloc.is_tracing()
+        self.start(frames)
+        try:
+            base_id = self.snapshot()
+            time.sleep(min(max(float(seconds), 1.0), MAX_WINDOW_SECONDS))
+            return self.diff(base_id, limit=limit, group_by=group_by)
+        finally:
+            if started:
+                self.stop()
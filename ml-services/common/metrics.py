@@ -0,0 +1,367 @@
+"""Prometheus text-format metrics with a lock-free hot path.
+
+Every thread that records a sample writes to its own dict of series
+(threading.local), so recording is a few dict and list operations under
+the GIL with no lock. Request latency is recorded by MetricsMiddleware on
+the event-loop thread, and inference time is recorded in the threadpool.
+The per-thread dicts are merged only when /metrics is scraped.
+
+Values that components already count (cache hits, resident shards, stream
+backlog) are not recorded per request. Collector callbacks read them at
+scrape time.
+
+Under common.serve, all workers share METRICS_DIR. Each worker writes its
+merged snapshot there every METRICS_FLUSH_SECONDS and again at shutdown.
+A scrape is answered by whichever worker accepts it. That worker adds its
+own live values to the other workers' latest files. Counters and
+histograms are summed across workers, including workers that have since
+exited, so totals do not go backwards when a worker is recycled. Gauges
+are reported per live worker with a `worker` label. Without METRICS_DIR
+(plain uvicorn), /metrics covers this process only.
+
+An exited worker's file is folded into RETIRED_FILE by the next scrape
+that finds it, then deleted. METRICS_DIR therefore holds one file per
+live worker plus one cumulative file, however often workers are
+recycled.
+"""
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from time import perf_counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' files are summed in place instead of being folded
+    fcntl = None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_FLUSH_SECONDS = 5.0
+# Counters and histograms of every exited worker, summed.
+RETIRED_FILE = "retired.json"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs += extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fold(counters, histograms, snap):
+    """Add a snapshot's counters and histograms into the given dicts."""
+    for name, labels, value in snap["counters"]:
+        key = (name, tuple(labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, value in snap["histograms"]:
+        merged = histograms.setdefault((name, tuple(labels)), [0] * len(value))
+        for i, v in enumerate(value):
+            merged[i] += v
+
+
+def _number(value):
+    if value is None or isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class Registry:
+    """Metric families plus per-thread samples, merged and rendered on scrape."""
+
+    def __init__(self, directory=None, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.families = {}  # name -> (kind, help, labelnames, buckets)
+        self._buckets = {}
+        self._collectors = []
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # only taken when a thread records for the first time
+        if hasattr(os, "register_at_fork"):
+            # Samples taken in the common.serve parent must not be counted again by every worker.
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        """Declare a counter, gauge or histogram family."""
+        self.families[name] = (kind, help, tuple(labelnames), tuple(buckets) if kind == "histogram" else ())
+        self._buckets[name] = self.families[name][3]
+
+    def collector(self, fn):
+        """Register `fn() -> [(name, label values, value)]`, read on scrape and flush."""
+        self._collectors.append(fn)
+        return fn
+
+    def _series(self):
+        try:
+            return self._local.series
+        except AttributeError:
+            series = self._local.series = {}
+            with self._lock:
+                self._shards.append(series)
+            return series
+
+    def inc(self, name, labels=(), value=1):
+        series = self._series()
+        key = (name, labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        try:
+            series = self._local.series
+        except AttributeError:
+            series = self._series()
+        buckets = self._buckets[name]
+        counts = series.get((name, labels))
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the running sum.
+            counts = series[(name, labels)] = [0] * (len(buckets) + 2)
+        counts[bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, name, labels=()):
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """This process's merged samples: {"counters", "histograms", "gauges"} as lists."""
+        counters, histograms = {}, {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for (name, labels), value in shard.copy().items():  # dict.copy is atomic under the GIL
+                if self.families[name][0] == "histogram":
+                    merged = histograms.setdefault((name, labels), [0] * len(value))
+                    for i, v in enumerate(list(value)):
+                        merged[i] += v
+                else:
+                    counters[(name, labels)] = counters.get((name, labels), 0) + value
+        gauges = {}
+        for fn in self._collectors:
+            for name, labels, value in fn():
+                if self.families[name][0] == "gauge":
+                    gauges[(name, tuple(labels))] = value
+                else:
+                    counters[(name, tuple(labels))] = counters.get((name, tuple(labels)), 0) + value
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "counters": [[n, list(l), v] for (n, l), v in counters.items()],
+            "histograms": [[n, list(l), v] for (n, l), v in histograms.items()],
+            "gauges": [[n, list(l), v] for (n, l), v in gauges.items()],
+        }
+
+    def flush(self):
+        """Write this worker's snapshot to METRICS_DIR (atomic rename)."""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def start_flusher(self):
+        if not self.directory:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.flush_seconds)
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"⚠️ Metrics flush failed: {e}")
+
+        threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+    def _load(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None  # gone, or being replaced right now; next scrape picks it up
+
+    def _retire(self, names):
+        """Fold exited workers' files into RETIRED_FILE and delete them.
+
+        Serialised with flock, so two workers scraping at once cannot fold
+        the same file twice.
+        """
+        with open(os.path.join(self.directory, RETIRED_FILE + ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            counters, histograms, folded = {}, {}, []
+            for name in names:
+                snap = self._load(name)
+                if snap is not None:  # None: another worker folded it first
+                    _fold(counters, histograms, snap)
+                    folded.append(name)
+            if not folded:
+                return
+            retired = self._load(RETIRED_FILE)
+            if retired is not None:
+                _fold(counters, histograms, retired)
+            path = os.path.join(self.directory, RETIRED_FILE)
+            with open(path + ".tmp", "w") as f:
+                json.dump({
+                    "pid": None,
+                    "time": time.time(),
+                    "counters": [[n, list(l), v] for (n, l), v in counters.items()],
+                    "histograms": [[n, list(l), v] for (n, l), v in histograms.items()],
+                    "gauges": [],
+                }, f, separators=(",", ":"))
+            os.replace(path + ".tmp", path)
+            for name in folded:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def _snapshots(self):
+        own = self.snapshot()
+        snapshots = [own]
+        if not self.directory:
+            return snapshots
+        try:
+            files = [f for f in os.listdir(self.directory) if f.endswith(".json") and f != f"{own['pid']}.json"]
+        except FileNotFoundError:
+            return snapshots
+        if fcntl is not None:
+            dead = [f for f in files if f[:-5].isdigit() and not self._alive(int(f[:-5]))]
+            if dead:
+                try:
+                    self._retire(dead)
+                except OSError as e:
+                    print(f"⚠️ Folding exited workers' metrics failed: {e}")  # read them in place this time
+                else:
+                    files = [f for f in files if f not in dead]
+                    if RETIRED_FILE not in files:
+                        files.append(RETIRED_FILE)
+        for name in files:
+            snap = self._load(name)
+            if snap is not None:
+                snapshots.append(snap)
+        return snapshots
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def render(self):
+        """Prometheus text exposition (0.0.4) across all workers."""
+        snapshots = self._snapshots()
+        per_worker = len(snapshots) > 1 or bool(self.directory)
+        counters, histograms, gauges = {}, {}, {}
+        for snap in snapshots:
+            _fold(counters, histograms, snap)
+            if snap is snapshots[0] or snap["gauges"] and self._alive(snap["pid"]):
+                worker = [("worker", snap["pid"])] if per_worker else None
+                for name, labels, value in snap["gauges"]:
+                    gauges.setdefault(name, []).append((tuple(labels), worker, value))
+
+        lines = []
+        for name, (kind, help, labelnames, buckets) in self.families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "gauge":
+                for labels, worker, value in gauges.get(name, ()):
+                    lines.append(f"{name}{_labels(labelnames, labels, worker)} {_number(value)}")
+            elif kind == "counter":
+                for (n, labels), value in sorted(counters.items()):
+                    if n == name:
+                        lines.append(f"{name}_total{_labels(labelnames, labels)} {_number(value)}")
+            else:
+                for (n, labels), counts in sorted(histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + (math.inf,), counts):
+                        cumulative += count
+                        le = [("le", "+Inf" if bound == math.inf else repr(bound))]
+                        lines.append(f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(float(counts[-1]))}")
+                    lines.append(f"{name}_count{_labels(labelnames, labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry, self.name, self.labels = registry, name, labels
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, self.labels, perf_counter() - self.started)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency histogram per method, route template and status.
+
+    Routes are labelled by their template (e.g. "/predict"), never the raw
+    path, so unmatched paths share one "unmatched" series.
+    """
+
+    def __init__(self, app, registry, name="http_request_duration_seconds"):
+        self.app = app
+        self.registry = registry
+        self.name = name
+        self.in_flight = 0
+        self._paths = None
+        registry.describe(name, "histogram", "Request latency from first byte in to last byte out.",
+                          ("method", "route", "status"))
+        registry.describe("http_requests_in_flight", "gauge", "Requests currently being handled.")
+        registry.collector(lambda: [("http_requests_in_flight", (), self.in_flight)])
+
+    def _route(self, scope):
+        route = scope.get("route")
+        if route is not None:
+            return getattr(route, "path", "unmatched")
+        endpoint = scope.get("endpoint")  # Starlette < 0.33 does not set scope["route"]
+        if endpoint is None:
+            return "unmatched"
+        if self._paths is None:
+            self._paths = {getattr(r, "endpoint", None): r.path for r in scope["app"].routes}
+        return self._paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            self.in_flight -= 1
+            self.registry.observe(self.name, (scope["method"], self._route(scope), str(status)),
+                                  perf_counter() - started)
@@ -0,0 +1,111 @@
+"""On-demand sampling profiler producing collapsed stacks.
+
+Nothing runs until /debug/profile is called. Then a dedicated thread reads
+sys._current_frames() `hz` times a second for the requested window and
+counts each thread's Python stack. The result is one line per distinct
+stack, root first, followed by its sample count:
+
+    MainThread;run (asyncio/runners.py:86);...;predict (src/shards.py:210) 42
+
+flamegraph.pl, speedscope and inferno read this format directly. Stacks
+are prefixed with the thread name, so the event loop and each threadpool
+worker get their own tower. By default a thread is skipped when it is
+parked in a known wait (queue get, select, condition wait) or when its CPU
+clock has not moved since the previous sample. That hides sleeping
+background threads. Pass `idle` to count every thread on every sample,
+which gives a wall-clock view.
+
+Sampling only sees Python frames. Time spent inside XGBoost or numpy shows
+up on the Python frame that called it. Under common.serve, the profile covers
+the one worker that answered the request.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+MAX_SECONDS = 60.0
+MAX_HZ = 1000
+# (file, function) of leaf frames that mean "waiting, not working".
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+
+def _cpu_clock(ident):
+    """Seconds of CPU used by thread `ident`, or None where per-thread clocks are unavailable."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+def _label(code):
+    path = code.co_filename
+    for prefix in sorted({p for p in sys.path if p}, key=len, reverse=True):
+        if path.startswith(prefix + os.sep):
+            path = path[len(prefix) + 1:]
+            break
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """One profile at a time; callers get (collapsed text, samples taken)."""
+
+    def __init__(self):
+        self._busy = threading.Lock()
+        self._labels = {}
+        self.counters = {"profiles": 0, "samples": 0}
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _label(code)
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return labels
+
+    def sample(self, seconds, hz=100, idle=False):
+        """Sample every thread but this one; raises RuntimeError if a profile is already running."""
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            seconds = min(max(float(seconds), 0.1), MAX_SECONDS)
+            interval = 1.0 / min(max(int(hz), 1), MAX_HZ)
+            me = threading.get_ident()
+            stacks = Counter()
+            taken = 0
+            deadline = time.perf_counter() + seconds
+            next_at = time.perf_counter()
+            cpu = {}
+            while next_at < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    if not idle:
+                        used, last = _cpu_clock(ident), cpu.get(ident)
+                        cpu[ident] = used
+                        code = frame.f_code
+                        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                            continue
+                        if used is not None and (last is None or used == last):
+                            continue
+                    stacks[";".join([names.get(ident, f"thread-{ident}"), *self._stack(frame)])] += 1
+                taken += 1
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+            self.counters["profiles"] += 1
+            self.counters["samples"] += taken
+            return "".join(f"{stack} {n}\n" for stack, n in stacks.most_common()), taken
+        finally:
+            self._busy.release()
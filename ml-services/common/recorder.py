@@ -0,0 +1,177 @@
+"""Traffic recorder: sampled requests with arrival times, for offline replay.
+
+With RECORD_DIR set, RecorderMiddleware keeps a RECORD_SAMPLE_RATIO sample
+of requests to the recorded paths. Each kept request is stored with its
+arrival time, method, path, query, content type, body, status and
+duration. Requests that admission control sheds are recorded too, so a
+recording captures the load that was offered, not just the load that was
+served. The body is read before the request is passed on, because a shed
+request never reads it.
+
+Each worker appends to its own `<service>-<pid>.jsonl.gz` under RECORD_DIR
+and rotates it at RECORD_MAX_MB, keeping RECORD_BACKUPS old files. A
+background thread writes every batch as a separate gzip member, so a file
+cut short by a crash still reads back up to its last batch. Use
+`zcat file | head` to inspect one. Bodies above RECORD_MAX_BODY_KB (large
+camera frames) are stored without the body and cannot be replayed.
+
+    python -m loadtest.replay --url http://127.0.0.1:8000 --speed 10 recordings/*.jsonl.gz
+"""
+import base64
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+DEFAULT_SAMPLE_RATIO = 1.0
+DEFAULT_MAX_MB = 100
+DEFAULT_BACKUPS = 5
+DEFAULT_MAX_BODY_KB = 1024
+BATCH_SIZE = 1000
+FLUSH_SECONDS = 1.0
+MAX_QUEUED = 20000
+
+
+class TrafficRecorder:
+    """Background writer of sampled requests to rotating gzip JSON-lines files."""
+
+    def __init__(self, directory, service, sample_ratio=DEFAULT_SAMPLE_RATIO,
+                 max_bytes=DEFAULT_MAX_MB * 1024 * 1024, backups=DEFAULT_BACKUPS,
+                 max_body_bytes=DEFAULT_MAX_BODY_KB * 1024):
+        self.directory = directory
+        self.service = service
+        self.sample_ratio = sample_ratio
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_body_bytes = max_body_bytes
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.counters = {"recorded": 0, "not_sampled": 0, "body_too_large": 0, "dropped": 0, "files": 0}
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.service}-{os.getpid()}.jsonl.gz")
+
+    def sampled(self):
+        if self.sample_ratio >= 1.0 or random.random() < self.sample_ratio:
+            return True
+        self.counters["not_sampled"] += 1
+        return False
+
+    def submit(self, record):
+        if self._pid != os.getpid():  # first record in this worker; threads do not survive fork
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._run, name="traffic-recorder", daemon=True).start()
+        if self._queue.qsize() >= MAX_QUEUED:
+            self.counters["dropped"] += 1
+            return
+        self._queue.put(record)
+
+    def _rotate(self, path):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if self.backups:
+            os.replace(path, f"{path}.1")
+        else:
+            os.unlink(path)
+        self.counters["files"] += 1
+
+    def _write(self, records):
+        lines = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            self._rotate(path)
+        with open(path, "ab") as f:
+            f.write(gzip.compress(lines.encode(), compresslevel=6))
+        self.counters["recorded"] += len(records)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError as e:
+                self.counters["dropped"] += len(batch)
+                print(f"⚠️ Traffic recording failed: {e}")
+
+    def stats(self):
+        return {**self.counters, "enabled": self.enabled, "sample_ratio": self.sample_ratio,
+                **({"path": self.path} if self.enabled else {})}
+
+
+class RecorderMiddleware:
+    """ASGI middleware: records a sample of requests to `paths` (exact matches)."""
+
+    def __init__(self, app, recorder, paths):
+        self.app = app
+        self.recorder = recorder
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        recorder = self.recorder
+        if scope["type"] != "http" or not recorder.enabled or scope["path"] not in self.paths \
+                or not recorder.sampled():
+            return await self.app(scope, receive, send)
+        arrived = time.time()
+        started = time.perf_counter()
+        messages, size, more = [], 0, True
+        while more and size <= recorder.max_body_bytes:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = None if more or size > recorder.max_body_bytes else b"".join(m.get("body", b"") for m in messages)
+        status = 500
+
+        async def receive_buffered():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_buffered, send_status)
+        finally:
+            headers = dict(scope["headers"])
+            record = {
+                "ts": round(arrived, 6),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope["query_string"].decode("latin-1"),
+                "content_type": headers.get(b"content-type", b"").decode("latin-1"),
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+            if body is None:
+                recorder.counters["body_too_large"] += 1
+            else:
+                try:
+                    record["body"] = body.decode()
+                except UnicodeDecodeError:
+                    record["body_b64"] = base64.b64encode(body).decode()
+            recorder.submit(record)
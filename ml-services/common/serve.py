@@ -0,0 +1,303 @@
+"""Production entry point: preload once, fork workers, roll them on SIGHUP.
+
+    cd ml-services/demand-forecasting    # or crowd-detection; the app is src.api:app
+    PYTHONPATH=.. python -m common.serve --workers 4 --port 8000 [--uds /run/temple/ml.sock]
+
+The parent imports the app and calls its `preload()` hook (if any), so
+model artifacts are read once and shared copy-on-write by every worker.
+It then binds the listeners and forks `--workers` uvicorn processes that
+all accept on the same sockets. Each worker runs the app's `warmup()` hook
+(if any) before it starts accepting, so no request lands on a cold worker.
+The parent serves no requests; it only supervises:
+
+* a worker that exits (crash, or --max-requests reached) is replaced;
+* SIGHUP re-runs `preload(reload=True)` in the parent, then replaces the
+  workers one at a time: the new worker is warmed up and accepting before
+  the old one is sent SIGTERM and drains its in-flight requests;
+* SIGTERM / SIGINT drain all workers and exit.
+
+uvloop and httptools are used when installed. Keep-alive defaults to 75 s
+so it outlives the backend's pooled sockets; otherwise the server can
+close a socket just as the client reuses it.
+
+Workers share one METRICS_DIR (a fresh temporary directory unless set),
+so /metrics on any worker reports totals for the whole pool.
+
+No inference runs in the parent. OpenMP thread pools, which XGBoost uses,
+do not survive fork, which is why warmup runs in each worker.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import shutil
+import signal
+import socket
+import stat
+import tempfile
+import time
+
+import uvicorn
+
+DEFAULT_APP = "src.api:app"
+KEEPALIVE_SECONDS = 75
+GRACEFUL_SECONDS = 30
+# A worker that dies sooner than this after starting counts as a crash loop.
+MIN_WORKER_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def tcp_socket(host, port):
+    # proto must be IPPROTO_TCP: asyncio only sets TCP_NODELAY on accepted sockets that say so,
+    # and without it every response waits out the client's delayed ACK (~40 ms).
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def unix_socket(path, mode=0o660):
+    """Bind `path`, replacing a stale socket file left by a previous run."""
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, mode)
+    return sock
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def fast_paths():
+    """(loop, http) implementations: uvloop/httptools when importable."""
+    def importable(name):
+        try:
+            importlib.import_module(name)
+            return True
+        except ImportError:
+            return False
+
+    return ("uvloop" if importable("uvloop") else "asyncio"), ("httptools" if importable("httptools") else "h11")
+
+
+def load_app(target):
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    return module, getattr(module, attr or "app")
+
+
+class Supervisor:
+    """Pre-fork process manager for one app and a fixed set of listening sockets."""
+
+    def __init__(self, module, app, sockets, workers, max_requests=0, **config):
+        self.module = module
+        self.app = app
+        self.sockets = sockets
+        self.workers = workers
+        self.max_requests = max_requests
+        self.config = config
+        self.children = {}  # pid -> ready pipe (read end)
+        self.started = {}
+        self.crashes = 0
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self):
+        """Fork one worker; returns its pid and a pipe that becomes readable once it accepts."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            for fd in [read_fd, *self.children.values()]:
+                os.close(fd)
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            random.seed()
+            code = 0
+            try:
+                warmup = getattr(self.module, "warmup", None)
+                if warmup is not None:
+                    warmup()
+                self._serve(write_fd)
+            except BaseException as e:  # never fall back into the parent's loop
+                print(f"❌ Worker {os.getpid()} failed: {e}")
+                code = 1
+            os._exit(code)
+        os.close(write_fd)
+        self.children[pid] = read_fd
+        self.started[pid] = time.monotonic()
+        return pid
+
+    def _serve(self, ready_fd):
+        # Jitter the recycle point so workers do not all restart together.
+        limit = int(self.max_requests * random.uniform(1.0, 1.1)) if self.max_requests else None
+        config = uvicorn.Config(self.app, limit_max_requests=limit, **self.config)
+        server = uvicorn.Server(config)
+
+        async def run():
+            serving = asyncio.ensure_future(server.serve(sockets=self.sockets))
+            while not server.started and not serving.done():
+                await asyncio.sleep(0.05)
+            os.write(ready_fd, b"1")
+            os.close(ready_fd)
+            await serving
+
+        if hasattr(config, "get_loop_factory"):  # uvicorn >= 0.36
+            with asyncio.Runner(loop_factory=config.get_loop_factory()) as runner:
+                runner.run(run())
+        else:
+            config.setup_event_loop()
+            asyncio.run(run())
+
+    def wait_ready(self, pid, timeout=120.0):
+        deadline = time.monotonic() + timeout
+        fd = self.children[pid]
+        os.set_blocking(fd, False)
+        while time.monotonic() < deadline:
+            try:
+                if os.read(fd, 1):
+                    return True
+            except BlockingIOError:
+                pass
+            if self.reap(pid):
+                return False
+            time.sleep(0.05)
+        return False
+
+    def reap(self, only=None):
+        """Collect exited workers; returns True if `only` (or any worker) has exited."""
+        exited = False
+        for pid in list(self.children):
+            if only is not None and pid != only:
+                continue
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                os.close(self.children.pop(pid))
+                lived = time.monotonic() - self.started.pop(pid)
+                self.crashes = self.crashes + 1 if lived < MIN_WORKER_SECONDS else 0
+                exited = True
+        return exited
+
+    def stop(self, pid):
+        """SIGTERM a worker (uvicorn drains in-flight requests) and wait for it."""
+        timeout = (self.config.get("timeout_graceful_shutdown") or GRACEFUL_SECONDS) + 5
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + timeout
+        while pid in self.children and time.monotonic() < deadline:
+            self.reap(pid)
+            time.sleep(0.05)
+        if pid in self.children:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            os.close(self.children.pop(pid))
+            self.started.pop(pid)
+
+    def rolling_restart(self):
+        preload = getattr(self.module, "preload", None)
+        if preload is not None:
+            print(f"🔄 Reloading artifacts: {preload(reload=True)}")
+        for old in list(self.children):
+            new = self.spawn()
+            if not self.wait_ready(new):
+                print(f"❌ Replacement worker {new} did not start; keeping {old}")
+                continue
+            self.stop(old)
+            print(f"🔄 Worker {old} replaced by {new}")
+
+    def run(self):
+        def on_signal(sig, _frame):
+            if sig == signal.SIGHUP:
+                self.reload_requested = True
+            else:
+                self.stopping = True
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, on_signal)
+
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"🚀 {self.workers} workers started (parent {os.getpid()})")
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            self.reap()
+            while not self.stopping and len(self.children) < self.workers:
+                if self.crashes:
+                    # Back off instead of fork-bombing when workers die at startup.
+                    time.sleep(min(MAX_BACKOFF_SECONDS, 0.5 * 2 ** self.crashes))
+                pid = self.spawn()
+                print(f"🔁 Worker {pid} started to replace an exited worker")
+            time.sleep(0.2)
+
+        for pid in list(self.children):
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.children):
+            self.stop(pid)
+        print("✅ All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with preloaded, pre-forked workers")
+    parser.add_argument("--app", default=os.getenv("APP", DEFAULT_APP))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--uds", default=os.getenv("UDS_PATH"), help="also listen on this Unix socket")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", available_cpus())))
+    parser.add_argument("--keepalive", type=int, default=int(os.getenv("KEEPALIVE_SECONDS", KEEPALIVE_SECONDS)))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_SECONDS", GRACEFUL_SECONDS)))
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", "0")),
+                        help="recycle a worker after about this many requests (0 = never)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    args = parser.parse_args()
+
+    # Workers merge their metrics through this directory; the app reads it at import.
+    metrics_dir = os.environ.get("METRICS_DIR")
+    owns_metrics_dir = not metrics_dir
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".json"):  # left over from a previous run
+                os.unlink(os.path.join(metrics_dir, name))
+    else:
+        metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+
+    started = time.perf_counter()
+    module, app = load_app(args.app)
+    preload = getattr(module, "preload", None)
+    if preload is not None:
+        print(f"⏳ Preloaded {preload()} in {time.perf_counter() - started:.1f}s")
+
+    sockets = [tcp_socket(args.host, args.port)]
+    if args.uds:
+        sockets.append(unix_socket(args.uds))
+    for sock in sockets:
+        sock.listen(args.backlog)
+        sock.set_inheritable(True)
+    loop, http = fast_paths()
+    print(f"🚀 Serving {args.app} on {args.host}:{args.port}" + (f" and unix:{args.uds}" if args.uds else "")
+          + f" (loop={loop}, http={http}, keep-alive={args.keepalive}s)")
+
+    supervisor = Supervisor(module, app, sockets, max(args.workers, 1), args.max_requests,
+                            loop=loop, http=http, timeout_keep_alive=args.keepalive,
+                            timeout_graceful_shutdown=args.graceful_timeout, backlog=args.backlog)
+    try:
+        supervisor.run()
+    finally:
+        if args.uds and os.path.exists(args.uds):
+            os.unlink(args.uds)
+        if owns_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Request tracing: stage spans exported as OTLP/JSON lines.
+
+TracingMiddleware opens a server span per HTTP request. It honours an
+incoming W3C `traceparent` header, or a bare 32-hex `X-Trace-Id`, so spans
+join the caller's trace. Code on the request path marks stages with
+
+    with span("features"):
+        ...
+
+and the span attaches to whatever span is current in the request's
+context (a ContextVar, which sync endpoints inherit in the threadpool). An
+untraced request pays one ContextVar lookup per stage.
+
+Sampling is decided once per trace:
+* a parent that says "sampled" (traceparent flags 01) is always followed;
+* a parent that says "not sampled" is never followed;
+* otherwise the trace id is sampled at TRACE_SAMPLE_RATIO. The decision
+  hashes the id like OpenTelemetry's TraceIdRatioBased sampler, so every
+  service makes the same decision for the same trace.
+
+Finished spans are batched by a background thread. Each batch is written
+as one line in OTLP/JSON (an ExportTraceServiceRequest), the same shape
+the OpenTelemetry Collector's file exporter writes and its otlpjsonfile
+receiver reads. Each worker writes its own `<service>-<pid>.jsonl` under
+TRACE_DIR and rotates it at TRACE_MAX_MB, keeping TRACE_BACKUPS old files.
+"""
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+DEFAULT_SAMPLE_RATIO = 0.1
+DEFAULT_MAX_MB = 50
+DEFAULT_BACKUPS = 3
+BATCH_SIZE = 512
+FLUSH_SECONDS = 1.0
+MAX_QUEUED = 20000
+KIND_INTERNAL, KIND_SERVER = 1, 2
+STATUS_UNSET, STATUS_ERROR = 0, 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_HEX32 = re.compile(r"^[0-9a-f]{32}$")
+_current = ContextVar("current_span", default=None)
+_request = ContextVar("request_span", default=None)
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "kind", "start", "end",
+                 "attributes", "error", "_token")
+
+    def __init__(self, tracer, trace_id, parent_id, name, kind=KIND_INTERNAL, start=None, attributes=None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = start or time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def child(self, name, start=None, **attributes):
+        return Span(self.tracer, self.trace_id, self.span_id, name, start=start, attributes=attributes)
+
+    def finish(self, end=None):
+        self.end = end or time.time_ns()
+        self.tracer.export(self)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.finish()
+
+    def otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_UNSET},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoSpan:
+    """Stand-in used when the request is not being traced."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+def span(name, **attributes):
+    """Child of the current span, as a context manager; a shared no-op when untraced."""
+    parent = _current.get()
+    if parent is None:
+        return NO_SPAN
+    return parent.child(name, **attributes)
+
+
+def record(name, since=None, **attributes):
+    """Record a finished span that started at `since` (epoch ns; default: when the request arrived)."""
+    parent = _current.get()
+    if parent is None:
+        return
+    parent.child(name, start=since or _request.get().start, **attributes).finish()
+
+
+class JsonlExporter:
+    """Background writer of OTLP/JSON lines with size-based rotation."""
+
+    def __init__(self, directory, service, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, backups=DEFAULT_BACKUPS):
+        self.directory = directory
+        self.service = service
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.counters = {"exported": 0, "dropped": 0, "files": 0}
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.service}-{os.getpid()}.jsonl")
+
+    def submit(self, span):
+        if self._pid != os.getpid():  # first span in this worker; threads do not survive fork
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._run, name="trace-export", daemon=True).start()
+        if self._queue.qsize() >= MAX_QUEUED:
+            self.counters["dropped"] += 1
+            return
+        self._queue.put(span)
+
+    def _rotate(self, path):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if self.backups:
+            os.replace(path, f"{path}.1")
+        else:
+            os.unlink(path)
+        self.counters["files"] += 1
+
+    def _write(self, spans):
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", self.service),
+                                        _attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "temple.ml"}, "spans": [s.otlp() for s in spans]}],
+        }]}
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            self._rotate(path)
+        with open(path, "a") as f:
+            f.write(json.dumps(request, separators=(",", ":")) + "\n")
+        self.counters["exported"] += len(spans)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError as e:
+                self.counters["dropped"] += len(batch)
+                print(f"⚠️ Trace export failed: {e}")
+
+
+class Tracer:
+    """Starts server spans for sampled requests and hands finished spans to the exporter."""
+
+    def __init__(self, exporter=None, sample_ratio=DEFAULT_SAMPLE_RATIO):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self.counters = {"traced": 0, "not_sampled": 0}
+        self._bound = int(max(0.0, min(sample_ratio, 1.0)) * (1 << 63))
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def sampled(self, trace_id):
+        # Same rule as OpenTelemetry's TraceIdRatioBased: compare the low 63 bits with ratio * 2^63.
+        return int(trace_id[16:], 16) & ((1 << 63) - 1) < self._bound
+
+    def start(self, name, headers, **attributes):
+        """Server span for a request, or None when the trace is not sampled."""
+        trace_id = parent_id = None
+        sampled = None
+        match = _TRACEPARENT.match(headers.get("traceparent", ""))
+        if match and match.group(1) != "0" * 32:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & 1)
+        elif _HEX32.match(headers.get("x-trace-id", "").lower()):
+            trace_id = headers["x-trace-id"].lower()
+        if trace_id is None:
+            trace_id = f"{random.getrandbits(128):032x}"
+        if sampled is None:
+            sampled = self.sampled(trace_id)
+        if not sampled:
+            self.counters["not_sampled"] += 1
+            return None
+        self.counters["traced"] += 1
+        return Span(self, trace_id, parent_id, name, kind=KIND_SERVER, attributes=attributes)
+
+    def export(self, span):
+        if self.exporter is not None:
+            self.exporter.submit(span)
+
+    def stats(self):
+        exporter = self.exporter
+        return {**self.counters, "sample_ratio": self.sample_ratio, "enabled": self.enabled,
+                **({"export": {**exporter.counters, "path": exporter.path}} if exporter else {})}
+
+
+class TracingMiddleware:
+    """ASGI middleware: one server span per sampled HTTP request.
+
+    Adds `X-Trace-Id` to traced responses so a slow call can be found in
+    the span files.
+    """
+
+    def __init__(self, app, tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            return await self.app(scope, receive, send)
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]
+                   if k in (b"traceparent", b"x-trace-id")}
+        root = self.tracer.start(f"{scope['method']} {scope['path']}", headers,
+                                 **{"http.method": scope["method"], "http.target": scope["path"]})
+        if root is None:
+            return await self.app(scope, receive, send)
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", root.trace_id.encode())]
+                if message["status"] >= 500:
+                    root.error = f"HTTP {message['status']}"
+            await send(message)
+
+        token, request_token = _current.set(root), _request.set(root)
+        try:
+            await self.app(scope, receive, send_traced)
+        except Exception as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            _request.reset(request_token)
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+                root.set("http.route", route.path)
+            root.finish()
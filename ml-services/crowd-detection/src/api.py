@@ -1,8 +1,52 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import Depends, FastAPI, HTTPException, UploadFile, File, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import os
 import uvicorn
+from typing import Literal
+
+from common.admin import admin_guard
+from common.admission import DEFAULT_CAPACITY, AdmissionController, AdmissionMiddleware
+from common.deadline import DeadlineMiddleware, check, deadline_stats, register_deadline_metrics
+from common.memory import DEFAULT_SAMPLE_SECONDS, MemoryMonitor
+from common.metrics import CONTENT_TYPE, DEFAULT_FLUSH_SECONDS, MetricsMiddleware, Registry
+from common.profiler import SamplingProfiler
+from common.recorder import RecorderMiddleware, TrafficRecorder
+from common.tracing import (DEFAULT_BACKUPS, DEFAULT_MAX_MB, DEFAULT_SAMPLE_RATIO, JsonlExporter, Tracer,
+                         TracingMiddleware, record, span)
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MEMORY_SAMPLE_SECONDS = float(os.getenv("MEMORY_SAMPLE_SECONDS", DEFAULT_SAMPLE_SECONDS))
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", DEFAULT_CAPACITY))
+ADMISSION_CAMERA_MAX = int(os.getenv("ADMISSION_CAMERA_MAX", "16"))
+TRACE_DIR = os.getenv("TRACE_DIR")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", DEFAULT_SAMPLE_RATIO))
+TRACE_MAX_MB = int(os.getenv("TRACE_MAX_MB", DEFAULT_MAX_MB))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", DEFAULT_BACKUPS))
+RECORD_DIR = os.getenv("RECORD_DIR")
+RECORD_SAMPLE_RATIO = float(os.getenv("RECORD_SAMPLE_RATIO", "1.0"))
+RECORD_MAX_MB = int(os.getenv("RECORD_MAX_MB", "100"))
+RECORD_BACKUPS = int(os.getenv("RECORD_BACKUPS", "5"))
+RECORD_MAX_BODY_KB = int(os.getenv("RECORD_MAX_BODY_KB", "1024"))
 
 app = FastAPI(title="Temple Crowd Detection API")
+metrics = Registry(METRICS_DIR, METRICS_FLUSH_SECONDS)
+profiler = SamplingProfiler()
+memory = MemoryMonitor(MEMORY_SAMPLE_SECONDS)
+memory.register(metrics)
+# A shed camera frame is superseded by the next one, so frames get a cap and no reserve.
+admission = AdmissionController({"/detect": "camera"}, {"camera": ADMISSION_CAMERA_MAX}, ADMISSION_CAPACITY, 0)
+admission.register(metrics)
+register_deadline_metrics(metrics)
+tracer = Tracer(
+    JsonlExporter(TRACE_DIR, "crowd-detection", TRACE_MAX_MB * 1024 * 1024, TRACE_BACKUPS) if TRACE_DIR else None,
+    TRACE_SAMPLE_RATIO,
+)
+recorder = TrafficRecorder(RECORD_DIR, "crowd-detection", RECORD_SAMPLE_RATIO, RECORD_MAX_MB * 1024 * 1024,
+                           RECORD_BACKUPS, RECORD_MAX_BODY_KB * 1024)
+require_admin = admin_guard(ADMIN_TOKEN)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,16 +55,122 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(AdmissionMiddleware, controller=admission)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware, registry=metrics)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+# Outermost, so frames that admission control sheds are recorded as offered load.
+app.add_middleware(RecorderMiddleware, recorder=recorder, paths=("/detect",))
+
+
+@app.on_event("startup")
+def start_metrics():
+    metrics.start_flusher()
+    memory.start_sampler()
+
+
+@app.on_event("shutdown")
+def flush_metrics():
+    metrics.flush()
+
 
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "crowd-detection"}
 
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape target, merged across common.serve workers (see common/metrics.py)."""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/debug/profile", dependencies=[Depends(require_admin)])
+async def debug_profile(seconds: float = 10, hz: int = 100, idle: bool = False):
+    """Sample this worker's stacks for `seconds`; returns collapsed stacks for a flamegraph."""
+    try:
+        text, samples = await asyncio.get_running_loop().run_in_executor(None, profiler.sample, seconds, hz, idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(text, media_type="text/plain",
+                    headers={"X-Profile-Worker": str(os.getpid()), "X-Profile-Samples": str(samples)})
+
+
+@app.get("/debug/memory", dependencies=[Depends(require_admin)])
+def debug_memory():
+    """RSS history and growth rate for this worker, plus tracemalloc state."""
+    return memory.status()
+
+
+@app.post("/debug/memory/start", dependencies=[Depends(require_admin)])
+def debug_memory_start(frames: int = 10):
+    return {"worker": os.getpid(), "tracing": True, "frames": memory.start(frames)}
+
+
+@app.post("/debug/memory/snapshot", dependencies=[Depends(require_admin)])
+def debug_memory_snapshot():
+    try:
+        return {"id": memory.snapshot(), "worker": os.getpid()}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/debug/memory/diff", dependencies=[Depends(require_admin)])
+async def debug_memory_diff(base: str = None, current: str = None, seconds: float = None, frames: int = 10,
+                            limit: int = 20, group_by: Literal["lineno", "filename", "traceback"] = "lineno"):
+    """Top allocation-site growth between two snapshots (see common/memory.py).
+
+    With `seconds`, snapshots, waits and diffs in this one request and worker.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        if seconds is not None:
+            return await loop.run_in_executor(None, memory.window, seconds, frames, limit, group_by)
+        if base is None:
+            raise HTTPException(status_code=400, detail="Pass base (a snapshot id) or seconds")
+        return await loop.run_in_executor(None, memory.diff, base, current, limit, group_by)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.post("/debug/memory/stop", dependencies=[Depends(require_admin)])
+def debug_memory_stop():
+    memory.stop()
+    return {"worker": os.getpid(), "tracing": False}
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/deadline/stats")
+def get_deadline_stats():
+    return deadline_stats()
+
+
+@app.get("/record/stats")
+def record_stats():
+    return recorder.stats()
+
+
+@app.get("/trace/stats")
+def trace_stats():
+    return tracer.stats()
+
+
 @app.post("/detect")
 async def detect_crowd(file: UploadFile = File(...)):
-    # Mock detection for now
-    return {
-        "count": 42,
-        "density": "moderate",
-        "heatmap": "mock_heatmap_url"
-    }
+    # Multipart parsing and spooling of the upload happen before the endpoint runs.
+    record("decode", content_type=file.content_type or "")
+    # A frame whose caller has given up (deadline passed or camera disconnected) is not worth scoring.
+    check("inference")
+    with span("inference", model="mock"):
+        # Mock detection for now
+        return {
+            "count": 42,
+            "density": "moderate",
+            "heatmap": "mock_heatmap_url"
+        }
@@ -0,0 +1,108 @@
+"""Per-call request decode and response encode cost: untyped dict vs schemas.
+
+    python -m benchmarks.codec --qps 200 --iterations 20000
+
+"dict" is the previous path (json.loads, ad hoc .get() coercion, FastAPI's
+jsonable_encoder + json.dumps on the way out). "typed" is the path the
+endpoints use now: pydantic-core validation from the JSON body and
+ModelResponse rendering. Bodies mirror what the backend and bot send.
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.schemas import (ChatRequest, ChatResponse, ForecastPoint, ForecastRequest, ForecastResponse,
+                         ModelResponse, NodeSeries, PredictRequest, PredictResponse, Reconciliation)
+
+PREDICT_BODY = {"temple_name": "Somnath Temple", "date_str": "2026-11-01", "temperature": None,
+                "rain_flag": None, "moon_phase": "Normal", "is_weekend": 1}
+FORECAST_BODY = {"temples": ["somnath", "dwarka", "ambaji", "pavagadh"], "days": 7,
+                 "hierarchy": {"regions": {"Saurashtra": ["somnath", "dwarka"]}}, "reconcile": "ols"}
+CHAT_BODY = {"query": "When is the best time to visit Ambaji?", "context": "Ambaji: 62% full"}
+
+
+def forecast_result(days=7, temples=4, regions=1):
+    dates = [f"2026-11-{d + 1:02d}" for d in range(days)]
+    points = [{"timestamp": d, "temple": f"temple{t}", "predicted_count": 18000 + t, "crowd_status": "Normal"}
+              for t in range(temples) for d in dates]
+    keys = ["total"] + [f"region/r{r}" for r in range(regions)] + [f"temple/temple{t}" for t in range(temples)]
+    nodes = {k: {"base": [18000.5] * days, "reconciled": [18000.4] * days} for k in keys}
+    return {"dates": dates, "predictions": points, "reconciliation": {"method": "ols", "nodes": nodes}}
+
+
+def typed_forecast(result):
+    return ForecastResponse.model_construct(
+        dates=result["dates"],
+        predictions=[ForecastPoint.model_construct(**p) for p in result["predictions"]],
+        reconciliation=Reconciliation.model_construct(
+            method="ols",
+            nodes={k: NodeSeries.model_construct(**v) for k, v in result["reconciliation"]["nodes"].items()},
+        ),
+    )
+
+
+def dict_predict(raw):
+    data = json.loads(raw)
+    t, r = data.get("temperature"), data.get("rain_flag")
+    return (str(data.get("temple_name", "")), data.get("date_str"), None if t is None else float(t),
+            None if r is None else int(r), data.get("moon_phase", "Normal"))
+
+
+def dict_forecast(raw):
+    data = json.loads(raw)
+    spec = data.get("hierarchy") or {}
+    return (data.get("temples") or [data.get("temple_name")], int(data.get("days", 7)), spec.get("regions"),
+            spec.get("slots"), data.get("reconcile", "ols"))
+
+
+def dict_chat(raw):
+    data = json.loads(raw)
+    return data.get("query", ""), data.get("context", "")
+
+
+def per_call(fn, arg, iterations):
+    fn(arg)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--qps", type=float, default=200.0, help="booking-path requests per second")
+    args = parser.parse_args()
+
+    result = forecast_result()
+    predict_out = {"predicted_visitors": 28585, "crowd_status": "Normal"}
+    chat_out = {"answer": "Based on current data: Ambaji: 62% full. Please visit during off-peak hours."}
+    cases = [
+        ("predict", json.dumps(PREDICT_BODY).encode(), dict_predict, PredictRequest, predict_out,
+         lambda: PredictResponse.model_construct(**predict_out)),
+        ("forecast", json.dumps(FORECAST_BODY).encode(), dict_forecast, ForecastRequest, result,
+         lambda: typed_forecast(result)),
+        ("chat", json.dumps(CHAT_BODY).encode(), dict_chat, ChatRequest, chat_out,
+         lambda: ChatResponse.model_construct(**chat_out)),
+    ]
+
+    print(f"⏳ {args.iterations:,} iterations per measurement")
+    print(f"{'endpoint':<10}{'decode dict':>13}{'decode typed':>14}{'encode dict':>13}{'encode typed':>14}  (us/call)")
+    for name, raw, dict_decode, model, out, build in cases:
+        dec_dict = per_call(dict_decode, raw, args.iterations)
+        dec_typed = per_call(model.model_validate_json, raw, args.iterations)
+        enc_dict = per_call(lambda o: JSONResponse(jsonable_encoder(o)).body, out, args.iterations)
+        enc_typed = per_call(lambda _: ModelResponse(build()).body, None, args.iterations)
+        print(f"{name:<10}{dec_dict:>13.1f}{dec_typed:>14.1f}{enc_dict:>13.1f}{enc_typed:>14.1f}")
+        if name == "predict":
+            booking = (dec_dict + enc_dict, dec_typed + enc_typed)
+
+    core_ms = [us * args.qps / 1000 for us in booking]
+    print(f"✅ /predict codec at {args.qps:.0f} QPS: {core_ms[0]:.2f} -> {core_ms[1]:.2f} ms of CPU per second")
+
+
+if __name__ == "__main__":
+    main()
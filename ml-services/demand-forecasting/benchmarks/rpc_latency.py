@@ -0,0 +1,86 @@
+"""Round-trip latency per transport: JSON/TCP vs msgpack/TCP vs msgpack/UDS.
+
+    PYTHONPATH=.. python -m common.serve --port 8000 --uds /tmp/forecast.sock &
+    python -m benchmarks.rpc_latency --url http://127.0.0.1:8000 --uds /tmp/forecast.sock
+
+Each transport sends the backend's booking body to /predict sequentially
+over one keep-alive connection (as axios does with an agent), after a
+warmup. `--endpoint chat` uses the inference-free /chat instead, which
+isolates the encoding and transport share of the round trip.
+"""
+import argparse
+import http.client
+import json
+import socket
+import time
+from urllib.parse import urlparse
+
+import msgpack
+import numpy as np
+
+BODIES = {
+    "predict": {"temple_name": "Somnath Temple", "date_str": "2026-11-01", "temperature": None,
+                "rain_flag": None, "moon_phase": "Normal", "is_weekend": 1},
+    "chat": {"query": "When is the best time to visit Ambaji?", "context": "Ambaji: 62% full"},
+}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def run(conn, endpoint, content_type, requests, warmup):
+    if content_type == "application/msgpack":
+        body, decode = msgpack.packb(BODIES[endpoint]), msgpack.unpackb
+    else:
+        body, decode = json.dumps(BODIES[endpoint]).encode(), json.loads
+    headers = {"Content-Type": content_type, "Accept": content_type}
+    timings = []
+    for i in range(warmup + requests):
+        started = time.perf_counter()
+        conn.request("POST", "/" + endpoint, body, headers)
+        response = conn.getresponse()
+        payload = decode(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"/{endpoint} returned {response.status}: {payload}")
+        if i >= warmup:
+            timings.append(time.perf_counter() - started)
+    return np.array(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--uds", help="Unix socket the service listens on (skips msgpack/UDS if omitted)")
+    parser.add_argument("--endpoint", choices=sorted(BODIES), default="predict")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    transports = [
+        ("json/tcp", lambda: http.client.HTTPConnection(url.hostname, url.port or 80), "application/json"),
+        ("msgpack/tcp", lambda: http.client.HTTPConnection(url.hostname, url.port or 80), "application/msgpack"),
+    ]
+    if args.uds:
+        transports.append(("msgpack/uds", lambda: UnixHTTPConnection(args.uds), "application/msgpack"))
+
+    print(f"⏳ {args.requests:,} sequential /{args.endpoint} calls per transport")
+    print(f"{'transport':<14}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+    for name, connect, content_type in transports:
+        conn = connect()
+        ms = run(conn, args.endpoint, content_type, args.requests, args.warmup)
+        conn.close()
+        p50, p99 = np.percentile(ms, [50, 99])
+        print(f"{name:<14}{p50:>9.3f}{p99:>9.3f}{ms.mean():>9.3f}")
+    print("✅ Done")
+
+
+if __name__ == "__main__":
+    main()
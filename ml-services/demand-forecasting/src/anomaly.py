@@ -0,0 +1,182 @@
+"""Streaming entry-rate anomaly detection for live gate events.
+
+CrowdTracker.checkThresholds only reacts once the live count is at 85%/95%
+of capacity. Festival surges show up earlier as an unusual entry *rate*, so
+this detector keeps, per temple and hour-of-week, an exponentially weighted
+mean and variance of entries per minute, and per temple a smoothed residual
+(level + trend) of the standardised rate. An alert fires when the residual
+projected `lead_minutes` ahead crosses the threshold.
+
+State is a handful of float arrays sized (temples, 168): O(1) per temple
+and hour-of-week regardless of how many events stream through. Events are
+binned with np.add.at and every minute closes for all temples in one
+vectorised update.
+"""
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+HOURS_PER_WEEK = 168
+DEFAULT_THRESHOLD = 4.0
+DEFAULT_LEAD_MINUTES = 15
+# Minutes of history for an hour-of-week slot (one week of that hour) before it may alert.
+WARMUP_MINUTES = 60
+# Forgetting factor of the baseline once warmed up (~ a few weeks of that hour).
+BASELINE_DECAY = 0.005
+# Smoothing of the standardised residual (level and trend).
+LEVEL_ALPHA = 0.3
+TREND_BETA = 0.1
+# Gaps longer than this are not back-filled minute by minute.
+MAX_GAP_MINUTES = 60
+
+
+class EntryRateDetector:
+    """Per temple / hour-of-week baseline with an EWMA residual alarm."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, lead_minutes=DEFAULT_LEAD_MINUTES,
+                 capacity=64, max_alerts=1000):
+        self.threshold = threshold
+        self.lead_minutes = lead_minutes
+        self._lock = threading.Lock()
+        self.temples = {}
+        self.names = []
+        self._alloc(capacity)
+        self.minute = None  # currently open minute (epoch minutes)
+        self.alerts = deque(maxlen=max_alerts)
+        self.counters = {"events": 0, "minutes_closed": 0, "alerts": 0}
+
+    def _alloc(self, capacity):
+        """(Re)size the state arrays, keeping existing rows."""
+        def grow(name, shape, dtype=np.float64):
+            out = np.zeros(shape, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                out[: len(old)] = old
+            setattr(self, name, out)
+
+        for name in ("mean", "var", "seen"):
+            grow(name, (capacity, HOURS_PER_WEEK))
+        for name in ("level", "trend", "pending"):
+            grow(name, capacity)
+        grow("alerting", capacity, bool)
+
+    def _index(self, temple_ids):
+        """Map temple ids to rows; only the distinct ids touch Python."""
+        uniq, inverse = np.unique(np.asarray(temple_ids, dtype=object).astype(str), return_inverse=True)
+        rows = np.empty(len(uniq), dtype=np.int64)
+        for i, name in enumerate(uniq):
+            row = self.temples.get(name)
+            if row is None:
+                row = self.temples[name] = len(self.names)
+                self.names.append(name)
+            rows[i] = row
+        if len(self.names) > len(self.mean):
+            self._alloc(max(len(self.names), 2 * len(self.mean)))
+        return rows[inverse]
+
+    def ingest(self, temple_ids, timestamps, counts=None):
+        """Add a batch of gate events (epoch seconds); returns alerts raised."""
+        ts = np.asarray(timestamps, dtype=np.int64)
+        counts = np.ones(len(ts)) if counts is None else np.asarray(counts, dtype=np.float64)
+        if len(ts) == 0:
+            return []
+        with self._lock:
+            rows = self._index(temple_ids)
+            if np.any(ts[1:] < ts[:-1]):
+                order = np.argsort(ts, kind="stable")
+                ts, rows, counts = ts[order], rows[order], counts[order]
+            minutes = ts // 60
+            if self.minute is None:
+                self.minute = int(minutes[0])
+
+            raised = []
+            start = 0
+            # Split the batch at minute boundaries; each closed minute is one vectorised update.
+            while start < len(ts):
+                end = int(np.searchsorted(minutes, self.minute + 1, side="left"))
+                np.add.at(self.pending, rows[start:end], counts[start:end])
+                start = max(start, end)
+                if start < len(ts):
+                    raised.extend(self._advance_to(int(minutes[start])))
+            self.counters["events"] += len(ts)
+            return raised
+
+    def flush(self, now_seconds):
+        """Close every minute before `now_seconds` (call on a timer when traffic stops)."""
+        with self._lock:
+            if self.minute is None:
+                return []
+            return self._advance_to(int(now_seconds) // 60)
+
+    def _advance_to(self, minute):
+        raised = []
+        gap = minute - self.minute
+        if gap > MAX_GAP_MINUTES:
+            raised.extend(self._close_minute())
+            self.minute = minute
+            return raised
+        while self.minute < minute:
+            raised.extend(self._close_minute())
+        return raised
+
+    def _close_minute(self):
+        n = len(self.names)
+        ts = pd.Timestamp(self.minute * 60, unit="s")
+        how = ts.dayofweek * 24 + ts.hour
+        x = self.pending[:n].copy()
+        self.pending[:n] = 0.0
+        self.minute += 1
+
+        mean, var, seen = self.mean[:n, how], self.var[:n, how], self.seen[:n, how]
+        warm = seen >= WARMUP_MINUTES
+        sd = np.sqrt(var + 1.0)  # +1: Poisson floor so quiet hours are not hair-trigger
+        z = np.where(warm, (x - mean) / sd, 0.0)
+
+        level = LEVEL_ALPHA * z + (1 - LEVEL_ALPHA) * self.level[:n]
+        trend = TREND_BETA * (level - self.level[:n]) + (1 - TREND_BETA) * self.trend[:n]
+        projected = level + np.maximum(trend, 0.0) * self.lead_minutes
+        self.level[:n], self.trend[:n] = level, trend
+
+        # Baseline update: running mean until warm, then exponential forgetting;
+        # anomalous minutes are clipped so a surge does not become the new normal.
+        w = np.where(warm, BASELINE_DECAY, 1.0 / (seen + 1.0))
+        x_clipped = np.where(warm, np.clip(x, mean - 4 * sd, mean + 4 * sd), x)
+        delta = x_clipped - mean
+        self.mean[:n, how] = mean + w * delta
+        self.var[:n, how] = (1 - w) * (var + w * delta * delta)
+        self.seen[:n, how] = seen + 1
+
+        # The projection buys lead time, but only once the residual is already elevated.
+        fire = warm & (level > self.threshold / 2) & (projected > self.threshold) & ~self.alerting[:n]
+        # Re-arm once the residual has settled back to half the threshold.
+        self.alerting[:n] = (self.alerting[:n] & (level > self.threshold / 2)) | fire
+        self.counters["minutes_closed"] += 1
+
+        raised = []
+        for row in np.flatnonzero(fire):
+            alert = {
+                "temple": self.names[row],
+                "minute": ts.isoformat(),
+                "entries_per_minute": float(x[row]),
+                "expected_per_minute": round(float(mean[row]), 1),
+                "score": round(float(level[row]), 2),
+                "projected_score": round(float(projected[row]), 2),
+                "lead_minutes": self.lead_minutes,
+            }
+            raised.append(alert)
+            self.alerts.append(alert)
+        self.counters["alerts"] += len(raised)
+        return raised
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "temples": len(self.names),
+                "state_bytes": sum(a.nbytes for a in (self.mean, self.var, self.seen, self.level,
+                                                      self.trend, self.alerting, self.pending)),
+                "threshold": self.threshold,
+                "lead_minutes": self.lead_minutes,
+            }
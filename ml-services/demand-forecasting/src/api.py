@@ -1,9 +1,183 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from typing import List
+import anyio
+import asyncio
+import json
+import numpy as np
+import os
+import threading
+import time
+from typing import List, Literal, Optional
+from zoneinfo import ZoneInfo
+
+from common.admin import admin_guard
+from common.admission import DEFAULT_CAPACITY, DEFAULT_RESERVED, AdmissionController, AdmissionMiddleware
+from common.deadline import DeadlineMiddleware, deadline_stats, expired, mark_partial, register_deadline_metrics
+from common.memory import DEFAULT_SAMPLE_SECONDS, MemoryMonitor
+from common.metrics import CONTENT_TYPE, DEFAULT_FLUSH_SECONDS, MetricsMiddleware, Registry
+from common.profiler import SamplingProfiler
+from common.recorder import RecorderMiddleware, TrafficRecorder
+from common.tracing import (DEFAULT_BACKUPS, DEFAULT_MAX_MB, DEFAULT_SAMPLE_RATIO, JsonlExporter, Tracer,
+                         TracingMiddleware, record, span)
+from src.anomaly import DEFAULT_LEAD_MINUTES, DEFAULT_THRESHOLD, EntryRateDetector
+from src.capacity import plan
+from src.climatology import Climatology
+from src.drift import DriftMonitor
+from src.explain import ExplanationCache, ExplanationUnavailable
+from src.export import DEFAULT_DAYS, DEFAULT_REFRESH_SECONDS, ForecastExport, decode
+from src.features import crowd_status
+from src.forecast import DEFAULT_SLOTS, daily_forecast, hierarchy_base, horizon_dates, scenario_grid, slot_weights
+from src.prediction_cache import DEFAULT_MAX_ENTRIES, DEFAULT_MEMORY_ENTRIES, PredictionCache
+from src.queue_sim import WaitTimeSimulator
+from src.reconcile import Hierarchy, reconcile
+from src.rpc import MsgpackRoute, RPCResponse
+from src.schemas import (AlertTickRequest, ChatRequest, ChatResponse, ExplainRequest, FlushRequest, ForecastPoint,
+                         ForecastRequest, ForecastResponse, GateEventBatch, HierarchySpec, ModelResponse, NodeSeries,
+                         PredictRequest, PredictResponse, Reconciliation, ScenarioRequest, SlotCapacityRequest,
+                         WaitTimeRequest)
+from src.shards import ShardStore
+from src.stream import HEARTBEAT_SECONDS, TEMPLE_TZ, TOPICS, DeltaBroadcaster, forecast_entries, nowcast_entries
+from src.threshold_alerts import ThresholdAlertEngine
+from src.warmup import Readiness, warm
+
+MODEL_PATH = os.getenv("MODEL_PATH", "models")
+SHARD_CACHE_MB = int(os.getenv("SHARD_CACHE_MB", "512"))
+EXPLAIN_HORIZON_DAYS = int(os.getenv("EXPLAIN_HORIZON_DAYS", "90"))
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", DEFAULT_THRESHOLD))
+ANOMALY_LEAD_MINUTES = int(os.getenv("ANOMALY_LEAD_MINUTES", DEFAULT_LEAD_MINUTES))
+ALERT_LEAD_MINUTES = int(os.getenv("ALERT_LEAD_MINUTES", "30"))
+ALERT_BAND_PCT = float(os.getenv("ALERT_BAND_PCT", "5"))
+ALERT_COOLDOWN_MINUTES = float(os.getenv("ALERT_COOLDOWN_MINUTES", "10"))
+EXPORT_DAYS = int(os.getenv("EXPORT_DAYS", DEFAULT_DAYS))
+EXPORT_REFRESH_SECONDS = float(os.getenv("EXPORT_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS))
+STREAM_MAX_PENDING = int(os.getenv("STREAM_MAX_PENDING", "20000"))
+# IANA name for the nowcast slot hours; unset means Asia/Kolkata as a fixed offset.
+STREAM_TZ = ZoneInfo(os.getenv("TEMPLE_TZ")) if os.getenv("TEMPLE_TZ") else TEMPLE_TZ
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MEMORY_SAMPLE_SECONDS = float(os.getenv("MEMORY_SAMPLE_SECONDS", DEFAULT_SAMPLE_SECONDS))
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", DEFAULT_CAPACITY))
+ADMISSION_BOOKING_RESERVED = int(os.getenv("ADMISSION_BOOKING_RESERVED", DEFAULT_RESERVED))
+ADMISSION_DASHBOARD_MAX = int(os.getenv("ADMISSION_DASHBOARD_MAX", "16"))
+ADMISSION_BOT_MAX = int(os.getenv("ADMISSION_BOT_MAX", "4"))
+TRACE_DIR = os.getenv("TRACE_DIR")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", DEFAULT_SAMPLE_RATIO))
+TRACE_MAX_MB = int(os.getenv("TRACE_MAX_MB", DEFAULT_MAX_MB))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", DEFAULT_BACKUPS))
+RECORD_DIR = os.getenv("RECORD_DIR")
+RECORD_SAMPLE_RATIO = float(os.getenv("RECORD_SAMPLE_RATIO", "1.0"))
+RECORD_MAX_MB = int(os.getenv("RECORD_MAX_MB", "100"))
+RECORD_BACKUPS = int(os.getenv("RECORD_BACKUPS", "5"))
+RECORD_MAX_BODY_KB = int(os.getenv("RECORD_MAX_BODY_KB", "1024"))
+SCENARIO_MAX_CELLS = int(os.getenv("SCENARIO_MAX_CELLS", "200000"))
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH")
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+PREDICTION_CACHE_MEMORY_ENTRIES = int(os.getenv("PREDICTION_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES))
+
+app = FastAPI(title="Temple Demand Forecasting API", default_response_class=RPCResponse)
+app.router.route_class = MsgpackRoute
+
+shards = ShardStore(MODEL_PATH, max_resident_bytes=SHARD_CACHE_MB * 1024 * 1024)
+prediction_cache = (PredictionCache(PREDICTION_CACHE_PATH, PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MEMORY_ENTRIES)
+                    if PREDICTION_CACHE_PATH else None)
+shards.cache = prediction_cache
+climatology = Climatology.load(MODEL_PATH)
+explanations = ExplanationCache(shards, climatology)
+wait_times = WaitTimeSimulator(shards, climatology)
+entry_rates = EntryRateDetector(ANOMALY_THRESHOLD, ANOMALY_LEAD_MINUTES)
+drift = DriftMonitor.load(MODEL_PATH)
+capacity_alerts = ThresholdAlertEngine(ALERT_LEAD_MINUTES, ALERT_BAND_PCT, ALERT_COOLDOWN_MINUTES)
+forecast_export = ForecastExport(shards, climatology, EXPORT_DAYS, EXPORT_REFRESH_SECONDS)
+updates = DeltaBroadcaster(STREAM_MAX_PENDING)
+readiness = Readiness()
+metrics = Registry(METRICS_DIR, METRICS_FLUSH_SECONDS)
+threadpool = {}
+profiler = SamplingProfiler()
+memory = MemoryMonitor(MEMORY_SAMPLE_SECONDS)
+memory.register(metrics)
+# /predict is the booking guard and is never shed; unlisted paths are not counted.
+admission = AdmissionController(
+    {
+        "/predict": "booking",
+        "/forecast": "dashboard",
+        "/explain": "dashboard",
+        "/simulate/wait-times": "dashboard",
+        "/scenarios/grid": "dashboard",
+        "/optimize/slot-capacity": "dashboard",
+        "/export/forecast": "dashboard",
+        "/chat": "bot",
+    },
+    {"dashboard": ADMISSION_DASHBOARD_MAX, "bot": ADMISSION_BOT_MAX},
+    ADMISSION_CAPACITY,
+    ADMISSION_BOOKING_RESERVED,
+)
+admission.register(metrics)
+register_deadline_metrics(metrics)
+tracer = Tracer(
+    JsonlExporter(TRACE_DIR, "demand-forecasting", TRACE_MAX_MB * 1024 * 1024, TRACE_BACKUPS) if TRACE_DIR else None,
+    TRACE_SAMPLE_RATIO,
+)
+recorder = TrafficRecorder(RECORD_DIR, "demand-forecasting", RECORD_SAMPLE_RATIO, RECORD_MAX_MB * 1024 * 1024,
+                           RECORD_BACKUPS, RECORD_MAX_BODY_KB * 1024)
+require_admin = admin_guard(ADMIN_TOKEN)
+
+metrics.describe("model_inference_seconds", "histogram", "Model predict() time per call, excluding feature building.",
+                 ("shard",), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+metrics.describe("model_info", "gauge", "Resident model shards and their trained version.", ("shard", "version"))
+metrics.describe("cache_requests", "counter", "Cache lookups by cache and result.", ("cache", "result"))
+metrics.describe("cache_hit_ratio", "gauge", "Hits / lookups since this worker started.", ("cache",))
+metrics.describe("threadpool_busy_threads", "gauge", "Sync endpoints running in the worker threadpool.")
+metrics.describe("threadpool_queued_tasks", "gauge", "Sync endpoints waiting for a threadpool slot.")
+metrics.describe("stream_pending_updates", "gauge", "Coalesced /stream updates not yet sent to subscribers.")
+metrics.describe("stream_subscribers", "gauge", "Open /stream connections.")
+metrics.describe("warmup_seconds", "gauge", "Time this worker spent in warmup before it went ready.")
+metrics.describe("ready", "gauge", "1 once warmup has finished, else 0.")
+shards.on_infer = lambda shard, seconds: metrics.observe("model_inference_seconds", (shard.name,), seconds)
+
+
+@metrics.collector
+def collect():
+    samples = [("model_info", (name, str(version)), 1) for name, version in shards.versions()]
+    shard_stats = shards.stats()
+    caches = {
+        "shards": (shard_stats["hits"], shard_stats["loads"]),
+        **{name: (c["hits"], c["misses"]) for name, c in
+           (("explain", explanations.stats()), ("simulate", wait_times.stats()))},
+    }
+    if prediction_cache is not None:
+        c = prediction_cache.stats()
+        caches["predictions"] = (c["memory_hits"] + c["disk_hits"], c["misses"])
+    for cache, (hits, misses) in caches.items():
+        samples += [("cache_requests", (cache, "hit"), hits), ("cache_requests", (cache, "miss"), misses)]
+        samples.append(("cache_hit_ratio", (cache,), hits / (hits + misses) if hits + misses else float("nan")))
+    limiter = threadpool.get("limiter")
+    if limiter is not None:
+        pool = limiter.statistics()
+        samples += [("threadpool_busy_threads", (), pool.borrowed_tokens),
+                    ("threadpool_queued_tasks", (), pool.tasks_waiting)]
+    stream = updates.stats()
+    samples += [("stream_pending_updates", (), stream["pending"]), ("stream_subscribers", (), stream["subscribers"])]
+    status = readiness.status()
+    samples += [("warmup_seconds", (), status["warmup_seconds"]), ("ready", (), int(readiness.ready))]
+    return samples
+
+
+def preload(reload=False):
+    """Load model shards before common.serve forks workers, so pages are shared copy-on-write."""
+    loaded = shards.preload(reload)
+    warm_prediction_cache()
+    return loaded
+
+
+def warm_prediction_cache():
+    """Pull the resident shard versions' newest cached predictions into memory."""
+    if prediction_cache is not None:
+        count = prediction_cache.warm([f"{name}@{version}" for name, version in shards.versions()])
+        print(f"💾 Prediction cache: {count:,} entries warm-loaded from {PREDICTION_CACHE_PATH}")
 
-app = FastAPI(title="Temple Demand Forecasting API")
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,40 +186,530 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(AdmissionMiddleware, controller=admission)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware, registry=metrics)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+# Outermost, so requests that admission control sheds are recorded as offered load.
+app.add_middleware(RecorderMiddleware, recorder=recorder, paths=("/predict", "/forecast", "/scenarios/grid", "/chat"))
+
+def warmup():
+    """Representative predictions in this process; common.serve runs it in each worker before it accepts."""
+    readiness.run(lambda: warm(shards, climatology, shards.known_temples() or ["somnath"]))
+
+
+@app.on_event("startup")
+def start_warmup():
+    """Under plain uvicorn, warm up in the background while /ready reports 503."""
+    if readiness.state == "starting":
+        def run():
+            calls = warm(shards, climatology, shards.known_temples() or ["somnath"])
+            # No preload() ran, so the shards warm() just loaded decide what to pull in.
+            warm_prediction_cache()
+            return calls
+        readiness.start(run)
+
+
+@app.on_event("startup")
+async def start_metrics():
+    """Capture the threadpool limiter (needs the event loop) and start flushing to METRICS_DIR."""
+    threadpool["limiter"] = anyio.to_thread.current_default_thread_limiter()
+    metrics.start_flusher()
+    memory.start_sampler()
+
+
+@app.on_event("shutdown")
+def flush_metrics():
+    metrics.flush()
+
+
+@app.on_event("startup")
+def precompute_explanations():
+    """Explain the forecast horizon in the background so /explain is a lookup."""
+    dates = horizon_dates(days=EXPLAIN_HORIZON_DAYS)
+    threading.Thread(
+        target=lambda: explanations.precompute(shards.known_temples(), dates),
+        name="explain-precompute",
+        daemon=True,
+    ).start()
+
+
+@app.on_event("startup")
+def start_forecast_publisher():
+    """Rebuild the export cube on its refresh interval and push changed slots to /stream."""
+    def run():
+        etag = None
+        while True:
+            try:
+                payload, new_etag = forecast_export.current()
+                if new_etag != etag:
+                    temples, first_date, values, _ = decode(payload)
+                    updates.publish("forecast", forecast_entries(temples, first_date, values, DEFAULT_SLOTS),
+                                    replace=True)
+                    etag = new_etag
+            except Exception as e:
+                print(f"⚠️ Forecast publish failed: {e}")
+            time.sleep(EXPORT_REFRESH_SECONDS)
+
+    threading.Thread(target=run, name="forecast-publisher", daemon=True).start()
+
 
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "demand-forecasting"}
 
-@app.post("/forecast")
-def get_forecast(data: dict):
-    # Mock forecast for now
-    return {
-        "prediction": 150,
-        "confidence": 0.85,
-        "trend": "increasing"
-    }
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape target, merged across common.serve workers (see common/metrics.py)."""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
 
-@app.post("/predict")
-def predict(data: dict):
+
+@app.get("/debug/profile", dependencies=[Depends(require_admin)])
+async def debug_profile(seconds: float = 10, hz: int = 100, idle: bool = False):
+    """Sample this worker's stacks for `seconds`; returns collapsed stacks for a flamegraph.
+
+    Runs on its own thread so the sampled threadpool and event loop keep serving.
+    """
+    try:
+        text, samples = await asyncio.get_running_loop().run_in_executor(None, profiler.sample, seconds, hz, idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(text, media_type="text/plain",
+                    headers={"X-Profile-Worker": str(os.getpid()), "X-Profile-Samples": str(samples)})
+
+
+@app.get("/debug/memory", dependencies=[Depends(require_admin)])
+def debug_memory():
+    """RSS history and growth rate for this worker, plus tracemalloc state."""
+    return memory.status()
+
+
+@app.post("/debug/memory/start", dependencies=[Depends(require_admin)])
+def debug_memory_start(frames: int = 10):
+    return {"worker": os.getpid(), "tracing": True, "frames": memory.start(frames)}
+
+
+@app.post("/debug/memory/snapshot", dependencies=[Depends(require_admin)])
+def debug_memory_snapshot():
+    try:
+        return {"id": memory.snapshot(), "worker": os.getpid()}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/debug/memory/diff", dependencies=[Depends(require_admin)])
+async def debug_memory_diff(base: str = None, current: str = None, seconds: float = None, frames: int = 10,
+                            limit: int = 20, group_by: Literal["lineno", "filename", "traceback"] = "lineno"):
+    """Top allocation-site growth between two snapshots (see common/memory.py).
+
+    With `seconds`, snapshots, waits and diffs in this one request and worker.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        if seconds is not None:
+            return await loop.run_in_executor(None, memory.window, seconds, frames, limit, group_by)
+        if base is None:
+            raise HTTPException(status_code=400, detail="Pass base (a snapshot id) or seconds")
+        return await loop.run_in_executor(None, memory.diff, base, current, limit, group_by)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.post("/debug/memory/stop", dependencies=[Depends(require_admin)])
+def debug_memory_stop():
+    memory.stop()
+    return {"worker": os.getpid(), "tracing": False}
+
+
+@app.get("/ready")
+def ready_check():
+    """Readiness: 200 once artifacts are loaded and warmup inferences have run, else 503."""
+    status = {**readiness.status(), "service": "demand-forecasting"}
+    return JSONResponse(status, status_code=200 if readiness.ready else 503)
+
+@app.post("/forecast", response_model=ForecastResponse)
+def get_forecast(data: ForecastRequest):
+    """Multi-day forecast for one or more temples, reconciled across
+    region -> temple -> slot levels.
+
+    Optional keys: `hierarchy` ({"regions": {region: [temples]}, "slots":
+    {temple: [slot labels]} or [slot labels]}), `base` (node key -> base
+    forecasts overriding the model, e.g. {"region/Saurashtra": [...]}),
+    `reconcile` ("ols", "wls_struct", "mint_shrink" or "none") and
+    `residuals` (node key -> in-sample residuals, required for mint_shrink).
+    """
+    record("decode")
+    temples = data.temple_list()
+    try:
+        dates = horizon_dates(data.start_date, data.days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid start_date: {e}")
+    with span("forecast", temples=len(temples), days=len(dates)):
+        daily = daily_forecast(
+            shards, climatology, temples, dates, data.temperature, data.rain_flag, data.moon_phase,
+        )
+
+    spec = data.hierarchy or HierarchySpec()
+    slots = spec.slots or {}
+    if isinstance(slots, list):
+        slots = {t: slots for t in temples}
+    hierarchy = Hierarchy(temples, spec.regions, slots)
+    keys = hierarchy.keys()
+    method = data.reconcile
+
+    try:
+        with span("reconcile", method=method, nodes=len(keys)):
+            base = hierarchy_base(hierarchy, temples, daily, data.base)
+            if method == "none":
+                coherent = base
+            else:
+                residuals = data.residuals
+                if residuals is not None:
+                    residuals = [residuals[k] for k in keys]
+                coherent = reconcile(hierarchy.S, base, method, residuals)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Reconciliation failed: {e}")
+
+    # Built from trusted values, so skip re-validation and go straight to the serializer.
+    row = {k: i for i, k in enumerate(keys)}
+    day_labels = [d.strftime("%Y-%m-%d") for d in dates]
+    predictions = []
+    for temple in temples:
+        values = coherent[row[Hierarchy.key(("temple", temple, None))]]
+        for day, value in zip(day_labels, values):
+            predictions.append(ForecastPoint.model_construct(
+                timestamp=day, temple=temple, predicted_count=int(value), crowd_status=crowd_status(value),
+            ))
+
+    return ModelResponse(ForecastResponse.model_construct(
+        dates=day_labels,
+        predictions=predictions,
+        reconciliation=Reconciliation.model_construct(
+            method=method,
+            nodes={
+                k: NodeSeries.model_construct(base=base[i].round(1).tolist(), reconciled=coherent[i].round(1).tolist())
+                for i, k in enumerate(keys)
+            },
+        ),
+    ))
+
+
+@app.post("/predict", response_model=PredictResponse)
+def predict(data: PredictRequest):
     """Backend-compatible crowd prediction endpoint."""
-    # Mock prediction - can be replaced with LSTM model inference
-    import random
-    base = 500 + random.randint(0, 1500)
-    pred = base * (1.5 if data.get("is_weekend", 0) else 1)
-    status = "CRITICAL" if pred > 8000 else "HIGH" if pred > 5000 else "Normal"
+    record("decode")
+    temple = data.temple_name
+    dates = [data.date_str]
+    with span("climatology"):
+        temperature, rain_flag = climatology.fill(temple, dates, data.temperature, data.rain_flag)
+    pred = shards.predict(temple, dates, temperature, rain_flag, data.moon_phase)[0]
+    drift.record(temple, dates[0], temperature[0], rain_flag[0], data.moon_phase, pred)
+    return ModelResponse(PredictResponse.model_construct(
+        predicted_visitors=int(pred),
+        crowd_status=crowd_status(pred),
+    ))
+
+
+@app.post("/scenarios/grid")
+def scenarios(data: ScenarioRequest):
+    """What-if footfall for every combination of temple, date, temperature, rain and moon phase.
+
+    Dates run from `start_date` to `end_date` (or for `days`). Leaving out
+    `temperatures` uses each temple's climatological temperature per day.
+    `predicted_visitors` is a nested list indexed in `axes` order, so
+    predicted_visitors[t][d][k][r][m] is temple t, date d, temperature k,
+    rain flag r and moon phase m.
+    """
+    record("decode")
+    temples = data.temple_list()
+    try:
+        dates = horizon_dates(data.start_date, data.days, data.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date range: {e}")
+    if not 1 <= len(dates) <= 366:
+        raise HTTPException(status_code=400, detail=f"Date range must cover 1-366 days, got {len(dates)}")
+    temperatures = data.temperatures
+    cells = len(temples) * len(dates) * len(temperatures or [None]) * len(data.rain_flags) * len(data.moon_phases)
+    if cells > SCENARIO_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Grid has {cells:,} cells; the limit is {SCENARIO_MAX_CELLS:,}")
+
+    with span("scenario_grid", temples=len(temples), cells=cells):
+        pred = scenario_grid(shards, climatology, temples, dates, temperatures, data.rain_flags, data.moon_phases)
     return {
-        "predicted_visitors": int(pred),
-        "crowd_status": status,
+        "axes": {
+            "temple": temples,
+            "date": [d.strftime("%Y-%m-%d") for d in dates],
+            "temperature": temperatures,  # None: climatology per temple and day
+            "rain_flag": data.rain_flags,
+            "moon_phase": data.moon_phases,
+        },
+        "shape": list(pred.shape),
+        "predicted_visitors": pred.astype(np.int64).tolist(),
     }
 
 
-@app.post("/chat")
-def chat(data: dict):
+@app.post("/explain")
+def explain(data: ExplainRequest):
+    """Feature contributions behind a /predict result (TreeSHAP, cached)."""
+    try:
+        result = explanations.explain(data.temple_name, data.date_str, data.temperature, data.rain_flag,
+                                      data.moon_phase)
+    except ExplanationUnavailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {**result, "crowd_status": crowd_status(result["predicted_visitors"])}
+
+
+@app.get("/explain/stats")
+def explain_stats():
+    return explanations.stats()
+
+
+@app.post("/simulate/wait-times")
+def simulate_wait_times(data: WaitTimeRequest):
+    """Monte Carlo wait-time distribution per slot for a temple and date.
+
+    Past the request deadline, replications stop early and the summary of
+    those completed is returned with "partial": true.
+    """
+    try:
+        result = wait_times.simulate(
+            data.temple_name,
+            data.date_str,
+            data.slots or DEFAULT_SLOTS,
+            gates=data.gates,
+            service_rate=data.service_rate,
+            replications=min(data.replications, 20000),
+            stop=expired,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result.get("partial"):
+        mark_partial()
+    return result
+
+
+@app.get("/simulate/stats")
+def simulate_stats():
+    return wait_times.stats()
+
+
+@app.post("/optimize/slot-capacity")
+def optimize_slot_capacity(data: SlotCapacityRequest):
+    """Rebalance slots[].max_capacity against forecast demand for many temples.
+
+    Body: {"temples": [{"name", "slots": [labels], "max_capacity": [per slot]
+    or "per_slot", optional "daily_budget", optional "total" (cap per slot)}],
+    "start_date", "days" (default 30), "cv" (demand uncertainty)}.
+    """
+    temples = data.temples
+    try:
+        dates = horizon_dates(data.start_date, data.days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid start_date: {e}")
+    names = [t.name for t in temples]
+    slot_lists = [t.slot_labels() for t in temples]
+    n_slots = max(len(s) for s in slot_lists)
+
+    shape = (len(temples), len(dates), n_slots)
+    mask = np.zeros(shape, dtype=bool)
+    current = np.zeros(shape)
+    upper = np.full(shape, np.inf)
+    budget = np.zeros(shape[:2])
+    share = np.zeros((len(temples), n_slots))
+    for i, (temple, labels) in enumerate(zip(temples, slot_lists)):
+        k = len(labels)
+        mask[i, :, :k] = True
+        current[i, :, :k] = temple.max_capacity if temple.max_capacity is not None else temple.per_slot
+        upper[i, :, :k] = temple.total or np.inf
+        budget[i] = temple.daily_budget or current[i, 0, :k].sum()
+        share[i, :k] = slot_weights(labels)
+
+    daily = daily_forecast(shards, climatology, names, dates)
+    demand = daily[:, :, None] * share[:, None, :]
+    capacity, before, after = plan(demand, current, mask, data.cv, budget, upper=upper)
+
+    results = []
+    for i, (name, labels) in enumerate(zip(names, slot_lists)):
+        k = len(labels)
+        results.append({
+            "temple": name,
+            "slots": labels,
+            "days": [
+                {
+                    "date": date.strftime("%Y-%m-%d"),
+                    "demand": demand[i, d, :k].round().astype(int).tolist(),
+                    "max_capacity": capacity[i, d, :k].tolist(),
+                    "expected_overflow_before": round(float(before[i, d].sum()), 1),
+                    "expected_overflow_after": round(float(after[i, d].sum()), 1),
+                }
+                for d, date in enumerate(dates)
+            ],
+        })
+    return {"temples": results}
+
+
+@app.post("/anomaly/events")
+def ingest_gate_events(data: GateEventBatch):
+    """Feed a batch of gate entry events; returns any entry-rate alerts raised.
+
+    `events` is columnar ({"temple": [...], "ts": [...], "count": [...]}, all
+    the same length) or a list of {"temple", "ts", "count"} objects; `ts` is
+    epoch seconds.
+    """
+    events = data.columns()
+    alerts = entry_rates.ingest(events.temple, events.ts, events.count)
+    return {"accepted": len(events.ts), "alerts": alerts}
+
+
+@app.post("/anomaly/flush")
+def flush_gate_events(data: Optional[FlushRequest] = None):
+    """Close minutes up to `now` (epoch seconds, default: the current time) when gates have gone quiet."""
+    now = data.now if data is not None and data.now is not None else time.time()
+    return {"alerts": entry_rates.flush(now)}
+
+
+@app.get("/anomaly/alerts")
+def recent_anomaly_alerts(limit: int = 100):
+    return {"alerts": list(entry_rates.alerts)[-limit:], "stats": entry_rates.stats()}
+
+
+@app.post("/alerts/tick")
+def capacity_alert_tick(data: AlertTickRequest):
+    """Evaluate projected capacity thresholds for all temples in one pass.
+
+    Body: {"now": epoch seconds (default: server time), "temples": [{"id",
+    "live_count", "capacity", "threshold_warning", "threshold_critical",
+    optional "net_rate" (people/minute nowcast)}]}.
+    """
+    now = data.now if data.now is not None else time.time()
+    temples = data.temples
+    events = capacity_alerts.tick(
+        [t.id for t in temples],
+        [t.live_count for t in temples],
+        [t.capacity for t in temples],
+        now,
+        [t.threshold_warning for t in temples],
+        [t.threshold_critical for t in temples],
+        [float("nan") if t.net_rate is None else t.net_rate for t in temples],
+    )
+    updates.publish("nowcast", nowcast_entries(capacity_alerts.nowcast(), now, STREAM_TZ))
+    return {"events": events}
+
+
+@app.get("/alerts/state")
+def capacity_alert_state():
+    return capacity_alerts.state()
+
+
+@app.get("/drift")
+def drift_report():
+    """Population stability index of inputs and per-temple predictions vs training data.
+
+    The histograms live in each worker, so under common.serve this is the
+    traffic of the worker that answered (`worker`), not the whole service.
+    """
+    return {"worker": os.getpid(), **drift.report()}
+
+
+@app.post("/drift/reset", dependencies=[Depends(require_admin)])
+def drift_reset():
+    """Start a new comparison window in the answering worker only."""
+    drift.reset()
+    return {"status": "reset", "worker": os.getpid()}
+
+
+@app.get("/export/forecast")
+def export_forecast(if_none_match: str = Header(None)):
+    """Whole-horizon forecast cube in the binary layout documented in src/export.py.
+
+    Poll with If-None-Match; an unchanged cube costs a 304 with no body.
+    """
+    payload, etag = forecast_export.current()
+    headers = {"ETag": etag, "Cache-Control": f"max-age={int(EXPORT_REFRESH_SECONDS)}"}
+    if forecast_export.matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(payload, media_type="application/vnd.temple.forecast-cube", headers=headers)
+
+
+@app.get("/export/stats")
+def export_stats():
+    return forecast_export.stats()
+
+
+@app.get("/stream")
+async def stream_updates(request: Request, topics: str = ",".join(TOPICS), temples: str = None):
+    """Server-sent events: a snapshot, then coalesced forecast/nowcast deltas.
+
+    `topics` and `temples` are comma-separated filters. Each event's data is
+    {topic: {key: value}}; a null value means the key was removed.
+    """
+    async def events():
+        sub = updates.subscribe(asyncio.get_running_loop(), topics.split(","),
+                                temples.split(",") if temples else None)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    await asyncio.wait_for(sub.wakeup.wait(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                kind, seq, batch = updates.drain(sub)
+                yield f"id: {seq}\nevent: {kind}\ndata: {json.dumps(batch, separators=(',', ':'))}\n\n"
+        finally:
+            updates.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/stream/stats")
+def stream_stats():
+    return updates.stats()
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/deadline/stats")
+def get_deadline_stats():
+    return deadline_stats()
+
+
+@app.get("/record/stats")
+def record_stats():
+    return recorder.stats()
+
+
+@app.get("/trace/stats")
+def trace_stats():
+    return tracer.stats()
+
+
+@app.get("/shards")
+def shard_stats():
+    """Shard cache counters: loads, evictions, hits and resident bytes."""
+    return shards.stats()
+
+
+@app.get("/cache/predictions/stats")
+def prediction_cache_stats():
+    """Prediction cache hits by tier, writes, evictions and file size."""
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+
+@app.post("/chat", response_model=ChatResponse)
+def chat(data: ChatRequest):
     """RAG-style chat endpoint for bot queries."""
-    query = data.get("query", "")
-    context = data.get("context", "")
-    return {
-        "answer": f"Based on current data: {context}. For your question '{query[:50]}...', please visit during off-peak hours for the best experience."
-    }
+    record("decode")
+    query = data.query
+    context = data.context
+    return ModelResponse(ChatResponse.model_construct(
+        answer=f"Based on current data: {context}. For your question '{query[:50]}...', please visit during off-peak hours for the best experience."
+    ))
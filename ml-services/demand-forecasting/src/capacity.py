@@ -0,0 +1,88 @@
+"""Slot capacity rebalancing from forecast per-slot demand.
+
+For each temple-day the daily slot budget B (sum of slots[].max_capacity)
+is redistributed across slots to minimise expected overflow
+sum_s E[(D_s - c_s)^+], with D_s ~ Normal(mu_s, sigma_s). The optimum
+equalises the overflow probability across slots, i.e. c_s = mu_s + z sigma_s
+for one z per temple-day, clipped to [lower, upper]. Equal overflow
+probability also keeps every slot at the same load level, which is what
+keeps queues short at the gates.
+
+z is found by bisection on all temple-days at once: arrays are shaped
+(temples, days, slots), with padded slots masked out, so a 30-day plan for
+every temple is a few dozen vectorised passes.
+"""
+import numpy as np
+
+BISECTION_STEPS = 60
+DEFAULT_CV = 0.15
+MIN_SLOT_FRACTION = 0.25
+
+
+def _norm_cdf(z):
+    # Abramowitz & Stegun 7.1.26 (|error| < 1.5e-7); avoids a scipy dependency.
+    x = np.abs(z) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+def expected_overflow(mu, sigma, capacity):
+    """E[(D - c)^+] for normal demand (the standard normal loss function)."""
+    sigma = np.maximum(sigma, 1e-9)
+    k = (capacity - mu) / sigma
+    pdf = np.exp(-0.5 * k * k) / np.sqrt(2.0 * np.pi)
+    return sigma * (pdf - k * (1.0 - _norm_cdf(k)))
+
+
+def rebalance(mu, sigma, budget, lower, upper, mask):
+    """Optimal slot capacities; all arrays are (..., slots), budget is (...)."""
+    mu = np.where(mask, mu, 0.0)
+    sigma = np.where(mask, np.maximum(sigma, 1e-9), 1.0)
+    lower = np.where(mask, lower, 0.0)
+    upper = np.where(mask, np.maximum(upper, lower), 0.0)
+    budget = np.clip(budget, lower.sum(axis=-1), upper.sum(axis=-1))
+
+    def allocate(z):
+        return np.clip(mu + z[..., None] * sigma, lower, upper)
+
+    # Bracket z wide enough that the clipped allocation spans [sum(lower), sum(upper)].
+    spread = ((np.abs(mu) + budget[..., None]) / sigma).max(axis=-1) + 1.0
+    lo, hi = -spread, spread
+    for _ in range(BISECTION_STEPS):
+        mid = 0.5 * (lo + hi)
+        over = allocate(mid).sum(axis=-1) > budget
+        hi = np.where(over, mid, hi)
+        lo = np.where(over, lo, mid)
+    return _round_to_budget(allocate(0.5 * (lo + hi)), budget, mask)
+
+
+def _round_to_budget(capacity, budget, mask):
+    """Integer capacities that keep each row's total equal to its budget."""
+    floor = np.floor(capacity)
+    short = np.rint(budget - floor.sum(axis=-1)).astype(np.int64)
+    remainder = np.where(mask, capacity - floor, -1.0)
+    # Hand the missing units to the slots with the largest remainders.
+    rank = np.argsort(np.argsort(-remainder, axis=-1), axis=-1)
+    return (floor + (rank < short[..., None])).astype(np.int64)
+
+
+def plan(demand, current, mask, cv=DEFAULT_CV, budget=None, min_fraction=MIN_SLOT_FRACTION, upper=None):
+    """Rebalanced capacities plus expected overflow before and after.
+
+    `demand` and `current` are (temples, days, slots); `current` is the static
+    per-slot capacity and its row sum is the default budget.
+    """
+    demand = np.asarray(demand, dtype=np.float64)
+    current = np.broadcast_to(np.asarray(current, dtype=np.float64), demand.shape)
+    sigma = cv * demand + np.sqrt(np.maximum(demand, 0.0))
+    if budget is None:
+        budget = np.where(mask, current, 0.0).sum(axis=-1)
+    lower = min_fraction * current
+    if upper is None:
+        upper = np.full(demand.shape, np.inf)
+    capacity = rebalance(demand, sigma, budget, lower, upper, mask)
+    before = np.where(mask, expected_overflow(demand, sigma, current), 0.0)
+    after = np.where(mask, expected_overflow(demand, sigma, capacity), 0.0)
+    return capacity, before, after
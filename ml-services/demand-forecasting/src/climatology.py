@@ -0,0 +1,133 @@
+"""Per-temple, day-of-year weather climatology.
+
+Fills missing temperature / rain inputs with the historical norm for that
+temple and day instead of a flat 30C / no-rain default, and buckets weather
+so equivalent requests share cache keys.
+
+Build the table from the historical traffic CSV:
+    python -m src.climatology --data gujarat_temple_traffic_10y.csv
+
+The result is a float32 array of shape (n_temples + 1, 366, 2) holding mean
+temperature and rain probability; row 0 pools all temples and serves
+temples that have no history of their own.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.features import temple_key
+
+CLIMATOLOGY_FILE = "climatology.npz"
+TEMPERATURE_BUCKET_C = 2.0
+RAIN_PROBABILITY_CUTOFF = 0.5
+SMOOTHING_DAYS = 15
+
+ALL_TEMPLES = "__all__"
+
+
+def bucket_temperature(temperature):
+    """Round temperatures to TEMPERATURE_BUCKET_C-wide buckets."""
+    return np.round(np.asarray(temperature, dtype=np.float64) / TEMPERATURE_BUCKET_C) * TEMPERATURE_BUCKET_C
+
+
+def _seasonal_table():
+    """Month-level norms used by the training data generator (no history needed)."""
+    doy = np.arange(366)
+    month = pd.Timestamp("2024-01-01") + pd.to_timedelta(doy, unit="D")
+    month = month.month.to_numpy()
+    temp = np.where((month >= 3) & (month <= 6), 40.0, np.where((month >= 7) & (month <= 9), 31.5, 21.5))
+    rain = np.where((month >= 7) & (month <= 9), 0.4, 0.0)
+    return np.stack([temp, rain], axis=-1)[None].astype(np.float32)
+
+
+class Climatology:
+    """O(1) lookup of mean temperature and rain probability by temple and day."""
+
+    def __init__(self, temples, table):
+        self.rows = {temple_key(t): i for i, t in enumerate(temples)}
+        self.table = np.asarray(table, dtype=np.float32)
+
+    @classmethod
+    def seasonal(cls):
+        return cls([ALL_TEMPLES], _seasonal_table())
+
+    @classmethod
+    def load(cls, model_dir):
+        path = os.path.join(model_dir, CLIMATOLOGY_FILE)
+        if not os.path.exists(path):
+            return cls.seasonal()
+        with np.load(path) as npz:
+            return cls(list(npz["temples"]), npz["table"])
+
+    def save(self, model_dir):
+        temples = sorted(self.rows, key=self.rows.get)
+        np.savez_compressed(os.path.join(model_dir, CLIMATOLOGY_FILE),
+                            temples=np.array(temples), table=self.table)
+
+    def lookup(self, temple, dates):
+        """(temperature, rain probability) arrays for the given dates."""
+        row = self.rows.get(temple_key(temple), 0)
+        doy = pd.DatetimeIndex(pd.to_datetime(dates)).dayofyear.to_numpy() - 1
+        values = self.table[row, doy]
+        return values[:, 0].astype(np.float64), values[:, 1].astype(np.float64)
+
+    def fill(self, temple, dates, temperature=None, rain_flag=None):
+        """Model-ready, bucketed weather; None inputs come from the climatology."""
+        n = len(dates)
+        if temperature is None or rain_flag is None:
+            norm_temp, rain_prob = self.lookup(temple, dates)
+        if temperature is None:
+            temperature = norm_temp
+        if rain_flag is None:
+            rain_flag = (rain_prob >= RAIN_PROBABILITY_CUTOFF).astype(np.int64)
+        temperature = np.broadcast_to(bucket_temperature(temperature), (n,))
+        rain_flag = np.broadcast_to(np.asarray(rain_flag, dtype=np.int64), (n,))
+        return temperature, rain_flag
+
+
+def build(df, smoothing_days=SMOOTHING_DAYS):
+    """Climatology from a frame with Date, Temple, Temperature_C and Rain_Flag."""
+    dates = pd.DatetimeIndex(pd.to_datetime(df["Date"]))
+    doy = dates.dayofyear.to_numpy() - 1
+    temples = [ALL_TEMPLES] + sorted(df["Temple"].unique())
+    row_of = {t: i for i, t in enumerate(temples)}
+    rows = df["Temple"].map(row_of).to_numpy()
+
+    sums = np.zeros((len(temples), 366, 2))
+    counts = np.zeros((len(temples), 366, 1))
+    values = df[["Temperature_C", "Rain_Flag"]].to_numpy(dtype=np.float64)
+    for r in (rows, np.zeros_like(rows)):
+        np.add.at(sums, (r, doy), values)
+        np.add.at(counts, (r, doy), 1.0)
+
+    # Circular moving window over the year to smooth sparse days.
+    kernel = np.ones(smoothing_days)
+    pad = smoothing_days // 2
+    wrap = lambda a: np.concatenate([a[:, -pad:], a, a[:, :pad]], axis=1)
+    smooth = lambda a: np.apply_along_axis(lambda v: np.convolve(v, kernel, "valid"), 1, wrap(a))
+    table = smooth(sums) / np.maximum(smooth(counts), 1.0)
+
+    # Temples (or days) with no history fall back to the seasonal norm.
+    empty = smooth(counts)[..., 0] == 0
+    table[empty] = np.broadcast_to(_seasonal_table()[0], table.shape)[empty]
+    return Climatology(temples, table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the weather climatology table")
+    parser.add_argument("--data", required=True, help="CSV with Date, Temple, Temperature_C, Rain_Flag")
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_PATH", "models"))
+    parser.add_argument("--smoothing-days", type=int, default=SMOOTHING_DAYS)
+    args = parser.parse_args()
+
+    climatology = build(pd.read_csv(args.data), args.smoothing_days)
+    os.makedirs(args.model_dir, exist_ok=True)
+    climatology.save(args.model_dir)
+    print(f"💾 Climatology for {len(climatology.rows) - 1} temples saved to "
+          f"{os.path.join(args.model_dir, CLIMATOLOGY_FILE)} ({climatology.table.nbytes} bytes)")
+
+
+if __name__ == "__main__":
+    main()
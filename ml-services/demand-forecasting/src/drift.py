@@ -0,0 +1,200 @@
+"""Feature and prediction drift monitoring with fixed-memory histograms.
+
+A reference is built once from the training data: bin edges and expected
+proportions for every model input, and for footfall per temple (the
+distribution predictions should follow). Serving keeps one count array per
+feature and per temple with the same edges and reports the population
+stability index PSI = sum((a - e) * ln(a / e)) against the reference.
+
+    python -m src.drift --data gujarat_temple_traffic_10y.csv
+
+Requests append raw inputs to a small preallocated buffer; every
+FLUSH_EVERY requests the buffer is binned in one vectorised pass, so the
+per-request cost is an array write (amortised O(1)).
+
+The counts are per process. Under common.serve, /drift reports and
+/drift/reset clears the worker that answered; reports carry its pid.
+"""
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.features import calendar_frame, encode_moon, temple_key
+
+DRIFT_REFERENCE_FILE = "drift_reference.json"
+MONITORED = ["Month", "DayOfWeek", "DayOfYear", "Is_Weekend", "Is_Vacation", "Is_Shravan",
+             "Moon_Phase_Encoded", "Temperature_C", "Rain_Flag"]
+MAX_BINS = 10
+FLUSH_EVERY = 256
+PSI_EPS = 1e-4
+# Conventional PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant.
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+
+def bin_edges(values, max_bins=MAX_BINS):
+    """Inner bin edges: midpoints for discrete columns, quantiles otherwise."""
+    values = np.asarray(values, dtype=np.float64)
+    uniq = np.unique(values)
+    if len(uniq) <= max_bins:
+        return ((uniq[1:] + uniq[:-1]) / 2).tolist()
+    return np.unique(np.quantile(values, np.linspace(0, 1, max_bins + 1)[1:-1])).tolist()
+
+
+def proportions(values, edges):
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return (counts / max(counts.sum(), 1)).tolist()
+
+
+def psi(actual_counts, expected):
+    total = actual_counts.sum()
+    if total == 0:
+        return None
+    a = np.clip(actual_counts / total, PSI_EPS, None)
+    e = np.clip(np.asarray(expected), PSI_EPS, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def _status(value):
+    if value is None:
+        return "no-data"
+    if value > PSI_SIGNIFICANT:
+        return "significant"
+    return "moderate" if value > PSI_MODERATE else "stable"
+
+
+def model_inputs(dates, temperature, rain_flag, moon_phase):
+    """Monitored columns for a batch of raw inputs."""
+    frame = calendar_frame(dates)
+    frame["Moon_Phase_Encoded"] = encode_moon(moon_phase)
+    frame["Temperature_C"] = np.asarray(temperature, dtype=np.float64)
+    frame["Rain_Flag"] = np.asarray(rain_flag, dtype=np.int64)
+    return frame[MONITORED]
+
+
+def build_reference(df):
+    """Reference edges/proportions from a training frame."""
+    inputs = model_inputs(df["Date"], df["Temperature_C"], df["Rain_Flag"], df["Moon_Phase"])
+    features = {}
+    for name in MONITORED:
+        edges = bin_edges(inputs[name])
+        features[name] = {"edges": edges, "expected": proportions(inputs[name], edges)}
+    predictions = {}
+    for temple, rows in df.groupby(df["Temple"].map(temple_key)):
+        edges = bin_edges(rows["Footfall"])
+        predictions[temple] = {"edges": edges, "expected": proportions(rows["Footfall"], edges)}
+    return {"features": features, "predictions": predictions}
+
+
+class DriftMonitor:
+    """Streaming histograms compared against a training reference."""
+
+    def __init__(self, reference, flush_every=FLUSH_EVERY):
+        self.reference = reference
+        self._lock = threading.Lock()
+        self._edges = {k: np.asarray(v["edges"]) for k, v in reference["features"].items()}
+        self._pred_edges = {k: np.asarray(v["edges"]) for k, v in reference["predictions"].items()}
+        self._counts = {k: np.zeros(len(e) + 1) for k, e in self._edges.items()}
+        self._pred_counts = {k: np.zeros(len(e) + 1) for k, e in self._pred_edges.items()}
+        self._buffer = {
+            "date": np.empty(flush_every, dtype="datetime64[D]"),
+            "temperature": np.empty(flush_every),
+            "rain": np.empty(flush_every, dtype=np.int64),
+            "moon": np.empty(flush_every, dtype=object),
+            "prediction": np.empty(flush_every),
+            "temple": np.empty(flush_every, dtype=object),
+        }
+        self._size = 0
+        self.recorded = 0
+
+    @classmethod
+    def load(cls, model_dir):
+        path = os.path.join(model_dir, DRIFT_REFERENCE_FILE)
+        if not os.path.exists(path):
+            return cls({"features": {}, "predictions": {}})
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @property
+    def enabled(self):
+        return bool(self._edges)
+
+    def record(self, temple, date, temperature, rain_flag, moon_phase, prediction):
+        """Buffer one request; bins the buffer when it fills."""
+        if not self.enabled:
+            return
+        with self._lock:
+            i = self._size
+            buf = self._buffer
+            buf["date"][i] = np.datetime64(str(date)[:10], "D")
+            buf["temperature"][i] = temperature
+            buf["rain"][i] = rain_flag
+            buf["moon"][i] = moon_phase
+            buf["prediction"][i] = prediction
+            buf["temple"][i] = temple_key(temple)
+            self._size += 1
+            self.recorded += 1
+            if self._size == len(buf["date"]):
+                self._flush()
+
+    def _flush(self):
+        n = self._size
+        if n == 0:
+            return
+        buf = self._buffer
+        inputs = model_inputs(buf["date"][:n], buf["temperature"][:n], buf["rain"][:n], buf["moon"][:n])
+        for name, edges in self._edges.items():
+            np.add.at(self._counts[name], np.searchsorted(edges, inputs[name].to_numpy(), side="right"), 1)
+        temples = buf["temple"][:n]
+        for temple in set(temples):
+            edges = self._pred_edges.get(temple)
+            if edges is None:
+                continue
+            values = buf["prediction"][:n][temples == temple]
+            np.add.at(self._pred_counts[temple], np.searchsorted(edges, values, side="right"), 1)
+        self._size = 0
+
+    def report(self):
+        with self._lock:
+            self._flush()
+            features = {}
+            for name, ref in self.reference["features"].items():
+                value = psi(self._counts[name], ref["expected"])
+                features[name] = {"psi": value, "status": _status(value), "n": int(self._counts[name].sum())}
+            predictions = {}
+            for temple, ref in self.reference["predictions"].items():
+                value = psi(self._pred_counts[temple], ref["expected"])
+                predictions[temple] = {"psi": value, "status": _status(value),
+                                       "n": int(self._pred_counts[temple].sum())}
+            return {"enabled": self.enabled, "recorded": self.recorded,
+                    "features": features, "predictions": predictions}
+
+    def reset(self):
+        """Start a new comparison window."""
+        with self._lock:
+            self._size = 0
+            for counts in list(self._counts.values()) + list(self._pred_counts.values()):
+                counts[:] = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the drift reference from training data")
+    parser.add_argument("--data", required=True, help="CSV with Date, Temple, Footfall, weather and moon columns")
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_PATH", "models"))
+    args = parser.parse_args()
+
+    reference = build_reference(pd.read_csv(args.data, parse_dates=["Date"]))
+    os.makedirs(args.model_dir, exist_ok=True)
+    path = os.path.join(args.model_dir, DRIFT_REFERENCE_FILE)
+    with open(path, "w") as f:
+        json.dump(reference, f)
+    print(f"💾 Drift reference ({len(reference['features'])} features, "
+          f"{len(reference['predictions'])} temples) saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Per-feature explanations ("why is this date busy?") with a lookup cache.
+
+Contributions come from XGBoost's built-in TreeSHAP (`pred_contribs=True`),
+which walks every tree path for a whole batch of rows in native code. Rows
+for the forecast horizon are explained in one batch at startup so dashboard
+calls are dictionary lookups; ad-hoc inputs are computed once and cached.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.features import temple_key
+
+
+class ExplanationUnavailable(Exception):
+    """The temple is served by a model without trees (baseline), so there is nothing to explain."""
+
+
+class ExplanationCache:
+    """LRU of explanations keyed by shard version and normalised inputs."""
+
+    def __init__(self, store, climatology, max_entries=50000):
+        self.store = store
+        self.climatology = climatology
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "precomputed": 0}
+
+    @staticmethod
+    def _key(version, temple, date, temperature, rain_flag, moon_phase):
+        return (version, temple_key(temple), pd.Timestamp(date).strftime("%Y-%m-%d"),
+                round(float(temperature), 1), int(rain_flag), str(moon_phase))
+
+    def _compute(self, shard, temple, dates, temperature, rain_flag, moon_phase):
+        if not hasattr(shard.model, "get_booster"):
+            raise ExplanationUnavailable(f"No trained tree model for {temple!r}; explanations need a booster")
+        import xgboost as xgb
+
+        frame = shard.frame(temple, dates, temperature, rain_flag, moon_phase)
+        contribs = shard.model.get_booster().predict(xgb.DMatrix(frame), pred_contribs=True)
+        results = []
+        for row in contribs:
+            order = np.argsort(-np.abs(row[:-1]))
+            results.append({
+                "base_value": float(row[-1]),
+                "predicted_visitors": int(max(row.sum(), 0)),
+                "contributions": {shard.columns[i]: round(float(row[i]), 1) for i in order},
+            })
+        return results
+
+    def _store(self, keys, results):
+        with self._lock:
+            for key, result in zip(keys, results):
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def explain(self, temple, date, temperature=None, rain_flag=None, moon_phase="Normal"):
+        shard = self.store.get(temple)
+        temps, rains = self.climatology.fill(temple, [date], temperature, rain_flag)
+        temperature, rain_flag = temps[0], rains[0]
+        key = self._key(shard.version, temple, date, temperature, rain_flag, moon_phase)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return {**cached, "cached": True}
+            self.counters["misses"] += 1
+
+        result = self._compute(shard, temple, [date], temperature, rain_flag, moon_phase)[0]
+        self._store([key], [result])
+        return {**result, "cached": False}
+
+    def precompute(self, temples, dates, moon_phase="Normal"):
+        """Explain every (temple, date) of the horizon in one batch per temple,
+        with climatological weather, which is what the booking path sends
+        when the user gives none."""
+        for temple in temples:
+            shard = self.store.get(temple)
+            temps, rains = self.climatology.fill(temple, dates)
+            try:
+                results = self._compute(shard, temple, dates, temps, rains, moon_phase)
+            except ExplanationUnavailable:
+                continue
+            keys = [self._key(shard.version, temple, d, t, r, moon_phase) for d, t, r in zip(dates, temps, rains)]
+            self._store(keys, results)
+            with self._lock:
+                self.counters["precomputed"] += len(results)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries), "max_entries": self.max_entries}
@@ -0,0 +1,114 @@
+"""Bulk forecast export as a compact little-endian binary cube.
+
+The backend pulls the whole horizon once a minute instead of calling
+/predict per booking. The payload is (temples x days) float32 footfall plus
+one status byte per cell, behind a fixed header:
+
+    offset  size     field
+    0       4        magic b"TFC1"
+    4       2        uint16 format version (1)
+    6       2        uint16 T, number of temples
+    8       2        uint16 D, number of days
+    10      2        reserved (0)
+    12      8        int64 first date, days since 1970-01-01
+    20      4        uint32 N, byte length of the temple block
+    24      N        temple keys, UTF-8, joined with "\\n"
+    ...     0-3      zero padding to a multiple of 4
+    ...     4*T*D    float32 predicted visitors, row-major [temple][day]
+    ...     T*D      uint8 crowd status: 0 Normal, 1 HIGH, 2 CRITICAL
+
+All integers and floats are little-endian; day d of the cube is first date
++ d. In Node: `new Float32Array(buf.buffer, buf.byteOffset + off, T * D)`.
+
+The ETag is a hash of the payload, so a rebuild that produces the same
+numbers keeps the same tag and pollers keep getting 304s.
+"""
+import hashlib
+import struct
+import threading
+import time
+
+import numpy as np
+
+from src.features import CRITICAL_VISITORS, HIGH_VISITORS
+from src.forecast import daily_forecast, horizon_dates
+from src.shards import BASELINE_FOOTFALL
+
+MAGIC = b"TFC1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHHHqI")
+STATUS_CODES = ["Normal", "HIGH", "CRITICAL"]
+DEFAULT_DAYS = 90
+DEFAULT_REFRESH_SECONDS = 60
+
+
+def encode(temples, first_date, values):
+    """Pack a (temples, days) forecast into the binary layout above."""
+    values = np.asarray(values, dtype="<f4")
+    names = "\n".join(temples).encode("utf-8")
+    day = int(np.datetime64(str(first_date)[:10], "D").astype(np.int64))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(temples), values.shape[1], 0, day, len(names))
+    pad = b"\0" * (-(HEADER.size + len(names)) % 4)
+    status = (values > HIGH_VISITORS).astype(np.uint8) + (values > CRITICAL_VISITORS)
+    return b"".join([header, names, pad, values.tobytes(), status.tobytes()])
+
+
+def decode(payload):
+    """Inverse of encode: (temples, first date, values, status codes)."""
+    magic, version, n_temples, n_days, _, day, n_names = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a forecast cube (magic/version mismatch)")
+    offset = HEADER.size
+    temples = payload[offset:offset + n_names].decode("utf-8").split("\n") if n_temples else []
+    offset += n_names + (-(HEADER.size + n_names) % 4)
+    cells = n_temples * n_days
+    values = np.frombuffer(payload, dtype="<f4", count=cells, offset=offset).reshape(n_temples, n_days)
+    status = np.frombuffer(payload, dtype=np.uint8, count=cells, offset=offset + 4 * cells)
+    return temples, np.datetime64(day, "D"), values, status.reshape(n_temples, n_days)
+
+
+class ForecastExport:
+    """Builds the export cube at most once per refresh interval."""
+
+    def __init__(self, store, climatology, days=DEFAULT_DAYS, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.store = store
+        self.climatology = climatology
+        self.days = days
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._payload = None
+        self._etag = None
+        self._built_at = 0.0
+        self.counters = {"builds": 0, "served": 0, "not_modified": 0, "build_seconds": 0.0}
+
+    def temples(self):
+        return self.store.known_temples() or sorted(BASELINE_FOOTFALL)
+
+    def current(self):
+        """(payload, etag), rebuilding if the cached cube is stale."""
+        with self._lock:
+            if self._payload is None or time.monotonic() - self._built_at >= self.refresh_seconds:
+                started = time.perf_counter()
+                temples = self.temples()
+                dates = horizon_dates(days=self.days)
+                values = daily_forecast(self.store, self.climatology, temples, dates)
+                self._payload = encode(temples, dates[0], values)
+                self._etag = '"' + hashlib.sha256(self._payload).hexdigest()[:32] + '"'
+                self._built_at = time.monotonic()
+                self.counters["builds"] += 1
+                self.counters["build_seconds"] += time.perf_counter() - started
+            return self._payload, self._etag
+
+    def matches(self, if_none_match, etag):
+        """True if an If-None-Match header names `etag` (or is "*")."""
+        tags = [t.strip().removeprefix("W/") for t in (if_none_match or "").split(",")]
+        hit = "*" in tags or etag in tags
+        with self._lock:
+            self.counters["not_modified" if hit else "served"] += 1
+        return hit
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "etag": self._etag,
+                    "bytes": len(self._payload) if self._payload else 0,
+                    "days": self.days, "refresh_seconds": self.refresh_seconds}
@@ -0,0 +1,81 @@
+"""Feature construction shared by training and serving.
+
+Mirrors the feature engineering in notebooks/Demand_Forecasting_Colab.ipynb so
+that artifacts trained there (or by src/train_shards.py) see the same columns
+at inference time.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Column order of the global "optimized_temple_brain" artifact.
+FEATURES = [
+    "Temple_Encoded", "Month", "Day", "DayOfWeek", "DayOfYear",
+    "Is_Weekend", "Is_Vacation", "Is_Shravan",
+    "Moon_Phase_Encoded", "Temperature_C", "Rain_Flag",
+]
+
+# Per-temple shards drop the temple code: it is constant inside a shard.
+SHARD_FEATURES = [f for f in FEATURES if f != "Temple_Encoded"]
+
+MOON_PHASES = ["Amavasya", "Normal", "Purnima"]
+
+# Congestion classes from the training data generator.
+CRITICAL_VISITORS = 80000
+HIGH_VISITORS = 40000
+
+
+def temple_key(name):
+    """Normalise a temple name or id for lookups ("Somnath Temple" -> "somnath")."""
+    key = re.sub(r"[\s_-]+", "_", str(name or "").strip().lower()).strip("_")
+    if key.endswith("_temple"):
+        key = key[: -len("_temple")]
+    return key
+
+
+def crowd_status(visitors):
+    """Map predicted footfall to the status the booking guard understands."""
+    if visitors > CRITICAL_VISITORS:
+        return "CRITICAL"
+    if visitors > HIGH_VISITORS:
+        return "HIGH"
+    return "Normal"
+
+
+def calendar_frame(dates):
+    """Calendar columns for a sequence of dates, computed in one pass."""
+    dt = pd.DatetimeIndex(pd.to_datetime(dates))
+    month = dt.month.to_numpy()
+    dow = dt.dayofweek.to_numpy()
+    return pd.DataFrame({
+        "Month": month,
+        "Day": dt.day.to_numpy(),
+        "DayOfWeek": dow,
+        "DayOfYear": dt.dayofyear.to_numpy(),
+        "Is_Weekend": (dow >= 5).astype(np.int64),
+        "Is_Vacation": np.isin(month, (5, 11)).astype(np.int64),
+        "Is_Shravan": (month == 8).astype(np.int64),
+    })
+
+
+def encode_moon(phases, le_moon=None):
+    """Encode moon phase labels, defaulting unknown labels to "Normal"."""
+    classes = list(le_moon.classes_) if le_moon is not None else MOON_PHASES
+    lookup = {c: i for i, c in enumerate(classes)}
+    normal = lookup.get("Normal", 0)
+    return np.array([lookup.get(p, normal) for p in phases], dtype=np.int64)
+
+
+def build_features(dates, temperature, rain_flag, moon_phase,
+                   columns=SHARD_FEATURES, temple_code=None, le_moon=None):
+    """Assemble a model-ready frame; scalar inputs are broadcast over dates."""
+    frame = calendar_frame(dates)
+    n = len(frame)
+    phases = np.broadcast_to(np.asarray(moon_phase, dtype=object), (n,))
+    frame["Moon_Phase_Encoded"] = encode_moon(phases, le_moon)
+    frame["Temperature_C"] = np.broadcast_to(np.asarray(temperature, dtype=np.float64), (n,))
+    frame["Rain_Flag"] = np.broadcast_to(np.asarray(rain_flag, dtype=np.int64), (n,))
+    if "Temple_Encoded" in columns:
+        frame["Temple_Encoded"] = np.broadcast_to(np.asarray(temple_code, dtype=np.int64), (n,))
+    return frame[list(columns)]
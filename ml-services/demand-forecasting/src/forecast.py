@@ -0,0 +1,134 @@
+"""Multi-day, multi-temple forecasts built on the shard store."""
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.climatology import bucket_temperature
+from src.features import MOON_PHASES
+
+# Morning prayer and evening aarti peaks, as in the backend TempleStatusService.
+PEAK_HOURS = set(range(5, 9)) | set(range(17, 21))
+PEAK_WEIGHT = 1.5
+
+_TIME = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*(AM|PM)?", re.IGNORECASE)
+# A whole slot label: one time, or a start-end range.
+_SLOT = re.compile(rf"\s*{_TIME.pattern}\s*(?:-\s*{_TIME.pattern}\s*)?", re.IGNORECASE)
+
+
+# Default operating hours (06:00-21:00) split into hourly slots.
+DEFAULT_SLOTS = [f"{h:02d}:00-{h + 1:02d}:00" for h in range(6, 21)]
+
+
+def _minutes(match):
+    hour = int(match.group(1)) % 24
+    meridiem = (match.group(3) or "").upper()
+    if meridiem == "PM" and hour < 12:
+        hour += 12
+    elif meridiem == "AM" and hour == 12:
+        hour = 0
+    return hour * 60 + int(match.group(2) or 0)
+
+
+def slot_bounds(label):
+    """(start, end) minutes after midnight for a slot label; one hour if no end is given."""
+    times = [_minutes(m) for m in _TIME.finditer(str(label))]
+    if not times:
+        return None
+    end = times[1] if len(times) > 1 and times[1] > times[0] else times[0] + 60
+    return times[0], end
+
+
+def is_slot_label(label):
+    """True if `label` is exactly a time or time range that slot_bounds reads as written."""
+    match = _SLOT.fullmatch(str(label))
+    if match is None:
+        return False
+    for hour, minute, meridiem in (match.groups()[:3], match.groups()[3:]):
+        if hour is None:
+            continue
+        if int(hour) > (12 if meridiem else 24) or (meridiem and int(hour) == 0) or int(minute or 0) > 59:
+            return False
+    return True
+
+
+def slot_start_hour(label):
+    """Start hour of a slot label such as "09:00 AM - 10:00 AM" or "17:00-18:00"."""
+    bounds = slot_bounds(label)
+    return None if bounds is None else bounds[0] // 60
+
+
+def slot_weights(slots):
+    """Share of the daily footfall expected in each slot (sums to 1)."""
+    if not slots:
+        return np.zeros(0)
+    weights = np.array([PEAK_WEIGHT if slot_start_hour(s) in PEAK_HOURS else 1.0 for s in slots])
+    return weights / weights.sum()
+
+
+def horizon_dates(start_date=None, days=7, end_date=None):
+    start = pd.Timestamp(start_date) if start_date else pd.Timestamp.today().normalize()
+    if end_date:
+        return pd.date_range(start, pd.Timestamp(end_date), freq="D")
+    return pd.date_range(start, periods=int(days), freq="D")
+
+
+def daily_forecast(store, climatology, temples, dates, temperature=None, rain_flag=None,
+                   moon_phase="Normal"):
+    """Predicted footfall as an array of shape (len(temples), len(dates)).
+
+    Missing weather is filled per temple and day from the climatology.
+    """
+    out = np.empty((len(temples), len(dates)))
+    for i, temple in enumerate(temples):
+        temp, rain = climatology.fill(temple, dates, temperature, rain_flag)
+        out[i] = store.predict(temple, dates, temp, rain, moon_phase)
+    return out
+
+
+def scenario_grid(store, climatology, temples, dates, temperatures=None, rain_flags=(0, 1),
+                  moon_phases=tuple(MOON_PHASES)):
+    """What-if footfall over the cartesian grid of weather and moon phase.
+
+    Returns an array of shape (temples, dates, temperatures, rain_flags,
+    moon_phases). With `temperatures` None that axis has length one and
+    holds each temple's climatological temperature for the day. The grid is
+    flattened with np.indices and scored by store.predict_many, so each
+    shard sees a single batch however many cells there are.
+    """
+    grid = (len(dates), 1 if temperatures is None else len(temperatures), len(rain_flags), len(moon_phases))
+    d, t, r, m = (axis.ravel() for axis in np.indices(grid))
+    if temperatures is None:
+        temperature = np.stack([climatology.fill(temple, dates)[0] for temple in temples])[:, d]
+    else:
+        temperature = bucket_temperature(temperatures)[t]
+    pred = store.predict_many(temples, pd.DatetimeIndex(dates)[d], temperature,
+                              np.asarray(rain_flags, dtype=np.int64)[r],
+                              np.asarray(moon_phases, dtype=object)[m])
+    return pred.reshape((len(temples),) + grid)
+
+
+def hierarchy_base(hierarchy, temples, daily, overrides=None):
+    """Stack base forecasts for every hierarchy node, shape (n_nodes, n_days).
+
+    Model forecasts fill every node (slots get their temple's daily forecast
+    split by slot_weights, aggregates get sums); `overrides` maps node keys to
+    externally produced base forecasts, e.g. the control room's district totals.
+    """
+    row = {t: i for i, t in enumerate(temples)}
+    bottom = np.empty((len(hierarchy.bottom), daily.shape[1]))
+    slot_share = {}
+    for j, (level, temple, slot) in enumerate(hierarchy.bottom):
+        if level == "slot":
+            if temple not in slot_share:
+                labels = hierarchy.slots[temple]
+                slot_share[temple] = dict(zip(labels, slot_weights(labels)))
+            bottom[j] = daily[row[temple]] * slot_share[temple][slot]
+        else:
+            bottom[j] = daily[row[temple]]
+
+    base = hierarchy.S @ bottom
+    for i, key in enumerate(hierarchy.keys()):
+        if overrides and key in overrides:
+            base[i] = np.asarray(overrides[key], dtype=np.float64)
+    return base
@@ -0,0 +1,233 @@
+"""Shared on-disk prediction cache (SQLite in WAL mode) with an in-process front.
+
+With PREDICTION_CACHE_PATH set, ShardStore.predict looks each (temple,
+date) row up before building features. A key holds the shard name and
+model version plus the normalised inputs: temple key, calendar date,
+bucketed temperature, rain flag and moon phase. A retrained model
+therefore never serves an old model's numbers. Only the rows that miss go
+through the model, as one batch.
+
+Lookups go to a per-worker LRU dict first, then to the SQLite file that
+every worker and restart shares. WAL mode lets readers run while a writer
+commits. New predictions enter the worker's dict at once. A background
+thread batches them into SQLite, so no request waits on a disk write or
+on another worker's write lock.
+
+The file is bounded by PREDICTION_CACHE_MAX_ENTRIES. Rows are numbered in
+write order, and each flush drops the oldest beyond the limit, so rows of
+retired model versions age out first. At startup `warm()` bulk-loads the
+newest rows for the resident shard versions into the dict. Under
+common.serve this happens in the parent before fork, so every worker starts
+with a warm front and no cold-cache latency cliff after a restart.
+
+The cache is best effort. If the database is locked or unreadable, the
+lookup counts as a miss and the write is dropped.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.features import temple_key
+
+DEFAULT_MAX_ENTRIES = 2_000_000
+DEFAULT_MEMORY_ENTRIES = 100_000
+# Request threads give up on a locked file quickly; the background writer can afford to wait.
+READ_TIMEOUT_SECONDS = 0.05
+WRITE_TIMEOUT_SECONDS = 5.0
+FLUSH_SECONDS = 1.0
+BATCH_SIZE = 5000
+MAX_QUEUED = 100_000
+# SQLite's default limit on bound parameters is 999 in older builds.
+LOOKUP_CHUNK = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    model TEXT NOT NULL,
+    value REAL NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS predictions_model ON predictions (model, id);
+"""
+
+
+class PredictionCache:
+    """Two-tier read-through cache of daily predictions."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._connections = {}  # (pid, thread id) -> connection; never shared across fork or threads
+        self._queue = queue.SimpleQueue()
+        self._writer_pid = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "written": 0, "evicted": 0,
+                         "warm_loaded": 0, "dropped": 0, "errors": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self, timeout=READ_TIMEOUT_SECONDS):
+        conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connection(self):
+        key = (os.getpid(), threading.get_ident())
+        conn = self._connections.get(key)
+        if conn is None:
+            conn = self._connections[key] = self._connect()
+        return conn
+
+    @staticmethod
+    def model(shard):
+        return f"{shard.name}@{shard.version}"
+
+    @staticmethod
+    def keys(shard, temple, dates, temperature, rain_flag, moon_phase):
+        """One key per date; scalar inputs are broadcast like build_features does."""
+        days = pd.DatetimeIndex(pd.to_datetime(dates)).strftime("%Y-%m-%d")
+        n = len(days)
+        temperature = np.broadcast_to(np.asarray(temperature, dtype=np.float64), (n,))
+        rain_flag = np.broadcast_to(np.asarray(rain_flag, dtype=np.int64), (n,))
+        moon_phase = np.broadcast_to(np.asarray(moon_phase, dtype=object), (n,))
+        prefix = f"{PredictionCache.model(shard)}|{temple_key(temple)}"
+        return [f"{prefix}|{d}|{t:.1f}|{r}|{m}" for d, t, r, m in zip(days, temperature, rain_flag, moon_phase)]
+
+    def get_many(self, keys):
+        """Cached values for `keys`, None where missing."""
+        values = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._memory.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self._memory.move_to_end(key)
+                    values[i] = value
+            self.counters["memory_hits"] += len(keys) - len(missing)
+        if not missing:
+            return values
+
+        found = {}
+        try:
+            conn = self._connection()
+            for start in range(0, len(missing), LOOKUP_CHUNK):
+                chunk = [keys[i] for i in missing[start:start + LOOKUP_CHUNK]]
+                found.update(conn.execute(
+                    f"SELECT key, value FROM predictions WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        except sqlite3.Error:
+            self.counters["errors"] += 1
+        for i in missing:
+            values[i] = found.get(keys[i])
+        with self._lock:
+            self._remember(found.items())
+            self.counters["disk_hits"] += len(found)
+            self.counters["misses"] += len(missing) - len(found)
+        return values
+
+    def _remember(self, items):
+        for key, value in items:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put_many(self, model, keys, values):
+        """Remember new predictions here and queue them for the shared file."""
+        rows = [(key, model, float(value)) for key, value in zip(keys, values)]
+        with self._lock:
+            self._remember((key, value) for key, _, value in rows)
+        if self._writer_pid != os.getpid():  # first write in this worker; threads do not survive fork
+            with self._lock:
+                if self._writer_pid != os.getpid():
+                    self._writer_pid = os.getpid()
+                    threading.Thread(target=self._run, name="prediction-cache-writer", daemon=True).start()
+        if self._queue.qsize() >= MAX_QUEUED:
+            self.counters["dropped"] += len(rows)
+            return
+        self._queue.put(rows)
+
+    def _write(self, conn, rows):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO predictions (key, model, value, created) VALUES (?, ?, ?, ?)",
+                             [(key, model, value, now) for key, model, value in rows])
+            evicted = conn.execute("DELETE FROM predictions WHERE id <= (SELECT max(id) FROM predictions) - ?",
+                                   (self.max_entries,)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.counters["written"] += len(rows)
+        self.counters["evicted"] += evicted
+
+    def _run(self):
+        conn = self._connect(WRITE_TIMEOUT_SECONDS)
+        while True:
+            batch = list(self._queue.get())
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch += self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, batch)
+            except sqlite3.Error as e:
+                self.counters["dropped"] += len(batch)
+                print(f"⚠️ Prediction cache write failed: {e}")
+
+    def warm(self, models):
+        """Bulk-load the newest rows of `models` ("shard@version") into the in-process front.
+
+        Keys already in the front are kept as they are; returns how many rows were added.
+        """
+        if not models:
+            return 0
+        conn = self._connect()  # short-lived: common.serve calls this in the parent, before fork
+        try:
+            placeholders = ",".join("?" * len(models))
+            rows = conn.execute(f"SELECT key, value FROM predictions WHERE model IN ({placeholders}) "
+                                "ORDER BY id DESC LIMIT ?", [*models, self.memory_entries]).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Prediction cache warm-load failed: {e}")
+            return 0
+        finally:
+            conn.close()
+        with self._lock:
+            # Merge under what is already here: requests and the reload path may have written since
+            # startup, and those entries are newer than anything on disk, so they stay most recently used.
+            live = self._memory
+            self._memory = OrderedDict((key, value) for key, value in reversed(rows) if key not in live)
+            loaded = len(self._memory)
+            self._memory.update(live)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+            self.counters["warm_loaded"] += loaded
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            memory = len(self._memory)
+        try:
+            size = sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal") if os.path.exists(self.path + suffix))
+        except OSError:
+            size = None
+        return {**self.counters, "memory_entries": memory, "max_memory_entries": self.memory_entries,
+                "max_entries": self.max_entries, "path": self.path, "file_bytes": size}
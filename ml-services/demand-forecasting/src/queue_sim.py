@@ -0,0 +1,166 @@
+"""Monte Carlo darshan queue simulation for per-slot wait-time distributions.
+
+The day is simulated in STEP_MINUTES steps as a single queue in front of
+the gates: arrivals in each step are Poisson with the slot's forecast rate,
+and the gates clear a Poisson number of pilgrims per step. Backlog carries
+over from one slot into the next, which is what makes evening waits longer
+than the slot's own demand suggests.
+
+Replications run CHUNK_REPLICATIONS at a time along axis 0. The queue
+recursion Q_t = max(Q_{t-1} + A_t - S_t, 0) is solved in closed form with a
+cumulative sum and a running minimum, so there is no Python loop over time
+steps, and only one per chunk over replications. Between chunks the caller
+may stop the run (request deadline); the summary then covers the
+replications completed so far and is flagged partial.
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.features import temple_key
+from src.forecast import slot_bounds, slot_weights
+
+DEFAULT_GATES = 4
+# Pilgrims cleared per gate per minute (ticket scan + darshan line movement).
+DEFAULT_SERVICE_RATE = 8.0
+DEFAULT_REPLICATIONS = 2000
+# Resolution of the simulation clock; waits are reported in minutes.
+STEP_MINUTES = 5
+PERCENTILES = (50, 90, 99)
+# Replications per vectorised chunk; also how often a deadline is checked.
+CHUNK_REPLICATIONS = 500
+
+
+def queue_lengths(arrivals, served):
+    """Queue after each step (last axis) of Q_t = max(Q_{t-1} + A_t - S_t, 0), starting empty.
+
+    Solved in closed form: with N_t the cumulative net arrivals,
+    Q_t = N_t - min(0, min_{k<=t} N_k).
+    """
+    net = np.cumsum(arrivals - served, axis=-1)
+    return net - np.minimum(np.minimum.accumulate(net, axis=-1), 0)
+
+
+def simulate_day(daily_visitors, slots, gates=DEFAULT_GATES, service_rate=DEFAULT_SERVICE_RATE,
+                 replications=DEFAULT_REPLICATIONS, seed=None, stop=None):
+    """Simulate one day; returns (per-slot wait summaries in minutes, replications completed).
+
+    `stop()` is polled between chunks; once it returns True no further
+    chunks run. At least one chunk always completes.
+    """
+    bounds = [slot_bounds(s) for s in slots]
+    if any(b is None for b in bounds):
+        raise ValueError("Unrecognised slot label in " + repr(slots))
+    # Slot bounds in simulation steps, each slot at least one step long.
+    steps = [(start // STEP_MINUTES, max(end // STEP_MINUTES, start // STEP_MINUTES + 1)) for start, end in bounds]
+    day_start = min(b[0] for b in steps)
+    n_steps = max(b[1] for b in steps) - day_start
+    spans = [slice(start - day_start, end - day_start) for start, end in steps]
+
+    # Arrival rate per step: each slot's share of the day spread over its span.
+    rate = np.zeros(n_steps)
+    for share, (start, end) in zip(slot_weights(slots), steps):
+        rate[start - day_start:end - day_start] += daily_visitors * share / (end - start)
+    capacity = gates * service_rate * STEP_MINUTES
+    if capacity <= 0:
+        raise ValueError("gates and service_rate must be positive")
+
+    rng = np.random.default_rng(seed)
+    # Per slot: arrivals, arrival-weighted mean wait and peak queue of every replication.
+    totals, mean_waits, peaks = ([[] for _ in slots] for _ in range(3))
+    done = 0
+    while done < replications:
+        n = min(CHUNK_REPLICATIONS, replications - done)
+        arrivals = rng.poisson(rate, size=(n, n_steps))
+        served = rng.poisson(capacity, size=(n, n_steps))
+
+        queue = queue_lengths(arrivals, served)
+        wait = queue * (STEP_MINUTES / capacity)
+
+        for i, span in enumerate(spans):
+            slot_arrivals = arrivals[:, span]
+            total = slot_arrivals.sum(axis=1)
+            totals[i].append(total)
+            mean_waits[i].append((slot_arrivals * wait[:, span]).sum(axis=1) / np.maximum(total, 1))
+            peaks[i].append(queue[:, span].max(axis=1))
+        done += n
+        if stop is not None and done < replications and stop():
+            break
+
+    results = []
+    for i, (label, (start, end)) in enumerate(zip(slots, steps)):
+        total = np.concatenate(totals[i])
+        mean_wait = np.concatenate(mean_waits[i])
+        pct = np.percentile(mean_wait, PERCENTILES)
+        results.append({
+            "slot": label,
+            "expected_arrivals": round(float(total.mean()), 1),
+            "offered_load": round(float(total.mean() / (capacity * (end - start))), 3),
+            "wait_minutes": {
+                "mean": round(float(mean_wait.mean()), 1),
+                **{f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, pct)},
+            },
+            "max_queue_p90": int(np.percentile(np.concatenate(peaks[i]), 90)),
+        })
+    return results, done
+
+
+class WaitTimeSimulator:
+    """Runs simulate_day on forecast demand and caches per temple and date."""
+
+    def __init__(self, store, climatology, max_entries=4096):
+        self.store = store
+        self.climatology = climatology
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "partial": 0}
+
+    def simulate(self, temple, date, slots, gates=DEFAULT_GATES, service_rate=DEFAULT_SERVICE_RATE,
+                 replications=DEFAULT_REPLICATIONS, stop=None):
+        """Cached simulation; `stop` is passed to simulate_day, and partial runs are not cached."""
+        shard = self.store.get(temple)
+        # Normalised so "Somnath"/"somnath" and "2024-01-05"/"2024-1-5" share an entry.
+        date = pd.Timestamp(date).strftime("%Y-%m-%d")
+        key = (shard.version, temple_key(temple), date, tuple(slots), int(gates), float(service_rate),
+               int(replications))
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return {**cached, "temple": temple, "cached": True}
+            self.counters["misses"] += 1
+
+        started = time.perf_counter()
+        temperature, rain_flag = self.climatology.fill(temple, [date])
+        visitors = float(shard.predict(temple, [date], temperature, rain_flag, "Normal")[0])
+        # Seed from the key so a cache miss after eviction reproduces the same numbers.
+        seed = zlib.crc32(repr(key).encode())
+        slot_results, completed = simulate_day(visitors, slots, gates, service_rate, replications, seed, stop)
+        result = {
+            "temple": temple,
+            "date": date,
+            "predicted_visitors": int(visitors),
+            "gates": int(gates),
+            "service_rate_per_gate": float(service_rate),
+            "replications": completed,
+            "slots": slot_results,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if completed < replications:
+            self.counters["partial"] += 1
+            return {**result, "cached": False, "partial": True, "replications_requested": int(replications)}
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return {**result, "cached": False}
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries), "max_entries": self.max_entries}
@@ -0,0 +1,78 @@
+"""Optional msgpack bodies for backend-to-ML calls.
+
+A request sent with `Content-Type: application/msgpack` is decoded with
+msgpack and validated exactly like the JSON body would be. A caller that
+sends `Accept: application/msgpack` gets msgpack back from any endpoint
+that returns a model or plain data. JSON stays the default both ways.
+
+MsgpackRoute is installed as the app's route class. RPCResponse is the
+default response class and picks the encoding from a context variable
+that the route sets per request. Sync endpoints run in a thread that
+copies the request's context, so the flag follows them there.
+"""
+import json
+from contextvars import ContextVar
+
+import msgpack
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+
+accepts_msgpack = ContextVar("accepts_msgpack", default=False)
+
+
+def is_msgpack(content_type):
+    return bool(content_type) and content_type.split(";", 1)[0].strip().lower() in MSGPACK_TYPES
+
+
+def encode(data):
+    """Render plain data in the encoding the current request asked for: (bytes, media type)."""
+    if accepts_msgpack.get():
+        return msgpack.packb(data, use_bin_type=True), MSGPACK
+    body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    return body.encode("utf-8"), "application/json"
+
+
+class RPCResponse(JSONResponse):
+    """JSONResponse that switches to msgpack when the caller accepts it."""
+
+    def render(self, content):
+        body, self.media_type = encode(content)
+        return body
+
+
+async def _decoded(request):
+    """Request whose body is the decoded msgpack document, presented as JSON."""
+    body = await request.body()
+    try:
+        data = msgpack.unpackb(body, raw=False)
+    except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid msgpack body: {e}")
+    headers = [(k, v) for k, v in request.scope["headers"] if k != b"content-type"]
+    scope = {**request.scope, "headers": headers + [(b"content-type", b"application/json")]}
+    decoded = Request(scope, request.receive)
+    # FastAPI reads the body through Request.json(); hand it the decoded value.
+    decoded._body = body
+    decoded._json = data
+    return decoded
+
+
+class MsgpackRoute(APIRoute):
+    """APIRoute that accepts msgpack bodies and negotiates msgpack responses."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route(request):
+            if is_msgpack(request.headers.get("content-type")):
+                request = await _decoded(request)
+            token = accepts_msgpack.set(any(t in request.headers.get("accept", "") for t in MSGPACK_TYPES))
+            try:
+                return await handler(request)
+            finally:
+                accepts_msgpack.reset(token)
+
+        return route
@@ -0,0 +1,286 @@
+"""Request and response models for the booking, dashboard and bot endpoints.
+
+Requests are validated by pydantic-core (compiled) straight from the
+request body; unknown keys are ignored so older callers keep working.
+Responses are returned as ModelResponse, which serialises the model with
+its compiled serializer instead of FastAPI's generic jsonable_encoder walk
+(or to msgpack, see src/rpc.py). See benchmarks/codec.py for the per-call
+numbers.
+"""
+from typing import Annotated, Dict, List, Literal, Optional, Union
+
+import pandas as pd
+from fastapi import Response
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, model_validator
+
+from common.tracing import span
+from src.capacity import DEFAULT_CV
+from src.forecast import DEFAULT_SLOTS, is_slot_label
+from src.queue_sim import DEFAULT_GATES, DEFAULT_REPLICATIONS, DEFAULT_SERVICE_RATE
+from src.rpc import MSGPACK, accepts_msgpack, encode
+
+
+def _check_date(value):
+    """Reject what pandas cannot parse, so a bad date is a 422 rather than a 500 deep in the model path."""
+    try:
+        parsed = pd.Timestamp(value)
+    except (ValueError, TypeError, OverflowError):
+        parsed = pd.NaT
+    if pd.isna(parsed):
+        raise ValueError(f"not a date: {value!r}")
+    return value
+
+
+# Kept as the caller's string (the backend may send a full ISO timestamp); only its parseability is checked.
+DateStr = Annotated[str, AfterValidator(_check_date)]
+
+
+def _check_slot(value):
+    if not is_slot_label(value):
+        raise ValueError(f"not a slot label such as '09:00-10:00' or '9:00 AM - 10:00 AM': {value!r}")
+    return value
+
+
+SlotLabel = Annotated[str, AfterValidator(_check_slot)]
+
+
+class Schema(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+
+class ModelResponse(Response):
+    """JSON response rendered by the model's own serializer."""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        with span("serialize"):
+            if accepts_msgpack.get():
+                self.media_type = MSGPACK
+                return encode(content.model_dump(mode="json"))[0]
+            return content.model_dump_json().encode("utf-8")
+
+
+class PredictRequest(Schema):
+    temple_name: str = ""
+    date_str: DateStr
+    # None = fill from the climatology table.
+    temperature: Optional[float] = None
+    rain_flag: Optional[int] = Field(None, ge=0, le=1)
+    moon_phase: str = "Normal"
+    # Sent by the backend; the model derives it from date_str.
+    is_weekend: Optional[int] = None
+
+
+class PredictResponse(Schema):
+    predicted_visitors: int
+    crowd_status: str
+
+
+class ExplainRequest(Schema):
+    temple_name: str = ""
+    date_str: DateStr
+    temperature: Optional[float] = None
+    rain_flag: Optional[int] = Field(None, ge=0, le=1)
+    moon_phase: str = "Normal"
+
+
+class HierarchySpec(Schema):
+    regions: Optional[Dict[str, List[str]]] = None
+    slots: Optional[Union[List[str], Dict[str, List[str]]]] = None
+
+
+class ForecastRequest(Schema):
+    temples: Optional[List[str]] = None
+    temple_name: Optional[str] = None
+    temple_id: Optional[str] = None
+    start_date: Optional[DateStr] = None
+    days: int = Field(7, ge=1, le=366)
+    # One value for every day, or a list with one value per day.
+    temperature: Optional[Union[float, List[float]]] = None
+    rain_flag: Optional[Union[Literal[0, 1], List[Literal[0, 1]]]] = None
+    moon_phase: str = "Normal"
+    hierarchy: Optional[HierarchySpec] = None
+    base: Optional[Dict[str, List[float]]] = None
+    reconcile: Literal["ols", "wls_struct", "mint_shrink", "none"] = "ols"
+    residuals: Optional[Dict[str, List[float]]] = None
+
+    @model_validator(mode="after")
+    def _has_temple(self):
+        if not (self.temples or self.temple_name or self.temple_id):
+            raise ValueError("give temples, temple_name or temple_id")
+        return self
+
+    @model_validator(mode="after")
+    def _per_day(self):
+        for name in ("temperature", "rain_flag"):
+            value = getattr(self, name)
+            if isinstance(value, list) and len(value) != self.days:
+                raise ValueError(f"{name} has {len(value)} values for {self.days} days")
+        return self
+
+    def temple_list(self):
+        return self.temples or [self.temple_name or self.temple_id]
+
+
+class ForecastPoint(Schema):
+    timestamp: str
+    temple: str
+    predicted_count: int
+    crowd_status: str
+
+
+class NodeSeries(Schema):
+    base: List[float]
+    reconciled: List[float]
+
+
+class Reconciliation(Schema):
+    method: str
+    nodes: Dict[str, NodeSeries]
+
+
+class ForecastResponse(Schema):
+    dates: List[str]
+    predictions: List[ForecastPoint]
+    reconciliation: Reconciliation
+
+
+class WaitTimeRequest(Schema):
+    temple_name: str = ""
+    date_str: DateStr
+    slots: Optional[List[str]] = None
+    gates: int = Field(DEFAULT_GATES, ge=1)
+    service_rate: float = Field(DEFAULT_SERVICE_RATE, gt=0)
+    # The endpoint clamps this to 20000.
+    replications: int = Field(DEFAULT_REPLICATIONS, ge=1)
+
+
+class SlotCapacityTemple(Schema):
+    name: str = Field(min_length=1)
+    # None = DEFAULT_SLOTS.
+    slots: Optional[List[SlotLabel]] = Field(None, min_length=1)
+    # One value per slot, or a single value for every slot; falls back to per_slot.
+    max_capacity: Optional[Union[List[Annotated[float, Field(ge=0)]], Annotated[float, Field(ge=0)]]] = None
+    per_slot: float = Field(500, ge=0)
+    daily_budget: Optional[float] = Field(None, ge=0)
+    total: Optional[float] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def _capacity_per_slot(self):
+        n = len(self.slot_labels())
+        if isinstance(self.max_capacity, list) and len(self.max_capacity) != n:
+            raise ValueError(f"max_capacity has {len(self.max_capacity)} values for {n} slots")
+        return self
+
+    def slot_labels(self):
+        return self.slots or DEFAULT_SLOTS
+
+
+class SlotCapacityRequest(Schema):
+    temples: List[SlotCapacityTemple] = Field(min_length=1)
+    start_date: Optional[DateStr] = None
+    days: int = Field(30, ge=1, le=366)
+    cv: float = Field(DEFAULT_CV, ge=0)
+
+
+class ScenarioRequest(Schema):
+    temples: Optional[List[str]] = None
+    temple_name: Optional[str] = None
+    start_date: Optional[DateStr] = None
+    end_date: Optional[DateStr] = None
+    days: int = Field(7, ge=1, le=366)
+    temperatures: Optional[List[float]] = Field(None, min_length=1)
+    rain_flags: List[Literal[0, 1]] = Field([0, 1], min_length=1)
+    moon_phases: List[Literal["Amavasya", "Normal", "Purnima"]] = Field(["Amavasya", "Normal", "Purnima"],
+                                                                          min_length=1)
+
+    @model_validator(mode="after")
+    def _has_temple(self):
+        if not (self.temples or self.temple_name):
+            raise ValueError("give temples or temple_name")
+        return self
+
+    @model_validator(mode="after")
+    def _date_order(self):
+        if self.end_date:
+            start = pd.Timestamp(self.start_date) if self.start_date else pd.Timestamp.today().normalize()
+            end = pd.Timestamp(self.end_date)
+            # Compare wall-clock dates so a zoned timestamp against a naive one is not a TypeError.
+            if end.tz_localize(None) < start.tz_localize(None):
+                raise ValueError(f"end_date {self.end_date} is before start_date {start:%Y-%m-%d}")
+        return self
+
+    def temple_list(self):
+        return self.temples or [self.temple_name]
+
+
+class GateEvent(Schema):
+    temple: Union[str, int]
+    # Epoch seconds.
+    ts: float = Field(ge=0)
+    count: float = Field(1, ge=0)
+
+
+class GateEventColumns(Schema):
+    temple: List[Union[str, int]] = []
+    ts: List[Annotated[float, Field(ge=0)]] = []
+    # None = one entry per event.
+    count: Optional[List[Annotated[float, Field(ge=0)]]] = None
+
+    @model_validator(mode="after")
+    def _equal_lengths(self):
+        n = len(self.ts)
+        if len(self.temple) != n or (self.count is not None and len(self.count) != n):
+            counts = "" if self.count is None else f", {len(self.count)} count"
+            raise ValueError(f"columns differ in length: {len(self.temple)} temple, {n} ts{counts}")
+        return self
+
+
+class GateEventBatch(Schema):
+    events: Union[GateEventColumns, List[GateEvent]] = GateEventColumns()
+
+    def columns(self):
+        if isinstance(self.events, GateEventColumns):
+            return self.events
+        return GateEventColumns.model_construct(
+            temple=[e.temple for e in self.events],
+            ts=[e.ts for e in self.events],
+            count=[e.count for e in self.events],
+        )
+
+
+class FlushRequest(Schema):
+    # Epoch seconds; None = this server's clock.
+    now: Optional[float] = None
+
+
+class TempleTick(Schema):
+    id: Union[str, int]
+    live_count: float = Field(ge=0)
+    capacity: float = Field(gt=0)
+    threshold_warning: float = Field(85, gt=0, le=100)
+    threshold_critical: float = Field(95, gt=0, le=100)
+    # People per minute from a nowcast; None = the engine's smoothed observed rate.
+    net_rate: Optional[float] = None
+
+    @model_validator(mode="after")
+    def _threshold_order(self):
+        if self.threshold_warning > self.threshold_critical:
+            raise ValueError("threshold_warning is above threshold_critical")
+        return self
+
+
+class AlertTickRequest(Schema):
+    # Epoch seconds; None = this server's clock.
+    now: Optional[float] = Field(None, ge=0)
+    temples: List[TempleTick] = []
+
+
+class ChatRequest(Schema):
+    query: str = ""
+    context: str = ""
+
+
+class ChatResponse(Schema):
+    answer: str
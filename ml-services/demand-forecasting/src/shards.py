@@ -0,0 +1,300 @@
+"""Per-temple / per-region model shards with lazy loading and LRU eviction.
+
+Layout under MODEL_PATH:
+
+    optimized_temple_brain.pkl      optional global model (all temples)
+    shards/manifest.json            written by src/train_shards.py
+    shards/<shard>.pkl              one joblib artifact per temple or region
+
+A shard is loaded from disk the first time one of its temples is requested
+and kept in an LRU map bounded by resident bytes. Temples without a trained
+shard fall back to the global model, and failing that to a baseline profile
+built from the same domain rules that generated the training data.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from common.deadline import check
+from common.tracing import span
+from src.features import FEATURES, SHARD_FEATURES, build_features, temple_key
+
+GLOBAL_ARTIFACT = "optimized_temple_brain.pkl"
+GLOBAL_SHARD = "__global__"
+
+# Base daily footfall per temple used by the training data generator.
+BASELINE_FOOTFALL = {
+    "somnath": 18000,
+    "dwarka": 15000,
+    "ambaji": 25000,
+    "pavagadh": 20000,
+}
+DEFAULT_FOOTFALL = 15000
+
+
+class BaselineModel:
+    """Rule-based stand-in with the same predict(frame) contract as a booster."""
+
+    def __init__(self, base):
+        self.base = float(base)
+
+    def predict(self, frame):
+        mult = 1.0 + 0.6 * frame["Is_Weekend"].to_numpy() + 0.3 * frame["Is_Vacation"].to_numpy()
+        mult = mult + 0.2 * frame["Is_Shravan"].to_numpy()
+        # Encoded with MOON_PHASES order: 2 == Purnima
+        mult = mult + 0.5 * (frame["Moon_Phase_Encoded"].to_numpy() == 2)
+        mult = mult * np.where(frame["Rain_Flag"].to_numpy() == 1, 0.8, 1.0)
+        return self.base * mult
+
+
+class Shard:
+    """A loaded model plus the metadata needed to build its inputs."""
+
+    def __init__(self, name, model, columns, temple_codes=None, le_moon=None,
+                 nbytes=0, version="baseline"):
+        self.name = name
+        self.model = model
+        self.columns = list(columns)
+        self.temple_codes = temple_codes or {}
+        self.le_moon = le_moon
+        self.nbytes = nbytes
+        self.version = version
+
+    @property
+    def is_baseline(self):
+        return isinstance(self.model, BaselineModel)
+
+    def frame(self, temple, dates, temperature, rain_flag, moon_phase):
+        code = self.temple_codes.get(temple_key(temple), 0)
+        return build_features(dates, temperature, rain_flag, moon_phase,
+                              columns=self.columns, temple_code=code, le_moon=self.le_moon)
+
+    def infer(self, frame):
+        return np.maximum(np.asarray(self.model.predict(frame), dtype=np.float64), 0.0)
+
+    def predict(self, temple, dates, temperature, rain_flag, moon_phase):
+        return self.infer(self.frame(temple, dates, temperature, rain_flag, moon_phase))
+
+
+class ShardStore:
+    """Resolves temples to shards, loading lazily and evicting least recently used."""
+
+    def __init__(self, model_dir, max_resident_bytes=512 * 1024 * 1024):
+        self.model_dir = model_dir
+        self.shard_dir = os.path.join(model_dir, "shards")
+        self.max_resident_bytes = max_resident_bytes
+        self._lock = threading.Lock()
+        self._resident = OrderedDict()
+        self._baselines = {}
+        self._global_temples = None
+        self.counters = {"hits": 0, "loads": 0, "evictions": 0, "load_seconds": 0.0}
+        # Called as on_infer(shard, seconds) around model inference only (no feature building).
+        self.on_infer = None
+        # Optional PredictionCache consulted per (temple, date) row before features are built.
+        self.cache = None
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        path = os.path.join(self.shard_dir, "manifest.json")
+        if not os.path.exists(path):
+            return {"shards": {}, "temples": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    @property
+    def resident_bytes(self):
+        return sum(s.nbytes for s in self._resident.values())
+
+    def _artifact_path(self, shard_name):
+        if shard_name == GLOBAL_SHARD:
+            return os.path.join(self.model_dir, GLOBAL_ARTIFACT)
+        return os.path.join(self.shard_dir, self.manifest["shards"][shard_name]["file"])
+
+    def _load(self, shard_name):
+        import joblib
+
+        path = self._artifact_path(shard_name)
+        started = time.perf_counter()
+        artifacts = joblib.load(path)
+        elapsed = time.perf_counter() - started
+
+        temples = artifacts.get("temples")
+        le_temple = artifacts.get("le_temple")
+        if le_temple is not None:
+            codes = {temple_key(t): i for i, t in enumerate(le_temple.classes_)}
+        else:
+            codes = {temple_key(t): 0 for t in temples or []}
+        columns = artifacts.get("features") or (FEATURES if le_temple is not None else SHARD_FEATURES)
+        shard = Shard(shard_name, artifacts["model"], columns, codes, artifacts.get("le_moon"),
+                      nbytes=os.path.getsize(path), version=artifacts.get("version", shard_name))
+        return shard, elapsed
+
+    def _get_resident(self, shard_name):
+        with self._lock:
+            shard = self._resident.get(shard_name)
+            if shard is not None:
+                self._resident.move_to_end(shard_name)
+                self.counters["hits"] += 1
+                return shard
+
+        # Load outside the lock so hits on other shards are not blocked.
+        shard, elapsed = self._load(shard_name)
+
+        with self._lock:
+            existing = self._resident.get(shard_name)
+            if existing is not None:
+                return existing
+            self._resident[shard_name] = shard
+            self.counters["loads"] += 1
+            self.counters["load_seconds"] += elapsed
+            while len(self._resident) > 1 and self.resident_bytes > self.max_resident_bytes:
+                self._resident.popitem(last=False)
+                self.counters["evictions"] += 1
+        return shard
+
+    def preload(self, reload=False):
+        """Load shards up front until the byte budget is reached; returns their names.
+
+        With `reload`, the manifest is re-read and resident shards dropped first,
+        so retrained artifacts are picked up.
+        """
+        if reload:
+            with self._lock:
+                self.manifest = self._read_manifest()
+                self._resident.clear()
+                self._global_temples = None
+        names = list(self.manifest["shards"])
+        if os.path.exists(os.path.join(self.model_dir, GLOBAL_ARTIFACT)):
+            names.append(GLOBAL_SHARD)
+        loaded = []
+        for name in names:
+            if self.resident_bytes + os.path.getsize(self._artifact_path(name)) > self.max_resident_bytes:
+                break
+            self._get_resident(name)
+            loaded.append(name)
+        return loaded
+
+    def _baseline(self, key):
+        shard = self._baselines.get(key)
+        if shard is None:
+            base = BASELINE_FOOTFALL.get(key, DEFAULT_FOOTFALL)
+            shard = Shard("baseline:" + key, BaselineModel(base), SHARD_FEATURES)
+            self._baselines[key] = shard
+        return shard
+
+    def get(self, temple):
+        """Return the shard serving `temple`, loading it if needed."""
+        key = temple_key(temple)
+        shard_name = self.manifest["temples"].get(key)
+        if shard_name is not None:
+            return self._get_resident(shard_name)
+
+        if os.path.exists(os.path.join(self.model_dir, GLOBAL_ARTIFACT)):
+            if self._global_temples is None or key in self._global_temples:
+                shard = self._get_resident(GLOBAL_SHARD)
+                self._global_temples = set(shard.temple_codes)
+                if key in self._global_temples:
+                    return shard
+        return self._baseline(key)
+
+    def known_temples(self):
+        """Temple keys served by a trained shard or the global artifact."""
+        temples = set(self.manifest["temples"])
+        if os.path.exists(os.path.join(self.model_dir, GLOBAL_ARTIFACT)):
+            temples |= set(self._get_resident(GLOBAL_SHARD).temple_codes)
+        return sorted(temples)
+
+    def predict(self, temple, dates, temperature, rain_flag, moon_phase, use_cache=True):
+        check("features")
+        with span("shard_resolve") as stage:
+            shard = self.get(temple)
+            stage.set("shard", shard.name)
+        cache = self.cache if use_cache else None
+        if cache is None:
+            return self._infer(shard, temple, dates, temperature, rain_flag, moon_phase)
+
+        with span("cache_lookup", rows=len(dates)) as stage:
+            keys = cache.keys(shard, temple, dates, temperature, rain_flag, moon_phase)
+            values = cache.get_many(keys)
+            missing = [i for i, v in enumerate(values) if v is None]
+            stage.set("misses", len(missing))
+        if not missing:
+            return np.array(values, dtype=np.float64)
+        # Only the missing rows go through the model, still as one batch.
+        n = len(keys)
+        pred = self._infer(shard, temple, pd.DatetimeIndex(pd.to_datetime(dates))[missing],
+                           np.broadcast_to(np.asarray(temperature, dtype=np.float64), (n,))[missing],
+                           np.broadcast_to(np.asarray(rain_flag, dtype=np.int64), (n,))[missing],
+                           np.broadcast_to(np.asarray(moon_phase, dtype=object), (n,))[missing])
+        cache.put_many(cache.model(shard), [keys[i] for i in missing], pred)
+        out = np.array([0.0 if v is None else v for v in values], dtype=np.float64)
+        out[missing] = pred
+        return out
+
+    def predict_many(self, temples, dates, temperature, rain_flag, moon_phase):
+        """Predictions of shape (len(temples), len(dates)) with one model call per shard.
+
+        Weather and moon phase broadcast to that shape, so each temple may
+        have its own rows. Temples served by the same shard are stacked into
+        a single frame. The prediction cache is not consulted: these are
+        hypothetical inputs that would only push real traffic out of it.
+        """
+        check("features")
+        dates = pd.DatetimeIndex(pd.to_datetime(dates))
+        shape = (len(temples), len(dates))
+        temperature = np.broadcast_to(np.asarray(temperature, dtype=np.float64), shape)
+        rain_flag = np.broadcast_to(np.asarray(rain_flag, dtype=np.int64), shape)
+        moon_phase = np.broadcast_to(np.asarray(moon_phase, dtype=object), shape)
+        groups = {}
+        with span("shard_resolve", temples=len(temples)):
+            for i, temple in enumerate(temples):
+                shard = self.get(temple)
+                groups.setdefault(shard.name, (shard, []))[1].append(i)
+
+        out = np.empty(shape)
+        for shard, rows in groups.values():
+            with span("features", rows=len(rows) * len(dates)):
+                codes = [shard.temple_codes.get(temple_key(temples[i]), 0) for i in rows]
+                frame = build_features(dates[np.tile(np.arange(len(dates)), len(rows))],
+                                       temperature[rows].ravel(), rain_flag[rows].ravel(), moon_phase[rows].ravel(),
+                                       columns=shard.columns, temple_code=np.repeat(codes, len(dates)),
+                                       le_moon=shard.le_moon)
+            check("inference")
+            with span("inference", shard=shard.name, version=str(shard.version)):
+                started = time.perf_counter()
+                out[rows] = shard.infer(frame).reshape(len(rows), len(dates))
+                if self.on_infer is not None:
+                    self.on_infer(shard, time.perf_counter() - started)
+        return out
+
+    def _infer(self, shard, temple, dates, temperature, rain_flag, moon_phase):
+        with span("features", rows=len(dates)):
+            frame = shard.frame(temple, dates, temperature, rain_flag, moon_phase)
+        check("inference")
+        with span("inference", shard=shard.name, version=str(shard.version)):
+            if self.on_infer is None:
+                return shard.infer(frame)
+            started = time.perf_counter()
+            pred = shard.infer(frame)
+            self.on_infer(shard, time.perf_counter() - started)
+            return pred
+
+    def versions(self):
+        """(shard, version) for every resident shard."""
+        with self._lock:
+            return [(name, shard.version) for name, shard in self._resident.items()]
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "resident_shards": list(self._resident),
+                "resident_bytes": self.resident_bytes,
+                "max_resident_bytes": self.max_resident_bytes,
+                "known_shards": len(self.manifest["shards"]),
+            }
@@ -0,0 +1,154 @@
+"""Server-sent-event fan-out of forecast and nowcast deltas.
+
+Producers publish whole snapshots of a topic ({key: value}); only entries
+whose value changed since the last publish are forwarded. Keys are
+"temple/date/slot" for the forecast and "temple/slot" for the nowcast.
+
+Each subscriber owns a pending map keyed like the state, so a slow consumer
+never queues more than one value per key: a newer value overwrites the
+unsent one (coalescing), and the whole backlog goes out as one event the
+next time the connection can take a write. If a subscriber still falls
+more than `max_pending` keys behind, its backlog is dropped and it gets a
+fresh snapshot instead. Publishing never blocks on a subscriber; it only
+updates the subscriber's map and wakes its event-loop task.
+"""
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.forecast import slot_weights
+
+TOPICS = ("forecast", "nowcast")
+DEFAULT_MAX_PENDING = 20000
+HEARTBEAT_SECONDS = 15.0
+# Nowcast slots are temple-local wall-clock hours. India keeps no DST, so a
+# fixed offset is exact and needs no tz database in the image.
+TEMPLE_TZ = timezone(timedelta(hours=5, minutes=30), "Asia/Kolkata")
+
+
+def forecast_entries(temples, first_date, values, slots):
+    """Forecast cube (temples, days) -> {"temple/date/slot": visitors}."""
+    dates = np.datetime64(str(first_date)[:10], "D") + np.arange(values.shape[1])
+    per_slot = np.rint(np.asarray(values)[:, :, None] * slot_weights(slots)).astype(np.int64)
+    return {
+        f"{temple}/{date}/{slot}": int(per_slot[i, d, s])
+        for i, temple in enumerate(temples)
+        for d, date in enumerate(dates)
+        for s, slot in enumerate(slots)
+    }
+
+
+def nowcast_entries(nowcast, now, tz=TEMPLE_TZ):
+    """Per-temple nowcast -> {"temple/slot": {...}}, slot = the hour `now` falls in at `tz`."""
+    hour = datetime.fromtimestamp(now, tz).hour
+    slot = f"{hour:02d}:00-{(hour + 1) % 24:02d}:00"
+    return {f"{temple}/{slot}": value for temple, value in nowcast.items()}
+
+
+class Subscriber:
+    """One SSE connection: a coalescing backlog plus a wake-up event."""
+
+    def __init__(self, loop, topics, temples=None):
+        self.loop = loop
+        self.topics = set(topics)
+        self.temples = set(temples) if temples else None
+        self.pending = {}
+        self.resync = True  # the first event is a snapshot
+        self.wakeup = asyncio.Event()
+
+    def wants(self, topic, key):
+        return topic in self.topics and (self.temples is None or key.split("/", 1)[0] in self.temples)
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.wakeup.set)
+
+
+class DeltaBroadcaster:
+    """Latest value per (topic, key), pushed to subscribers as deltas."""
+
+    def __init__(self, max_pending=DEFAULT_MAX_PENDING):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._state = {topic: {} for topic in TOPICS}
+        self._subscribers = set()
+        self.seq = 0
+        self.counters = {"publishes": 0, "changed": 0, "coalesced": 0, "resyncs": 0, "events": 0}
+
+    def publish(self, topic, entries, replace=False):
+        """Merge a snapshot of `topic`; returns the number of changed entries.
+
+        With `replace`, keys missing from `entries` are removed (sent as null).
+        """
+        with self._lock:
+            state = self._state[topic]
+            changed = {k: v for k, v in entries.items() if state.get(k, object()) != v}
+            if replace:
+                changed.update({k: None for k in state.keys() - entries.keys()})
+            for key, value in changed.items():
+                if value is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+            self.counters["publishes"] += 1
+            self.counters["changed"] += len(changed)
+            if not changed:
+                return 0
+            self.seq += 1
+            for sub in self._subscribers:
+                if sub.resync or topic not in sub.topics:
+                    continue
+                before = len(sub.pending)
+                for key, value in changed.items():
+                    if sub.wants(topic, key):
+                        if (topic, key) in sub.pending:
+                            self.counters["coalesced"] += 1
+                        sub.pending[(topic, key)] = value
+                if len(sub.pending) > self.max_pending:
+                    sub.pending.clear()
+                    sub.resync = True
+                    self.counters["resyncs"] += 1
+                if sub.resync or len(sub.pending) > before:
+                    sub.notify()
+            return len(changed)
+
+    def subscribe(self, loop, topics=TOPICS, temples=None):
+        sub = Subscriber(loop, [t for t in topics if t in self._state], temples)
+        with self._lock:
+            self._subscribers.add(sub)
+        sub.wakeup.set()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def drain(self, sub):
+        """("snapshot" | "delta", seq, {topic: {key: value}}) for everything owed to `sub`."""
+        with self._lock:
+            sub.wakeup.clear()
+            batch = {}
+            if sub.resync:
+                kind = "snapshot"
+                for topic in sub.topics:
+                    batch[topic] = {k: v for k, v in self._state[topic].items() if sub.wants(topic, k)}
+                sub.resync = False
+            else:
+                kind = "delta"
+                for (topic, key), value in sub.pending.items():
+                    batch.setdefault(topic, {})[key] = value
+            sub.pending = {}
+            self.counters["events"] += 1
+            return kind, self.seq, batch
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "seq": self.seq,
+                "subscribers": len(self._subscribers),
+                "pending": sum(len(s.pending) for s in self._subscribers),
+                "entries": {topic: len(state) for topic, state in self._state.items()},
+                "max_pending": self.max_pending,
+            }
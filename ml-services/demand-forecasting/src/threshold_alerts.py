@@ -0,0 +1,178 @@
+"""Forecast-aware capacity alerts with lead time, hysteresis and deduplication.
+
+CrowdTracker raises the 85% / 95% alerts only once the live count has
+crossed them, and re-raises them every time the count wobbles around the
+line. This engine projects each temple's live count `lead_minutes` ahead
+(from a smoothed net-flow rate, or a caller-supplied nowcast rate) and:
+
+* raises WARNING / CRITICAL as soon as the projection crosses the threshold,
+  reporting the expected minutes until the crossing;
+* keeps the level until the count and projection fall `band_pct` points
+  below the threshold (hysteresis), so it does not flap at the boundary;
+* suppresses a repeat of the same level within `cooldown_minutes`. A
+  suppressed raise leaves the temple at its previous level, so the
+  escalation is still pending and fires on the first tick after the
+  cooldown if the projection is still over the line.
+
+Every tick evaluates all temples with array operations; only the rows that
+change state are turned into alert dicts.
+"""
+import threading
+from collections import deque
+
+import numpy as np
+
+NONE, WARNING, CRITICAL = 0, 1, 2
+LEVEL_NAMES = {NONE: "NORMAL", WARNING: "WARNING", CRITICAL: "CRITICAL"}
+
+DEFAULT_LEAD_MINUTES = 30
+DEFAULT_BAND_PCT = 5.0
+DEFAULT_COOLDOWN_MINUTES = 10
+# Smoothing of the observed net flow (people per minute).
+RATE_ALPHA = 0.5
+
+
+class ThresholdAlertEngine:
+    """Vectorised per-tick evaluation of projected capacity thresholds."""
+
+    def __init__(self, lead_minutes=DEFAULT_LEAD_MINUTES, band_pct=DEFAULT_BAND_PCT,
+                 cooldown_minutes=DEFAULT_COOLDOWN_MINUTES, capacity=64, max_events=1000):
+        self.lead_minutes = lead_minutes
+        self.band_pct = band_pct
+        self.cooldown_minutes = cooldown_minutes
+        self._lock = threading.Lock()
+        self.temples = {}
+        self.names = []
+        self._alloc(capacity)
+        self.events = deque(maxlen=max_events)
+        self.counters = {"ticks": 0, "raised": 0, "cleared": 0, "suppressed": 0}
+
+    def _alloc(self, capacity):
+        """(Re)size the state arrays, keeping existing rows."""
+        def grow(name, fill, dtype=np.float64):
+            out = np.full(capacity, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                out[: len(old)] = old
+            setattr(self, name, out)
+
+        grow("last_count", np.nan)
+        grow("last_time", np.nan)
+        grow("rate", 0.0)
+        grow("projected", np.nan)
+        grow("level", NONE, np.int8)
+        grow("last_warning", -np.inf)
+        grow("last_critical", -np.inf)
+
+    def _index(self, temple_ids):
+        rows = np.empty(len(temple_ids), dtype=np.int64)
+        for i, name in enumerate(temple_ids):
+            row = self.temples.get(name)
+            if row is None:
+                row = self.temples[name] = len(self.names)
+                self.names.append(name)
+            rows[i] = row
+        if len(self.names) > len(self.level):
+            self._alloc(max(len(self.names), 2 * len(self.level)))
+        return rows
+
+    def tick(self, temple_ids, live_count, capacity, now, warning_pct=85.0, critical_pct=95.0,
+             net_rate=None):
+        """Evaluate one snapshot of live counts; returns raised/cleared events.
+
+        `now` is epoch seconds. `net_rate` (people per minute, may be NaN per
+        temple) overrides the smoothed observed rate, e.g. with a nowcast.
+        """
+        with self._lock:
+            rows = self._index([str(t) for t in temple_ids])
+            count = np.asarray(live_count, dtype=np.float64)
+            cap = np.maximum(np.asarray(capacity, dtype=np.float64), 1.0)
+            warn = np.broadcast_to(np.asarray(warning_pct, dtype=np.float64), count.shape)
+            crit = np.broadcast_to(np.asarray(critical_pct, dtype=np.float64), count.shape)
+            minute = now / 60.0
+
+            # Net flow: smoothed slope of the live count between ticks.
+            dt = minute - self.last_time[rows]
+            observed = np.where(dt > 0, (count - self.last_count[rows]) / np.where(dt > 0, dt, 1.0), np.nan)
+            rate = np.where(np.isnan(observed), self.rate[rows],
+                            RATE_ALPHA * observed + (1 - RATE_ALPHA) * self.rate[rows])
+            self.rate[rows] = rate
+            self.last_count[rows], self.last_time[rows] = count, minute
+            if net_rate is not None:
+                supplied = np.asarray(net_rate, dtype=np.float64)
+                rate = np.where(np.isnan(supplied), rate, supplied)
+
+            projected = count + rate * self.lead_minutes
+            self.projected[rows] = projected
+            pct_now = 100.0 * count / cap
+            peak = np.maximum(pct_now, 100.0 * projected / cap)
+
+            current = self.level[rows]
+            hold_crit = (current == CRITICAL) & (peak >= crit - self.band_pct)
+            hold_warn = (current >= WARNING) & (peak >= warn - self.band_pct)
+            nxt = np.where((peak >= crit) | hold_crit, CRITICAL,
+                           np.where((peak >= warn) | hold_warn, WARNING, NONE)).astype(np.int8)
+
+            # Minutes until the count reaches the threshold of the new level.
+            target = np.where(nxt == CRITICAL, crit, warn) * cap / 100.0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                eta = np.where(count >= target, 0.0, (target - count) / rate)
+            eta = np.where(np.isfinite(eta) & (eta >= 0), eta, np.nan)
+
+            last_warning, last_critical = self.last_warning[rows], self.last_critical[rows]
+            last_same = np.where(nxt == CRITICAL, last_critical, last_warning)
+            up = nxt > current
+            fresh = up & (minute - last_same >= self.cooldown_minutes)
+            self.level[rows] = np.where(up & ~fresh, current, nxt)
+            self.last_critical[rows] = np.where(fresh & (nxt == CRITICAL), minute, last_critical)
+            self.last_warning[rows] = np.where(fresh & (nxt == WARNING), minute, last_warning)
+            down = nxt < current
+
+            self.counters["ticks"] += 1
+            self.counters["suppressed"] += int((up & ~fresh).sum())
+            events = []
+            for i in np.flatnonzero(fresh | down):
+                events.append({
+                    "temple": self.names[rows[i]],
+                    "event": "raised" if fresh[i] else "cleared",
+                    "level": LEVEL_NAMES[int(nxt[i])],
+                    "previous_level": LEVEL_NAMES[int(current[i])],
+                    "live_count": int(count[i]),
+                    "capacity": int(cap[i]),
+                    "percentage": round(float(pct_now[i]), 1),
+                    "projected_percentage": round(float(100.0 * projected[i] / cap[i]), 1),
+                    "net_rate_per_minute": round(float(rate[i]), 2),
+                    "minutes_to_threshold": None if np.isnan(eta[i]) else round(float(eta[i]), 1),
+                    "lead_minutes": self.lead_minutes,
+                    "at": now,
+                })
+            self.counters["raised"] += int(fresh.sum())
+            self.counters["cleared"] += int(down.sum())
+            self.events.extend(events)
+            return events
+
+    def nowcast(self):
+        """Latest live and projected count per temple (for the SSE stream)."""
+        with self._lock:
+            return {
+                name: {"live_count": int(self.last_count[row]),
+                       "projected_count": int(max(self.projected[row], 0.0)),
+                       "level": LEVEL_NAMES[int(self.level[row])],
+                       "lead_minutes": self.lead_minutes}
+                for name, row in self.temples.items()
+                if not np.isnan(self.projected[row])
+            }
+
+    def state(self):
+        with self._lock:
+            return {
+                "temples": {
+                    name: {"level": LEVEL_NAMES[int(self.level[row])],
+                           "net_rate_per_minute": round(float(self.rate[row]), 2)}
+                    for name, row in self.temples.items()
+                },
+                **self.counters,
+                "lead_minutes": self.lead_minutes,
+                "band_pct": self.band_pct,
+                "cooldown_minutes": self.cooldown_minutes,
+            }
@@ -0,0 +1,131 @@
+"""Train per-temple (or per-region) model shards in a process pool.
+
+Usage:
+    python -m src.train_shards --data gujarat_temple_traffic_10y.csv
+    python -m src.train_shards --data traffic.csv --regions regions.json --workers 4
+
+`regions.json` maps a region name to its temples, e.g.
+{"saurashtra": ["Somnath", "Dwarka"]}. Temples not listed in any region get
+a shard of their own. Output goes to <model-dir>/shards with a manifest that
+src/shards.py reads at startup.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from src.features import FEATURES, SHARD_FEATURES, build_features, temple_key
+
+
+def train_one(name, rows, out_dir, params):
+    """Fit one shard; runs inside a worker process."""
+    import joblib
+    from sklearn.preprocessing import LabelEncoder
+    from xgboost import XGBRegressor
+
+    started = time.perf_counter()
+    temples = sorted(rows["Temple"].unique())
+
+    le_moon = LabelEncoder().fit(rows["Moon_Phase"])
+    le_temple = None
+    columns = SHARD_FEATURES
+    codes = 0
+    if len(temples) > 1:
+        le_temple = LabelEncoder().fit(rows["Temple"])
+        codes = le_temple.transform(rows["Temple"])
+        columns = FEATURES
+
+    X = build_features(rows["Date"], rows["Temperature_C"].to_numpy(), rows["Rain_Flag"].to_numpy(),
+                       rows["Moon_Phase"].to_numpy(), columns=columns, temple_code=codes, le_moon=le_moon)
+    y = rows["Footfall"].to_numpy()
+
+    model = XGBRegressor(n_jobs=1, **params)
+    model.fit(X, y)
+    mae = float(np.mean(np.abs(model.predict(X) - y)))
+
+    artifacts = {
+        "model": model,
+        "le_moon": le_moon,
+        "features": list(columns),
+        "temples": temples,
+        "version": f"{name}-{int(time.time())}",
+    }
+    if le_temple is not None:
+        artifacts["le_temple"] = le_temple
+
+    filename = f"{name}.pkl"
+    path = os.path.join(out_dir, filename)
+    joblib.dump(artifacts, path)
+    return {
+        "name": name,
+        "file": filename,
+        "temples": temples,
+        "rows": int(len(rows)),
+        "train_mae": round(mae, 1),
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def group_rows(df, regions):
+    """Split the dataset into one frame per shard."""
+    assigned = {}
+    for region, members in regions.items():
+        for temple in members:
+            assigned[temple_key(temple)] = temple_key(region)
+    keys = df["Temple"].map(lambda t: assigned.get(temple_key(t), temple_key(t)))
+    return {name: rows for name, rows in df.groupby(keys)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train demand-forecasting shards")
+    parser.add_argument("--data", required=True, help="CSV with Date, Temple, Footfall, weather and moon columns")
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_PATH", "models"))
+    parser.add_argument("--regions", help="JSON file mapping region -> [temples]")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--n-estimators", type=int, default=1000)
+    parser.add_argument("--learning-rate", type=float, default=0.05)
+    parser.add_argument("--max-depth", type=int, default=6)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data, parse_dates=["Date"])
+    regions = {}
+    if args.regions:
+        with open(args.regions) as f:
+            regions = json.load(f)
+
+    out_dir = os.path.join(args.model_dir, "shards")
+    os.makedirs(out_dir, exist_ok=True)
+    params = {
+        "n_estimators": args.n_estimators,
+        "learning_rate": args.learning_rate,
+        "max_depth": args.max_depth,
+    }
+
+    groups = group_rows(df, regions)
+    print(f"⏳ Training {len(groups)} shards with {args.workers} workers...")
+    started = time.perf_counter()
+    shards = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(train_one, name, rows, out_dir, params) for name, rows in groups.items()]
+        for future in as_completed(futures):
+            meta = future.result()
+            shards[meta["name"]] = meta
+            print(f"   ✅ {meta['name']}: {meta['rows']} rows, MAE {meta['train_mae']}, {meta['seconds']}s")
+
+    manifest = {
+        "created_at": int(time.time()),
+        "shards": {name: {k: v for k, v in meta.items() if k != "name"} for name, meta in shards.items()},
+        "temples": {temple_key(t): name for name, meta in shards.items() for t in meta["temples"]},
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"💾 Wrote {len(shards)} shards to {out_dir} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Readiness gating: warm the model path before a worker takes traffic.
+
+/health only says the process is alive. /ready turns green once this
+warmup has run representative requests end to end in the worker:
+climatology fill, feature building and inference on every resident shard,
+for single-date booking calls and week-long dashboard batches. That first
+pass pays the one-off costs (lazy imports, pandas and XGBoost
+initialisation, shard loads for temples the parent did not preload), so
+the first real booking does not.
+"""
+import threading
+import time
+
+from src.forecast import horizon_dates
+
+WARMUP_ROUNDS = 3
+WARMUP_BATCH_DAYS = 7
+
+
+def warm(store, climatology, temples, rounds=WARMUP_ROUNDS, batch_days=WARMUP_BATCH_DAYS):
+    """Run booking-shaped and dashboard-shaped predictions; returns the number of calls."""
+    dates = horizon_dates(days=batch_days)
+    calls = 0
+    for _ in range(rounds):
+        for temple in temples:
+            for batch in (dates[:1], dates):
+                temperature, rain_flag = climatology.fill(temple, batch)
+                # Bypass the prediction cache: a hit would skip the path being warmed.
+                store.predict(temple, batch, temperature, rain_flag, "Normal", use_cache=False)
+                calls += 1
+    return calls
+
+
+class Readiness:
+    """Tracks warmup state for /ready: starting -> warming -> ready | failed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "starting"
+        self.created = time.monotonic()
+        self.warmup_seconds = None
+        self.ready_after_seconds = None
+        self.calls = 0
+        self.error = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def run(self, fn):
+        """Run `fn()` (returns a call count) and record the outcome."""
+        with self._lock:
+            self.state = "warming"
+        started = time.perf_counter()
+        try:
+            calls = fn()
+        except Exception as e:
+            with self._lock:
+                self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+            print(f"❌ Warmup failed: {self.error}")
+            return
+        with self._lock:
+            self.warmup_seconds = time.perf_counter() - started
+            self.ready_after_seconds = time.monotonic() - self.created
+            self.calls = calls
+            self.state = "ready"
+        print(f"✅ Warmup: {calls} predictions in {self.warmup_seconds:.2f}s")
+
+    def start(self, fn):
+        threading.Thread(target=self.run, args=(fn,), name="warmup", daemon=True).start()
+
+    def status(self):
+        with self._lock:
+            return {
+                "status": self.state,
+                "warmup_seconds": None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+                "ready_after_seconds": None if self.ready_after_seconds is None else round(self.ready_after_seconds, 3),
+                "warmup_calls": self.calls,
+                "error": self.error,
+            }
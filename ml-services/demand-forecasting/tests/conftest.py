@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """TestClient over the app with an empty MODEL_PATH, so every temple is served by its baseline shard.
+
+    Startup hooks (warmup, publisher, precompute threads) are not run; the
+    client is not entered as a context manager.
+    """
+    os.environ["MODEL_PATH"] = str(tmp_path_factory.mktemp("models"))
+    os.environ["EXPLAIN_HORIZON_DAYS"] = "1"
+    os.environ.pop("ADMIN_TOKEN", None)
+    from fastapi.testclient import TestClient
+
+    from src.api import app
+    return TestClient(app)
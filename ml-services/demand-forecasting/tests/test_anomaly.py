@@ -0,0 +1,63 @@
+import numpy as np
+
+from src.anomaly import WARMUP_MINUTES, EntryRateDetector
+
+HOUR = 1_767_225_600  # 2026-01-01 00:00 UTC, the top of an hour
+WEEK = 7 * 24 * 3600
+
+
+def feed(detector, start, minutes, rates):
+    """Feed `rates` {temple: entries per minute} for `minutes` minutes from `start`; returns raised alerts."""
+    alerts = []
+    for m in range(minutes):
+        ts = start + 60 * m
+        temples = [t for t, rate in rates.items() for _ in range(rate)]
+        alerts += detector.ingest(temples, [ts + 1] * len(temples))
+    return alerts
+
+
+def warmed():
+    d = EntryRateDetector(threshold=4.0, lead_minutes=15)
+    # One week of this hour-of-week is the warm-up; the next week is scored against it.
+    assert feed(d, HOUR, WARMUP_MINUTES, {"a": 10, "b": 10}) == []
+    return d
+
+
+def test_steady_traffic_does_not_alert():
+    d = warmed()
+    assert feed(d, HOUR + WEEK, 30, {"a": 10, "b": 11}) == []
+
+
+def test_surge_alerts_once_for_that_temple():
+    d = warmed()
+    feed(d, HOUR + WEEK, 5, {"a": 10, "b": 10})
+    alerts = feed(d, HOUR + WEEK + 300, 20, {"a": 60, "b": 10})
+    assert [a["temple"] for a in alerts] == ["a"]
+    assert alerts[0]["entries_per_minute"] == 60 and alerts[0]["expected_per_minute"] == 10
+    assert d.stats()["alerts"] == 1
+
+
+def test_unsorted_batch_matches_sorted():
+    ts = HOUR + np.array([5, 130, 70, 10, 125])
+    temples = ["a", "b", "a", "b", "a"]
+    sorted_d, shuffled_d = EntryRateDetector(), EntryRateDetector()
+    order = np.argsort(ts)
+    sorted_d.ingest([temples[i] for i in order], ts[order])
+    shuffled_d.ingest(temples, ts)
+    for name in ("mean", "seen", "pending"):
+        np.testing.assert_array_equal(getattr(sorted_d, name), getattr(shuffled_d, name))
+
+
+def test_flush_closes_quiet_minutes():
+    d = EntryRateDetector()
+    d.ingest(["a"], [HOUR])
+    d.flush(HOUR + 10 * 60)
+    assert d.stats()["minutes_closed"] == 10
+    assert d.pending[0] == 0
+
+
+def test_state_grows_past_capacity():
+    d = EntryRateDetector(capacity=2)
+    d.ingest(["a", "b", "c"], [HOUR] * 3)
+    assert d.stats()["temples"] == 3
+    assert len(d.mean) >= 3
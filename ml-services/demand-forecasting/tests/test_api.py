@@ -0,0 +1,183 @@
+"""Request validation: malformed bodies are 4xx, never 500."""
+
+
+def post(client, path, body):
+    return client.post(path, json=body)
+
+
+# /forecast
+
+def test_forecast(client):
+    r = post(client, "/forecast", {"temple_name": "Somnath", "days": 2, "temperature": [30, 31], "rain_flag": 1})
+    assert r.status_code == 200
+    body = r.json()
+    assert len(body["dates"]) == 2
+    assert [p["temple"] for p in body["predictions"]] == ["Somnath", "Somnath"]
+
+
+def test_forecast_needs_a_temple(client):
+    r = post(client, "/forecast", {"days": 2})
+    assert r.status_code == 422
+    assert "temples, temple_name or temple_id" in r.text
+
+
+def test_forecast_weather_list_must_match_days(client):
+    r = post(client, "/forecast", {"temple_name": "Somnath", "days": 2, "temperature": [30, 31, 32]})
+    assert r.status_code == 422
+    assert "temperature has 3 values for 2 days" in r.text
+    assert post(client, "/forecast", {"temple_name": "Somnath", "days": 2, "rain_flag": [0]}).status_code == 422
+
+
+def test_forecast_rain_flag_is_0_or_1(client):
+    assert post(client, "/forecast", {"temple_name": "Somnath", "rain_flag": 5}).status_code == 422
+    assert post(client, "/forecast", {"temple_name": "Somnath", "days": 2, "rain_flag": [0, 3]}).status_code == 422
+
+
+def test_forecast_bad_start_date(client):
+    assert post(client, "/forecast", {"temple_name": "Somnath", "start_date": "2026-13-45"}).status_code == 422
+
+
+def test_forecast_region_without_requested_temples(client):
+    r = post(client, "/forecast", {"temples": ["somnath"], "days": 1, "reconcile": "wls_struct",
+                                   "hierarchy": {"regions": {"Saurashtra": ["somnath"], "North": ["ambaji"]}}})
+    assert r.status_code == 200
+    assert "region/North" not in r.json()["reconciliation"]["nodes"]
+
+
+# /simulate/wait-times
+
+def test_wait_times(client):
+    r = post(client, "/simulate/wait-times", {"temple_name": "Somnath", "date_str": "2026-11-01",
+                                              "slots": ["06:00-07:00"], "replications": 50})
+    assert r.status_code == 200
+    assert [s["slot"] for s in r.json()["slots"]] == ["06:00-07:00"]
+
+
+def test_wait_times_validation(client):
+    base = {"temple_name": "Somnath", "date_str": "2026-11-01", "replications": 50}
+    assert post(client, "/simulate/wait-times", {"temple_name": "Somnath"}).status_code == 422
+    assert post(client, "/simulate/wait-times", {**base, "date_str": "not a date"}).status_code == 422
+    assert post(client, "/simulate/wait-times", {**base, "gates": 0}).status_code == 422
+    assert post(client, "/simulate/wait-times", {**base, "service_rate": 0}).status_code == 422
+    assert post(client, "/simulate/wait-times", {**base, "replications": 0}).status_code == 422
+
+
+# /optimize/slot-capacity
+
+def test_slot_capacity(client):
+    r = post(client, "/optimize/slot-capacity", {"days": 1, "temples": [
+        {"name": "Somnath", "slots": ["06:00 AM - 08:00 AM", "18:00-20:00"], "max_capacity": [100, 200]}]})
+    assert r.status_code == 200
+    day = r.json()["temples"][0]["days"][0]
+    assert sum(day["max_capacity"]) == 300
+
+
+def test_slot_capacity_validation(client):
+    def status(temple, **body):
+        return post(client, "/optimize/slot-capacity", {"days": 1, "temples": [temple], **body}).status_code
+
+    assert post(client, "/optimize/slot-capacity", {"temples": []}).status_code == 422
+    assert status({"name": "Somnath", "slots": ["x"]}) == 422
+    assert status({"name": "Somnath", "slots": []}) == 422
+    assert status({"name": "Somnath", "slots": ["06:00-07:00"], "max_capacity": [1, 2]}) == 422
+    assert status({"name": "Somnath"}, start_date="2026-02-30") == 422
+
+
+# /anomaly
+
+def test_gate_events_both_shapes(client):
+    rows = [{"temple": "api-a", "ts": 1_767_225_600}, {"temple": "api-a", "ts": 1_767_225_601, "count": 3}]
+    assert post(client, "/anomaly/events", {"events": rows}).json()["accepted"] == 2
+    columns = {"temple": ["api-a", 7], "ts": [1_767_225_602, 1_767_225_603], "count": [1, 2]}
+    assert post(client, "/anomaly/events", {"events": columns}).json()["accepted"] == 2
+    assert post(client, "/anomaly/events", {}).json()["accepted"] == 0
+
+
+def test_gate_events_malformed(client):
+    assert post(client, "/anomaly/events", {"events": "x"}).status_code == 422
+    assert post(client, "/anomaly/events", {"events": [{"temple": "a"}]}).status_code == 422
+    r = post(client, "/anomaly/events", {"events": {"temple": ["a", "b"], "ts": [1_767_225_600]}})
+    assert r.status_code == 422
+    assert "differ in length" in r.text
+    r = post(client, "/anomaly/events", {"events": {"temple": ["a"], "ts": [1_767_225_600], "count": [1, 2]}})
+    assert r.status_code == 422
+
+
+def test_flush_defaults_to_now(client):
+    assert post(client, "/anomaly/flush", {}).status_code == 200
+    assert client.post("/anomaly/flush").status_code == 200
+
+
+# /alerts/tick
+
+def test_alert_tick(client):
+    r = post(client, "/alerts/tick", {"now": 1_767_225_600, "temples": [
+        {"id": "api-t", "live_count": 90, "capacity": 100},
+        {"id": 7, "live_count": 10, "capacity": 100, "net_rate": 0},
+    ]})
+    assert r.status_code == 200
+    assert [(e["temple"], e["level"]) for e in r.json()["events"]] == [("api-t", "WARNING")]
+
+
+def test_alert_tick_validation(client):
+    def status(temple):
+        return post(client, "/alerts/tick", {"temples": [temple]}).status_code
+
+    assert post(client, "/alerts/tick", {"temples": "x"}).status_code == 422
+    assert status({"id": "a", "live_count": -1, "capacity": 100}) == 422
+    assert status({"id": "a", "live_count": 10, "capacity": 0}) == 422
+    assert status({"id": "a", "live_count": 10, "capacity": 100, "threshold_warning": 96}) == 422
+    assert status({"live_count": 10, "capacity": 100}) == 422
+
+
+# /predict
+
+def test_predict(client):
+    r = post(client, "/predict", {"temple_name": "Somnath", "date_str": "2026-11-01T00:00:00Z", "rain_flag": 1})
+    assert r.status_code == 200
+    assert r.json()["predicted_visitors"] > 0
+
+
+def test_predict_validation(client):
+    base = {"temple_name": "Somnath", "date_str": "2026-11-01"}
+    assert post(client, "/predict", {"temple_name": "Somnath"}).status_code == 422
+    assert post(client, "/predict", {**base, "date_str": "2026-02-30"}).status_code == 422
+    assert post(client, "/predict", {**base, "date_str": "not a date"}).status_code == 422
+    assert post(client, "/predict", {**base, "rain_flag": 2}).status_code == 422
+
+
+# /explain
+
+def test_explain_needs_a_booster(client):
+    # The test MODEL_PATH is empty, so every temple is on its rule-based baseline.
+    r = post(client, "/explain", {"temple_name": "Somnath", "date_str": "2026-11-01"})
+    assert r.status_code == 404
+    assert "booster" in r.json()["detail"]
+
+
+def test_explain_validation(client):
+    base = {"temple_name": "Somnath", "date_str": "2026-11-01"}
+    assert post(client, "/explain", {"temple_name": "Somnath"}).status_code == 422
+    assert post(client, "/explain", {**base, "date_str": "2026-13-01"}).status_code == 422
+    assert post(client, "/explain", {**base, "rain_flag": 3}).status_code == 422
+
+
+# /scenarios/grid
+
+def test_scenario_grid(client):
+    r = post(client, "/scenarios/grid", {"temple_name": "Somnath", "start_date": "2026-11-01", "end_date": "2026-11-02",
+                                         "temperatures": [25, 35]})
+    assert r.status_code == 200
+    assert r.json()["shape"] == [1, 2, 2, 2, 3]
+
+
+def test_scenario_grid_validation(client):
+    r = post(client, "/scenarios/grid", {})
+    assert r.status_code == 422
+    assert "temples or temple_name" in r.text
+    base = {"temple_name": "Somnath"}
+    assert post(client, "/scenarios/grid", {**base, "start_date": "2026-13-45"}).status_code == 422
+    r = post(client, "/scenarios/grid", {**base, "start_date": "2026-11-05", "end_date": "2026-11-01"})
+    assert r.status_code == 422
+    assert "before start_date" in r.text
+    assert post(client, "/scenarios/grid", {**base, "rain_flags": [2]}).status_code == 422
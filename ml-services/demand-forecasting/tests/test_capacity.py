@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+
+from src.capacity import _norm_cdf, expected_overflow, plan, rebalance
+
+
+def test_norm_cdf():
+    z = np.linspace(-6, 6, 241)
+    exact = np.array([0.5 * (1 + math.erf(v / math.sqrt(2))) for v in z])
+    np.testing.assert_allclose(_norm_cdf(z), exact, atol=2e-7)
+
+
+def test_expected_overflow_matches_integral():
+    mu, sigma, capacity = 1000.0, 150.0, 1100.0
+    d = np.linspace(capacity, mu + 12 * sigma, 200001)
+    pdf = np.exp(-0.5 * ((d - mu) / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi))
+    integral = np.sum((d - capacity) * pdf) * (d[1] - d[0])
+    assert abs(expected_overflow(mu, sigma, capacity) - integral) < 1e-2
+    # Far above demand nothing overflows; far below, all of the gap does.
+    assert expected_overflow(mu, sigma, mu + 20 * sigma) < 1e-6
+    assert abs(expected_overflow(mu, sigma, 0.0) - mu) < 1e-6
+
+
+def test_rebalance_spends_the_budget_within_bounds():
+    mu = np.array([[100.0, 400.0, 900.0, 50.0], [300.0, 300.0, 300.0, 0.0]])
+    sigma = 0.15 * mu + 1
+    mask = np.array([[True] * 4, [True, True, True, False]])
+    lower, upper = np.full(mu.shape, 100.0), np.full(mu.shape, 800.0)
+    budget = np.array([1600.0, 900.0])
+    capacity = rebalance(mu, sigma, budget, lower, upper, mask)
+    assert capacity.dtype == np.int64
+    np.testing.assert_array_equal(capacity.sum(axis=-1), budget)
+    assert (capacity[mask] >= 100).all() and (capacity[mask] <= 800).all()
+    assert capacity[1, 3] == 0
+    # The 900 slot is held at its upper bound; the others share one overflow level.
+    assert capacity[0, 2] == 800
+    np.testing.assert_array_equal(capacity[1, :3], [300, 300, 300])
+
+
+def test_unclipped_slots_share_one_z():
+    mu = np.array([200.0, 500.0, 1000.0])
+    sigma = np.array([30.0, 60.0, 120.0])
+    capacity = rebalance(mu, sigma, np.array(2000.0), np.zeros(3), np.full(3, np.inf), np.ones(3, bool))
+    z = (capacity - mu) / sigma
+    assert z.max() - z.min() < 0.05
+
+
+def test_plan_reduces_expected_overflow():
+    demand = np.array([[[100.0, 800.0, 300.0]]])
+    current = np.full(demand.shape, 400.0)
+    capacity, before, after = plan(demand, current, np.ones(demand.shape, bool))
+    assert capacity.sum() == 1200
+    assert after.sum() < before.sum()
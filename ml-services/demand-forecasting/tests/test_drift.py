@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.drift import MAX_BINS, DriftMonitor, _status, bin_edges, build_reference, proportions, psi
+
+
+def training_frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01", periods=n, freq="D"),
+        "Temple": rng.choice(["Somnath", "Dwarka"], n),
+        "Temperature_C": rng.normal(30, 3, n),
+        "Rain_Flag": rng.integers(0, 2, n),
+        "Moon_Phase": rng.choice(["Amavasya", "Normal", "Purnima"], n, p=[0.1, 0.8, 0.1]),
+        "Footfall": rng.normal(15000, 2000, n),
+    })
+
+
+def test_psi():
+    assert psi(np.array([50.0, 50.0]), [0.5, 0.5]) == pytest.approx(0.0)
+    expected = (0.5 - 0.9) * np.log(0.5 / 0.9) + (0.5 - 0.1) * np.log(0.5 / 0.1)
+    assert psi(np.array([5.0, 5.0]), [0.9, 0.1]) == pytest.approx(expected)
+    assert psi(np.zeros(3), [0.2, 0.3, 0.5]) is None
+
+
+def test_status_bands():
+    assert [_status(v) for v in (None, 0.05, 0.2, 0.3)] == ["no-data", "stable", "moderate", "significant"]
+
+
+def test_bin_edges():
+    assert bin_edges([0, 1, 1, 0, 1]) == [0.5]
+    edges = bin_edges(np.random.default_rng(0).normal(size=1000))
+    assert len(edges) == MAX_BINS - 1 and edges == sorted(edges)
+    assert sum(proportions(np.arange(100), edges)) == pytest.approx(1.0)
+
+
+def replay(monitor, df):
+    for row in df.itertuples():
+        monitor.record(row.Temple, row.Date, row.Temperature_C, row.Rain_Flag, row.Moon_Phase, row.Footfall)
+
+
+def test_matching_traffic_is_stable_and_a_shift_is_not():
+    reference = build_reference(training_frame())
+    monitor = DriftMonitor(reference, flush_every=64)
+    replay(monitor, training_frame(seed=1)[:700])
+    report = monitor.report()
+    assert report["recorded"] == 700
+    assert report["features"]["Temperature_C"]["status"] == "stable"
+    assert report["predictions"]["somnath"]["status"] == "stable"
+
+    monitor.reset()
+    assert monitor.report()["features"]["Temperature_C"]["status"] == "no-data"
+    hot = training_frame(seed=2)[:700].assign(Temperature_C=lambda f: f["Temperature_C"] + 8)
+    replay(monitor, hot)
+    report = monitor.report()
+    assert report["features"]["Temperature_C"]["status"] == "significant"
+    assert report["features"]["Rain_Flag"]["status"] == "stable"
+
+
+def test_report_bins_a_partly_filled_buffer():
+    monitor = DriftMonitor(build_reference(training_frame()), flush_every=64)
+    replay(monitor, training_frame(seed=3)[:10])
+    assert monitor.report()["features"]["Rain_Flag"]["n"] == 10
+
+
+def test_without_reference_nothing_is_recorded(tmp_path):
+    monitor = DriftMonitor.load(str(tmp_path))
+    monitor.record("Somnath", "2026-01-01", 30.0, 0, "Normal", 15000.0)
+    assert not monitor.report()["enabled"] and monitor.recorded == 0
+
+
+def test_drift_endpoints_name_the_worker(client):
+    assert client.get("/drift").json()["worker"] == os.getpid()
+    # conftest clears ADMIN_TOKEN, so the admin-only reset is switched off.
+    assert client.post("/drift/reset").status_code == 404
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from src.climatology import Climatology
+from src.export import HEADER, ForecastExport, decode, encode
+from src.features import CRITICAL_VISITORS, HIGH_VISITORS
+from src.shards import ShardStore
+
+
+@pytest.mark.parametrize("temples", [["somnath"], ["somnath", "dwarka", "ambaji"], ["a", "bb", "ccc", "dddd"]])
+def test_round_trip(temples):
+    values = np.random.default_rng(0).uniform(0, 2 * CRITICAL_VISITORS, size=(len(temples), 9)).astype(np.float32)
+    payload = encode(temples, "2026-11-01T10:30:00", values)
+    got_temples, first_date, got_values, status = decode(payload)
+    assert got_temples == temples
+    assert first_date == np.datetime64("2026-11-01")
+    np.testing.assert_array_equal(got_values, values)
+    np.testing.assert_array_equal(status, (values > HIGH_VISITORS).astype(np.uint8) + (values > CRITICAL_VISITORS))
+
+
+def test_float_block_is_4_byte_aligned():
+    for name in ("a", "ab", "abc", "abcd"):
+        payload = encode([name], "2026-11-01", np.full((1, 3), 7.0))
+        # The cube ends with 3 float32 values and 3 status bytes.
+        start = len(payload) - 3 * 4 - 3
+        assert start % 4 == 0
+        np.testing.assert_array_equal(np.frombuffer(payload, "<f4", 3, start), [7.0, 7.0, 7.0])
+        assert payload[HEADER.size + len(name):start] == b"\0" * (start - HEADER.size - len(name))
+
+
+def test_empty_cube():
+    temples, _, values, status = decode(encode([], "2026-11-01", np.zeros((0, 7))))
+    assert temples == [] and values.shape == (0, 7) and status.shape == (0, 7)
+
+
+def test_rejects_other_payloads():
+    with pytest.raises(ValueError, match="magic"):
+        decode(b"XXXX" + encode(["a"], "2026-11-01", np.ones((1, 1)))[4:])
+
+
+def test_etag_is_stable_and_if_none_match(tmp_path):
+    export = ForecastExport(ShardStore(str(tmp_path)), Climatology.seasonal(), days=3, refresh_seconds=0)
+    payload, etag = export.current()
+    assert export.current() == (payload, etag)
+    assert export.counters["builds"] == 2
+    assert export.matches(f'W/{etag}, "other"', etag)
+    assert export.matches("*", etag)
+    assert not export.matches('"other"', etag)
+
+
+def test_export_endpoint_honours_if_none_match(client):
+    r = client.get("/export/forecast")
+    assert r.status_code == 200
+    assert decode(r.content)[2].shape[1] > 0
+    assert client.get("/export/forecast", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
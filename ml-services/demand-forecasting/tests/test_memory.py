@@ -0,0 +1,29 @@
+import tracemalloc
+
+import pytest
+
+from common.memory import MemoryMonitor
+
+
+def test_window_stops_tracing_it_started():
+    monitor = MemoryMonitor()
+    assert not tracemalloc.is_tracing()
+    report = monitor.window(1, limit=5)
+    assert report["seconds"] >= 1 and len(report["top"]) <= 5
+    assert not tracemalloc.is_tracing()
+
+
+def test_window_stops_tracing_when_the_diff_fails():
+    with pytest.raises(ValueError):
+        MemoryMonitor().window(1, group_by="bogus")
+    assert not tracemalloc.is_tracing()
+
+
+def test_window_leaves_running_tracer_alone():
+    monitor = MemoryMonitor()
+    monitor.start()
+    try:
+        monitor.window(1)
+        assert tracemalloc.is_tracing()
+    finally:
+        monitor.stop()
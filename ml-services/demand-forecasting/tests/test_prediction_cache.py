@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+
+from src.prediction_cache import PredictionCache
+from src.shards import ShardStore
+
+
+def written(cache, n, timeout=10.0):
+    """Wait for the background writer to commit `n` rows."""
+    deadline = time.monotonic() + timeout
+    while cache.counters["written"] < n and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert cache.counters["written"] >= n
+
+
+def test_keys_carry_model_version_and_rounded_inputs(tmp_path):
+    shard = ShardStore(str(tmp_path)).get("Somnath")
+    keys = PredictionCache.keys(shard, "Somnath", ["2026-11-01", "2026-11-02"], 30.04, 1, "Normal")
+    assert keys == [f"{shard.name}@{shard.version}|somnath|2026-11-0{d}|30.0|1|Normal" for d in (1, 2)]
+
+
+def test_rows_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = PredictionCache(path)
+    writer.put_many("m@1", ["a", "b"], [1.0, 2.0])
+    assert writer.get_many(["a", "b", "c"]) == [1.0, 2.0, None]
+    written(writer, 2)
+
+    reader = PredictionCache(path)
+    assert reader.get_many(["b", "c"]) == [2.0, None]
+    assert reader.counters["disk_hits"] == 1 and reader.counters["misses"] == 1
+
+
+def test_memory_front_is_bounded(tmp_path):
+    cache = PredictionCache(str(tmp_path / "cache.db"), memory_entries=3)
+    cache.put_many("m@1", list("abcde"), range(5))
+    assert list(cache._memory) == ["c", "d", "e"]
+
+
+def test_warm_merges_under_live_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    old = PredictionCache(path)
+    old.put_many("m@1", ["a", "b", "c"], [1.0, 2.0, 3.0])
+    old.put_many("m@0", ["stale"], [9.0])
+    written(old, 4)
+
+    cache = PredictionCache(path, memory_entries=4)
+    # Written after startup, before the warm-load finished.
+    cache.put_many("m@1", ["b", "z"], [20.0, 26.0])
+    assert cache.warm(["m@1"]) == 2
+    assert list(cache._memory.items()) == [("a", 1.0), ("c", 3.0), ("b", 20.0), ("z", 26.0)]
+
+
+def test_store_serves_repeat_rows_from_the_cache(tmp_path):
+    store = ShardStore(str(tmp_path))
+    store.cache = PredictionCache(str(tmp_path / "cache.db"))
+    dates = ["2026-11-01", "2026-11-02", "2026-11-03"]
+    first = store.predict("Somnath", dates, 30.0, 0, "Normal")
+    again = store.predict("Somnath", dates[1:] + ["2026-11-04"], 30.0, 0, "Normal")
+    np.testing.assert_array_equal(again[:2], first[1:])
+    assert store.cache.counters["memory_hits"] == 2
+    np.testing.assert_array_equal(again, store.predict("Somnath", dates[1:] + ["2026-11-04"], 30.0, 0, "Normal",
+                                                       use_cache=False))
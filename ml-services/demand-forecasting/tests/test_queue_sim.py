@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.climatology import Climatology
+from src.queue_sim import CHUNK_REPLICATIONS, STEP_MINUTES, WaitTimeSimulator, queue_lengths, simulate_day
+from src.shards import ShardStore
+
+SLOTS = ["06:00-07:00", "07:00-08:00", "08:00-09:00"]
+
+
+def lindley(arrivals, served):
+    """Reference Q_t = max(Q_{t-1} + A_t - S_t, 0), one step at a time."""
+    queue, q = np.zeros(len(arrivals)), 0
+    for t, (a, s) in enumerate(zip(arrivals, served)):
+        q = max(q + a - s, 0)
+        queue[t] = q
+    return queue
+
+
+def test_closed_form_matches_lindley_recursion():
+    rng = np.random.default_rng(0)
+    arrivals, served = rng.poisson(10, size=(3, 200)), rng.poisson(10, size=(3, 200))
+    queue = queue_lengths(arrivals, served)
+    for i in range(3):
+        np.testing.assert_array_equal(queue[i], lindley(arrivals[i], served[i]))
+
+
+def test_light_load_has_no_wait():
+    results, done = simulate_day(10, SLOTS, gates=4, service_rate=8, replications=200, seed=1)
+    assert done == 200
+    assert [r["slot"] for r in results] == SLOTS
+    assert all(r["wait_minutes"]["p99"] <= STEP_MINUTES for r in results)
+
+
+def test_backlog_carries_into_later_slots():
+    # Every slot is overloaded, so the queue only grows through the day.
+    results, _ = simulate_day(20000, SLOTS, gates=1, service_rate=8, replications=100, seed=1)
+    waits = [r["wait_minutes"]["mean"] for r in results]
+    assert waits == sorted(waits) and waits[-1] > waits[0] > 0
+    assert all(r["offered_load"] > 1 for r in results)
+
+
+def test_seed_reproduces_results():
+    a = simulate_day(5000, SLOTS, replications=300, seed=7)
+    b = simulate_day(5000, SLOTS, replications=300, seed=7)
+    assert a == b
+
+
+def test_stop_returns_completed_chunks():
+    _, done = simulate_day(5000, SLOTS, replications=3 * CHUNK_REPLICATIONS, seed=1, stop=lambda: True)
+    assert done == CHUNK_REPLICATIONS
+
+
+def test_bad_inputs():
+    with pytest.raises(ValueError, match="slot label"):
+        simulate_day(100, ["x"])
+    with pytest.raises(ValueError, match="positive"):
+        simulate_day(100, SLOTS, service_rate=0)
+
+
+def test_cache_key_is_normalised(tmp_path):
+    sim = WaitTimeSimulator(ShardStore(str(tmp_path)), Climatology.seasonal())
+    first = sim.simulate("Somnath", "2026-01-05", SLOTS, replications=100)
+    second = sim.simulate("somnath", "2026-1-5", SLOTS, replications=100)
+    assert not first["cached"] and second["cached"]
+    assert second["temple"] == "somnath" and second["slots"] == first["slots"]
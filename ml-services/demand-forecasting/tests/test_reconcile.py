@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from src.reconcile import Hierarchy, projection, reconcile, shrink_covariance
+
+TEMPLES = ["somnath", "dwarka", "ambaji"]
+REGIONS = {"Saurashtra": ["somnath", "dwarka"], "North": ["ambaji"]}
+SLOTS = {"somnath": ["06:00-07:00", "07:00-08:00"]}
+
+
+def hierarchy():
+    return Hierarchy(TEMPLES, REGIONS, SLOTS)
+
+
+def assert_coherent(h, values):
+    bottom = values[-len(h.bottom):]
+    np.testing.assert_allclose(h.S @ bottom, values, atol=1e-6)
+
+
+def test_summing_matrix():
+    h = hierarchy()
+    assert h.keys() == [
+        "total", "region/Saurashtra", "region/North", "temple/somnath",
+        "slot/somnath/06:00-07:00", "slot/somnath/07:00-08:00", "temple/dwarka", "temple/ambaji",
+    ]
+    # total, two regions and the slotted temple above four bottom series
+    assert h.S.shape == (8, 4)
+    np.testing.assert_array_equal(h.S[0], [1, 1, 1, 1])
+    np.testing.assert_array_equal(h.S[1], [1, 1, 1, 0])
+    np.testing.assert_array_equal(h.S[3], [1, 1, 0, 0])
+    np.testing.assert_array_equal(h.S[-4:], np.eye(4))
+
+
+def test_region_without_requested_temples_is_dropped():
+    h = Hierarchy(["somnath"], {"Saurashtra": ["somnath"], "North": ["ambaji"]})
+    assert list(h.regions) == ["Saurashtra"]
+    assert "region/North" not in h.keys()
+    assert (h.S.sum(axis=1) > 0).all()
+
+
+@pytest.mark.parametrize("method", ["ols", "wls_struct", "mint_shrink"])
+def test_reconciled_forecasts_add_up(method):
+    h = hierarchy()
+    rng = np.random.default_rng(0)
+    base = rng.uniform(100, 1000, size=(len(h.nodes), 5))
+    residuals = rng.normal(0, 10, size=(len(h.nodes), 30)) if method == "mint_shrink" else None
+    out = reconcile(h.S, base, method, residuals)
+    assert out.shape == base.shape
+    assert_coherent(h, out)
+
+
+@pytest.mark.parametrize("method", ["ols", "wls_struct"])
+def test_coherent_input_is_unchanged(method):
+    h = hierarchy()
+    base = h.S @ np.array([[10.0, 20.0], [30.0, 40.0], [50.0, 60.0], [70.0, 80.0]])
+    np.testing.assert_allclose(reconcile(h.S, base, method), base)
+
+
+@pytest.mark.parametrize("method", ["ols", "wls_struct"])
+def test_woodbury_path_matches_full_projection(method):
+    h = hierarchy()
+    base = np.random.default_rng(1).uniform(0, 500, size=(len(h.nodes), 7))
+    np.testing.assert_allclose(reconcile(h.S, base, method), h.S @ projection(h.S, method) @ base)
+
+
+def test_shrink_covariance():
+    residuals = np.random.default_rng(2).normal(size=(4, 50))
+    W, lam = shrink_covariance(residuals)
+    assert 0.0 <= lam <= 1.0
+    np.testing.assert_allclose(W, W.T)
+    assert np.all(np.linalg.eigvalsh(W) > 0)
+
+
+def test_shrink_covariance_needs_two_residuals():
+    with pytest.raises(ValueError, match=">= 2 residuals"):
+        shrink_covariance(np.ones((3, 1)))
+
+
+def test_mint_shrink_needs_residuals():
+    with pytest.raises(ValueError, match="residuals"):
+        reconcile(hierarchy().S, np.ones((8, 1)), "mint_shrink")
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError, match="unknown reconciliation method"):
+        projection(hierarchy().S, "median")
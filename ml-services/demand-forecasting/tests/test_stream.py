@@ -0,0 +1,64 @@
+import asyncio
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from src.stream import DeltaBroadcaster, forecast_entries, nowcast_entries
+
+NOW = 1_700_000_000  # 2023-11-14 22:13 UTC, 03:43 in Kolkata
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_nowcast_slot_is_temple_local_hour():
+    assert list(nowcast_entries({"somnath": 1}, NOW)) == ["somnath/03:00-04:00"]
+    assert list(nowcast_entries({"somnath": 1}, NOW, ZoneInfo("UTC"))) == ["somnath/22:00-23:00"]
+
+
+def test_forecast_entries_split_days_into_slots():
+    entries = forecast_entries(["somnath"], "2026-11-01", np.array([[1000.0, 2000.0]]), ["06:00-07:00", "17:00-18:00"])
+    assert set(entries) == {f"somnath/2026-11-0{d}/{s}" for d in (1, 2) for s in ("06:00-07:00", "17:00-18:00")}
+    assert entries["somnath/2026-11-01/06:00-07:00"] + entries["somnath/2026-11-01/17:00-18:00"] == 1000
+
+
+def test_first_drain_is_a_snapshot_then_deltas(loop):
+    b = DeltaBroadcaster()
+    b.publish("forecast", {"a/1": 1, "b/1": 2})
+    sub = b.subscribe(loop, ["forecast"])
+    assert b.drain(sub)[0::2] == ("snapshot", {"forecast": {"a/1": 1, "b/1": 2}})
+    assert b.publish("forecast", {"a/1": 1, "b/1": 3}) == 1
+    assert b.drain(sub)[0::2] == ("delta", {"forecast": {"b/1": 3}})
+
+
+def test_pending_updates_coalesce_per_key(loop):
+    b = DeltaBroadcaster()
+    sub = b.subscribe(loop, ["forecast"], temples=["a"])
+    b.drain(sub)
+    for value in (1, 2, 3):
+        b.publish("forecast", {"a/1": value, "b/1": value})
+    assert b.drain(sub)[2] == {"forecast": {"a/1": 3}}
+    assert b.stats()["coalesced"] == 2
+
+
+def test_replace_sends_removed_keys_as_null(loop):
+    b = DeltaBroadcaster()
+    sub = b.subscribe(loop, ["forecast"])
+    b.publish("forecast", {"a/1": 1, "a/2": 2})
+    b.drain(sub)
+    b.publish("forecast", {"a/2": 2}, replace=True)
+    assert b.drain(sub)[2] == {"forecast": {"a/1": None}}
+
+
+def test_slow_subscriber_is_resynced(loop):
+    b = DeltaBroadcaster(max_pending=2)
+    sub = b.subscribe(loop, ["nowcast"])
+    b.drain(sub)
+    b.publish("nowcast", {"a/1": 1, "b/1": 1, "c/1": 1})
+    kind, _, batch = b.drain(sub)
+    assert kind == "snapshot" and batch == {"nowcast": {"a/1": 1, "b/1": 1, "c/1": 1}}
@@ -0,0 +1,67 @@
+from src.threshold_alerts import ThresholdAlertEngine
+
+
+def engine(**kwargs):
+    return ThresholdAlertEngine(**{"lead_minutes": 0, "band_pct": 5, "cooldown_minutes": 10, **kwargs})
+
+
+def tick(e, count, minute, **kwargs):
+    events = e.tick(["a"], [count], [100], minute * 60, **kwargs)
+    return [(ev["event"], ev["level"]) for ev in events]
+
+
+def level(e):
+    return e.state()["temples"]["a"]["level"]
+
+
+def test_raise_and_clear():
+    e = engine()
+    assert tick(e, 50, 0) == []
+    assert tick(e, 90, 1) == [("raised", "WARNING")]
+    assert tick(e, 97, 2) == [("raised", "CRITICAL")]
+    assert tick(e, 50, 3) == [("cleared", "NORMAL")]
+
+
+def test_hysteresis_holds_the_level_inside_the_band():
+    e = engine()
+    tick(e, 90, 0)
+    # 82% is under the 85% line but inside the 5-point band.
+    assert tick(e, 82, 1) == []
+    assert level(e) == "WARNING"
+    assert tick(e, 79, 2) == [("cleared", "NORMAL")]
+
+
+def test_projection_raises_ahead_of_the_crossing():
+    e = engine(lead_minutes=30)
+    events = e.tick(["a"], [70], [100], 0, net_rate=[0.5])
+    assert [(ev["event"], ev["level"]) for ev in events] == [("raised", "WARNING")]
+    assert events[0]["minutes_to_threshold"] == 30.0
+
+
+def test_repeat_within_cooldown_is_suppressed():
+    e = engine()
+    tick(e, 90, 0)
+    tick(e, 50, 1)
+    assert tick(e, 90, 2) == []
+    assert e.state()["suppressed"] == 1
+
+
+def test_suppressed_escalation_fires_after_cooldown():
+    e = engine()
+    assert tick(e, 97, 0) == [("raised", "CRITICAL")]
+    assert tick(e, 50, 1) == [("cleared", "NORMAL")]
+    assert tick(e, 88, 2) == [("raised", "WARNING")]
+    # CRITICAL was raised at minute 0, so this escalation waits for the cooldown...
+    assert tick(e, 97, 3) == []
+    assert level(e) == "WARNING"
+    assert tick(e, 97, 9) == []
+    # ...and is sent on the first tick after it, not lost.
+    assert tick(e, 97, 10) == [("raised", "CRITICAL")]
+    assert tick(e, 97, 11) == []
+
+
+def test_temples_are_independent():
+    e = engine()
+    events = e.tick(["a", "b", "c"], [90, 10, 97], [100, 100, 100], 0)
+    assert {(ev["temple"], ev["level"]) for ev in events} == {("a", "WARNING"), ("c", "CRITICAL")}
+    assert set(e.nowcast()) == {"a", "b", "c"}
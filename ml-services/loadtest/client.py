@@ -0,0 +1,173 @@
+"""Asyncio HTTP/1.1 client and latency reporting shared by the load tools.
+
+Standard library only, so the tools run from any checkout without either
+service's requirements. The client keeps a pool of keep-alive connections,
+like axios with an agent. It speaks just enough HTTP/1.1 for the ML
+services: Content-Length and chunked responses.
+"""
+import asyncio
+import math
+import time
+from urllib.parse import urlparse
+
+# Upper bounds of the latency histogram, in milliseconds.
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+BAR_WIDTH = 40
+
+
+class Pool:
+    """Up to `connections` keep-alive connections to one host."""
+
+    def __init__(self, url, connections=64, timeout=30.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(connections)
+        self._idle = []
+
+    async def request(self, method, path, body=b"", headers=None):
+        """Send one request; returns (status, response body)."""
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                conn = self._idle.pop() if reused else await self._open()
+                try:
+                    status, payload, keep = await asyncio.wait_for(
+                        self._exchange(conn, method, path, body, headers), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn[1].close()
+                    if reused:
+                        continue  # the server closed an idle keep-alive connection; try the next one
+                    raise
+                except BaseException:
+                    conn[1].close()
+                    raise
+                if keep:
+                    self._idle.append(conn)
+                else:
+                    conn[1].close()
+                return status, payload
+
+    async def _open(self):
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def _exchange(self, conn, method, path, body, headers):
+        reader, writer = conn
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        status = int(status_line.split()[1])
+        length, chunked, keep = None, False, True
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = "chunked" in value
+            elif name == "connection":
+                keep = value != "close"
+
+        if chunked:
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                parts.append(await reader.readexactly(size))
+                await reader.readline()
+            payload = b"".join(parts)
+        elif length is not None:
+            payload = await reader.readexactly(length)
+        else:
+            payload, keep = await reader.read(), False
+        return status, payload, keep
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+class Results:
+    """Latencies and status counts for one group of requests."""
+
+    def __init__(self):
+        self.latencies = []  # milliseconds, successful and failed responses alike
+        self.statuses = {}
+        self.errors = {}  # exception name -> count, for requests that got no response
+
+    def add(self, status, ms):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies.append(ms)
+
+    def fail(self, exc):
+        name = type(exc).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    @property
+    def count(self):
+        return len(self.latencies) + sum(self.errors.values())
+
+    def summary(self, elapsed):
+        ordered = sorted(self.latencies)
+        failed = sum(n for status, n in self.statuses.items() if status >= 500) + sum(self.errors.values())
+        return {
+            "requests": self.count,
+            "throughput_rps": round(self.count / elapsed, 2) if elapsed > 0 else None,
+            "error_rate": round(failed / self.count, 4) if self.count else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "errors": dict(self.errors),
+            "latency_ms": {
+                "mean": round(sum(ordered) / len(ordered), 3) if ordered else None,
+                **{f"p{p}": None if v is None else round(v, 3)
+                   for p, v in ((p, percentile(ordered, p)) for p in (50, 95, 99))},
+                "max": round(ordered[-1], 3) if ordered else None,
+            },
+        }
+
+    def histogram(self):
+        """Text histogram of latencies, one line per bucket."""
+        counts = [0] * (len(HISTOGRAM_MS) + 1)
+        for ms in self.latencies:
+            counts[next((i for i, bound in enumerate(HISTOGRAM_MS) if ms <= bound), len(HISTOGRAM_MS))] += 1
+        used = [i for i, n in enumerate(counts) if n]
+        if not used:
+            return []
+        peak = max(counts)
+        lines = []
+        for i in range(used[0], used[-1] + 1):
+            label = f"<= {HISTOGRAM_MS[i]} ms" if i < len(HISTOGRAM_MS) else f"> {HISTOGRAM_MS[-1]} ms"
+            bar = "#" * max(1 if counts[i] else 0, round(counts[i] / peak * BAR_WIDTH))
+            lines.append(f"  {label:>12} {counts[i]:>8} {bar}")
+        return lines
+
+
+async def timed(pool, results, method, path, body=b"", headers=None):
+    """Issue one request and record its latency (or failure) in each Results of `results`."""
+    started = time.perf_counter()
+    try:
+        status, _ = await pool.request(method, path, body, headers)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+        for r in results:
+            r.fail(e)
+        return
+    ms = (time.perf_counter() - started) * 1000
+    for r in results:
+        r.add(status, ms)
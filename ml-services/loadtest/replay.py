@@ -0,0 +1,168 @@
+"""Replay recorded ML traffic against a local instance and report latency.
+
+    cd ml-services
+    python -m loadtest.replay --url http://127.0.0.1:8000 --speed 10 /data/recordings/demand-forecasting-*.jsonl.gz*
+
+Reads the files that RECORD_DIR collects in either service (see
+common/recorder.py), merges them by arrival time and reissues each request with its
+original method, path, query, content type and body.
+
+* `--speed 1` keeps the recorded gaps between arrivals, and `--speed 10`
+  divides them by ten. Both are open loop: a slow response does not delay
+  the next arrival, just as in production.
+* `--speed max` sends as fast as `--connections` allow. That measures the
+  ceiling rather than the behaviour at a given rate.
+
+Recordings taken at RECORD_SAMPLE_RATIO r hold about r of the real
+arrivals, so `--speed 1/r` roughly restores the production rate. Requests
+recorded without a body (over RECORD_MAX_BODY_KB) are skipped.
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import gzip
+import json
+import time
+
+from loadtest.client import Pool, Results, percentile, timed
+
+
+def read_records(path):
+    """Records of one recording file, bodies decoded to bytes; stops at a truncated gzip member."""
+    records = []
+    with gzip.open(path, "rt") as f:
+        try:
+            for line in f:
+                record = json.loads(line)
+                if "body_b64" in record:
+                    record["body"] = base64.b64decode(record.pop("body_b64"))
+                elif "body" in record:
+                    record["body"] = record["body"].encode()
+                records.append(record)
+        except (EOFError, gzip.BadGzipFile):
+            print(f"⚠️ {path} ends in a partial batch; using the {len(records):,} records before it")
+    return records
+
+
+def load(patterns, paths=None, limit=None):
+    """All replayable records from the files matching `patterns`, in arrival order."""
+    files = sorted({f for pattern in patterns for f in glob.glob(pattern)})
+    records, skipped = [], 0
+    for path in files:
+        for record in read_records(path):
+            if "body" not in record or paths and record["path"] not in paths:
+                skipped += 1
+                continue
+            records.append(record)
+    records.sort(key=lambda r: r["ts"])
+    return files, (records[:limit] if limit else records), skipped
+
+
+async def replay(records, url, speed, connections, timeout):
+    pool = Pool(url, connections, timeout)
+    by_path = {}
+    overall = Results()
+    lags = []
+    tasks = set()
+    # At max speed, keep at most one queued request per connection so memory stays flat.
+    window = asyncio.Semaphore(connections * 2) if speed is None else None
+
+    async def issue(record):
+        results = by_path.setdefault(record["path"], Results())
+        target = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        headers = {"Content-Type": record["content_type"]} if record.get("content_type") else None
+        await timed(pool, (overall, results), record["method"], target, record["body"], headers)
+        if window is not None:
+            window.release()
+
+    started = time.perf_counter()
+    first = records[0]["ts"] if records else 0.0
+    for record in records:
+        if window is not None:
+            await window.acquire()
+        else:
+            due = started + (record["ts"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append((time.perf_counter() - due) * 1000)
+        task = asyncio.ensure_future(issue(record))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return overall, by_path, lags, elapsed
+
+
+def print_report(title, summary, results):
+    latency = summary["latency_ms"]
+    print(f"{title}: {summary['requests']:,} requests, {summary['throughput_rps']} req/s, "
+          f"errors {summary['error_rate']:.2%}, statuses {summary['statuses']}")
+    if latency["p50"] is not None:
+        print(f"  p50 {latency['p50']:.1f} ms  p95 {latency['p95']:.1f} ms  p99 {latency['p99']:.1f} ms  "
+              f"max {latency['max']:.1f} ms")
+    if summary["errors"]:
+        print(f"  no response: {summary['errors']}")
+    for line in results.histogram():
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", help="recording files or glob patterns")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", default="1", help="arrival-time multiplier (1, 10, ...) or 'max'")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--paths", help="comma-separated paths to replay (default: all recorded)")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    speed = None if args.speed == "max" else float(args.speed)
+
+    paths = set(args.paths.split(",")) if args.paths else None
+    files, records, skipped = load(args.files, paths, args.limit)
+    if not records:
+        raise SystemExit(f"❌ No replayable requests in {len(files)} file(s)")
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"⏳ Replaying {len(records):,} requests from {len(files)} file(s) ({skipped:,} skipped), "
+          f"recorded over {span:.1f}s, at {'max' if speed is None else f'{speed:g}x'} speed")
+
+    overall, by_path, lags, elapsed = asyncio.run(replay(records, args.url, speed, args.connections, args.timeout))
+    recorded = {}
+    for record in records:
+        recorded.setdefault(record["path"], Results()).add(record["status"], record["duration_ms"])
+
+    report = {
+        "url": args.url,
+        "speed": args.speed,
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": overall.summary(elapsed),
+        "paths": {path: {"replayed": results.summary(elapsed),
+                         "recorded": recorded[path].summary(span)}
+                  for path, results in sorted(by_path.items())},
+    }
+    if lags:
+        ordered = sorted(lags)
+        report["schedule_lag_ms"] = {"p50": round(percentile(ordered, 50), 3), "max": round(ordered[-1], 3)}
+
+    print_report("overall", report["overall"], overall)
+    for path, results in sorted(by_path.items()):
+        print_report(path, report["paths"][path]["replayed"], results)
+        before = report["paths"][path]["recorded"]["latency_ms"]
+        print(f"  recorded in production: p50 {before['p50']:.1f} ms  p99 {before['p99']:.1f} ms")
+    if lags:
+        print(f"schedule lag: p50 {report['schedule_lag_ms']['p50']:.1f} ms, max {report['schedule_lag_ms']['max']:.1f} ms"
+              " (large values mean this client, not the service, was the bottleneck)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json}")
+    print("✅ Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Open-loop load test of the ML services with booking, dashboard, camera and bot traffic.
+
+    cd ml-services
+    python -m loadtest.suite --mix festival --duration 120 --json results/festival.json
+    python -m loadtest.suite --mix normal --baseline results/normal-main.json
+
+test-ml.ps1 checks that each endpoint answers once. This suite checks how
+the services behave under a realistic concurrent mix. Each scenario has its
+own arrival process, generated up front from a seed, and requests go out at
+their scheduled time whether or not earlier ones have returned (open loop).
+A slow service therefore shows up as latency and errors, not as a quietly
+lower request rate.
+
+* booking: Poisson arrivals on /predict, with periodic bursts (a darshan
+  slot opening). Each request carries the backend's X-Request-Timeout-Ms.
+* dashboard: control-room screens polling /forecast on a fixed period with
+  jitter.
+* camera: gate cameras posting a frame to /detect at a fixed interval.
+* bot: Poisson arrivals on /chat.
+
+Per scenario, the report gives offered and achieved throughput,
+p50/p95/p99, the error rate (5xx or no response) and the shed rate (429).
+`min_throughput_ratio` is the share of arrivals answered with a 2xx.
+Latency checks are skipped for scenarios with fewer than MIN_SAMPLES
+responses. The JSON result holds every number together with the thresholds it was
+checked against (thresholds.json, overridable with --thresholds). With
+--baseline, p95/p99 are also compared to an earlier result. The exit status
+is 1 if any check fails, so the suite can gate a release.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import random
+import time
+from datetime import date, timedelta
+
+from loadtest.client import Pool, Results, timed
+
+TEMPLES = ("somnath", "dwarka", "ambaji", "pavagadh")
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+BOUNDARY = "loadtest-frame"
+# Fewer responses than this make p95/p99 noise, so latency checks are skipped.
+MIN_SAMPLES = 20
+
+# Rates per second and periods in seconds, per worker-sized deployment.
+MIXES = {
+    "normal": {
+        "booking": {"rate": 5.0, "burst_every": 60.0, "burst_seconds": 5.0, "burst_factor": 4.0},
+        "dashboard": {"screens": 4, "period": 10.0},
+        "camera": {"cameras": 4, "period": 2.0},
+        "bot": {"rate": 0.5},
+    },
+    "festival": {
+        "booking": {"rate": 25.0, "burst_every": 30.0, "burst_seconds": 5.0, "burst_factor": 6.0},
+        "dashboard": {"screens": 12, "period": 5.0},
+        "camera": {"cameras": 16, "period": 1.0},
+        "bot": {"rate": 3.0},
+    },
+}
+
+
+def poisson_arrivals(rng, rate, duration, burst_every=None, burst_seconds=0.0, burst_factor=1.0):
+    """Arrival times of a Poisson process whose rate is multiplied by `burst_factor` inside bursts.
+
+    Thinning: draw at the peak rate and keep each arrival with probability rate(t) / peak.
+    """
+    peak = rate * (burst_factor if burst_every else 1.0)
+    times, t = [], 0.0
+    while peak > 0:
+        t += rng.expovariate(peak)
+        if t >= duration:
+            break
+        bursting = burst_every and t % burst_every < burst_seconds
+        if bursting or rng.random() < rate / peak:
+            times.append(t)
+    return times
+
+
+def periodic_arrivals(rng, sources, period, duration, jitter=0.1):
+    """Arrival times of `sources` clients each firing every `period` seconds, phases spread at random."""
+    times = []
+    for _ in range(sources):
+        t = rng.uniform(0, period)
+        while t < duration:
+            times.append(t)
+            t += period * (1 + rng.uniform(-jitter, jitter))
+    return sorted(times)
+
+
+def booking_request(rng, timeout_ms):
+    day = date.today() + timedelta(days=rng.randrange(1, 60))
+    body = {"temple_name": rng.choice(TEMPLES), "date_str": day.isoformat(), "temperature": None,
+            "rain_flag": None, "moon_phase": "Normal", "is_weekend": int(day.weekday() >= 5)}
+    headers = {"Content-Type": "application/json"}
+    if timeout_ms:
+        headers["X-Request-Timeout-Ms"] = str(timeout_ms)
+    return "/predict", json.dumps(body).encode(), headers
+
+
+def dashboard_request(rng, timeout_ms):
+    body = {"temples": list(TEMPLES), "days": 7}
+    return "/forecast", json.dumps(body).encode(), {"Content-Type": "application/json"}
+
+
+def bot_request(rng, timeout_ms):
+    temple = rng.choice(TEMPLES)
+    body = {"query": f"When is the best time to visit {temple}?", "context": f"{temple}: {rng.randrange(20, 95)}% full"}
+    return "/chat", json.dumps(body).encode(), {"Content-Type": "application/json"}
+
+
+def camera_request_factory(frame_kb):
+    # One frame is reused; the mock detector does not look at pixels, and encoding is not under test.
+    frame = os.urandom(frame_kb * 1024)
+    body = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"gate.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + frame + f"\r\n--{BOUNDARY}--\r\n".encode()
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    return lambda rng, timeout_ms: ("/detect", body, headers)
+
+
+def build_schedule(mix, duration, seed, frame_kb):
+    """{scenario: (service, arrival times, request factory)} for one run."""
+    rng = random.Random(seed)
+    booking, dashboard, camera, bot = (mix[k] for k in ("booking", "dashboard", "camera", "bot"))
+    return {
+        "booking": ("forecasting", poisson_arrivals(rng, booking["rate"], duration, booking.get("burst_every"),
+                                                    booking.get("burst_seconds", 0.0),
+                                                    booking.get("burst_factor", 1.0)), booking_request),
+        "dashboard": ("forecasting", periodic_arrivals(rng, dashboard["screens"], dashboard["period"], duration),
+                      dashboard_request),
+        "camera": ("detection", periodic_arrivals(rng, camera["cameras"], camera["period"], duration),
+                   camera_request_factory(frame_kb)),
+        "bot": ("forecasting", poisson_arrivals(rng, bot["rate"], duration), bot_request),
+    }
+
+
+async def run_scenario(pool, times, factory, results, rng, timeout_ms, started):
+    lags = []
+    tasks = set()
+    for t in times:
+        delay = started + t - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lags.append(-min(delay, 0.0) * 1000)
+        path, body, headers = factory(rng, timeout_ms)
+        task = asyncio.ensure_future(timed(pool, (results,), "POST", path, body, headers))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return lags
+
+
+async def run(schedule, urls, connections, timeout, booking_timeout_ms, seed):
+    pools = {service: Pool(url, connections, timeout) for service, url in urls.items()}
+    results = {name: Results() for name in schedule}
+    rng = random.Random(seed + 1)
+    started = time.perf_counter()
+    lags = await asyncio.gather(*(
+        run_scenario(pools[service], times, factory, results[name], rng,
+                     booking_timeout_ms if name == "booking" else None, started)
+        for name, (service, times, factory) in schedule.items() if service in pools
+    ))
+    elapsed = time.perf_counter() - started
+    for pool in pools.values():
+        await pool.close()
+    return results, max((max(l) for l in lags if l), default=0.0), elapsed
+
+
+def check(name, summary, offered, limits, baseline, tolerance):
+    """List of {"check", "limit", "value", "ok"} for one scenario."""
+    checks = []
+
+    def add(label, value, limit, ok):
+        checks.append({"check": f"{name}.{label}", "value": value, "limit": limit, "ok": bool(ok)})
+
+    latency = summary["latency_ms"]
+    enough = sum(summary["statuses"].values()) >= MIN_SAMPLES
+    for p in ("p50", "p95", "p99"):
+        limit = limits.get(f"{p}_ms")
+        if limit is not None and enough:
+            add(f"{p}_ms", latency[p], limit, latency[p] <= limit)
+    if "max_error_rate" in limits:
+        add("error_rate", summary["error_rate"], limits["max_error_rate"], summary["error_rate"] <= limits["max_error_rate"])
+    if "max_shed_rate" in limits:
+        add("shed_rate", summary["shed_rate"], limits["max_shed_rate"], summary["shed_rate"] <= limits["max_shed_rate"])
+    if "min_throughput_ratio" in limits and offered:
+        ok = sum(n for status, n in summary["statuses"].items() if status.startswith("2"))
+        ratio = round(ok / offered, 4)
+        add("throughput_ratio", ratio, limits["min_throughput_ratio"], ratio >= limits["min_throughput_ratio"])
+    before = (baseline or {}).get("scenarios", {}).get(name, {}).get("latency_ms", {})
+    for p in ("p95", "p99"):
+        if before.get(p) and enough:
+            limit = round(before[p] * (1 + tolerance), 3)
+            add(f"{p}_vs_baseline", latency[p], limit, latency[p] <= limit)
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--forecasting-url", default="http://127.0.0.1:8002")
+    parser.add_argument("--detection-url", default="http://127.0.0.1:8001",
+                        help="crowd-detection URL; pass an empty string to skip the camera scenario")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="normal")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every rate and source count")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--connections", type=int, default=256, help="keep-alive connections per service")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--booking-timeout-ms", type=int, default=800,
+                        help="X-Request-Timeout-Ms on /predict, as the backend sends (0 to omit)")
+    parser.add_argument("--frame-kb", type=int, default=200)
+    parser.add_argument("--thresholds", default=THRESHOLDS)
+    parser.add_argument("--baseline", help="earlier result JSON to compare p95/p99 against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/p99 growth over the baseline")
+    parser.add_argument("--json", help="write the result here")
+    args = parser.parse_args()
+
+    mix = copy.deepcopy(MIXES[args.mix])
+    for scenario in mix.values():
+        if "rate" in scenario:
+            scenario["rate"] *= args.scale
+        for key in ("screens", "cameras"):
+            if key in scenario:
+                scenario[key] = max(1, round(scenario[key] * args.scale))
+    urls = {"forecasting": args.forecasting_url}
+    if args.detection_url:
+        urls["detection"] = args.detection_url
+    schedule = build_schedule(mix, args.duration, args.seed, args.frame_kb)
+    schedule = {name: entry for name, entry in schedule.items() if entry[0] in urls}
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    offered = {name: len(times) for name, (_, times, _) in schedule.items()}
+    print(f"⏳ {args.mix} mix x{args.scale:g} for {args.duration:g}s: "
+          + ", ".join(f"{name} {n / args.duration:.1f}/s" for name, n in offered.items()))
+    results, max_lag, elapsed = asyncio.run(run(schedule, urls, args.connections, args.timeout,
+                                                args.booking_timeout_ms, args.seed))
+
+    report = {
+        "mix": args.mix,
+        "scale": args.scale,
+        "duration_seconds": args.duration,
+        "seed": args.seed,
+        "urls": urls,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"platform": platform.platform(), "cpus": os.cpu_count(), "python": platform.python_version()},
+        "elapsed_seconds": round(elapsed, 3),
+        "max_schedule_lag_ms": round(max_lag, 3),
+        "scenarios": {},
+        "checks": [],
+    }
+    print(f"{'scenario':<10}{'offered/s':>10}{'done/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'errors':>8}{'shed':>7}")
+    for name, res in results.items():
+        summary = res.summary(args.duration)
+        summary["offered_rps"] = round(offered[name] / args.duration, 2)
+        summary["shed_rate"] = round(res.statuses.get(429, 0) / res.count, 4) if res.count else 0.0
+        report["scenarios"][name] = summary
+        report["checks"] += check(name, summary, offered[name], thresholds.get(name, {}), baseline, args.tolerance)
+        latency = summary["latency_ms"]
+        print(f"{name:<10}{summary['offered_rps']:>10.1f}{summary['throughput_rps'] or 0:>9.1f}"
+              + "".join(f"{latency[p] if latency[p] is not None else float('nan'):>9.1f}" for p in ("p50", "p95", "p99"))
+              + f"{summary['error_rate']:>8.1%}{summary['shed_rate']:>7.1%}")
+
+    failed = [c for c in report["checks"] if not c["ok"]]
+    report["passed"] = not failed
+    if max_lag > 100:
+        print(f"⚠️ Arrivals ran up to {max_lag:.0f} ms late; the load generator itself is saturated")
+    for c in failed:
+        print(f"❌ {c['check']}: {c['value']} (limit {c['limit']})")
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    print("✅ All checks passed" if not failed else f"❌ {len(failed)} of {len(report['checks'])} checks failed")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
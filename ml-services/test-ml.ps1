@@ -1,5 +1,6 @@
 # ML SERVICES TESTING SCRIPT
 # Tests crowd detection and demand forecasting in real-life scenarios
+# Smoke test only; for latency under concurrent load use: python -m loadtest.suite (see README.md)
 
 Write-Host "=========================================" -ForegroundColor Cyan
 Write-Host " ML Services - Real-Life Testing" -ForegroundColor Cyan